@@ -0,0 +1,512 @@
+"""
+历史电压读数的多进程批量导入 (回填多年的归档数据)。
+
+输入为若干 CSV / TSV 文件，每行 pile_id, voltage, reading_timestamp (可带表头)。
+导入分两个阶段，均由进程池并行执行:
+1. 分区：每个输入文件一个任务，校验每一行，按测试桩 (pile_id % 分区数) 或按月份
+   写入工作目录下的分区文件；
+2. 写入：每个分区一个任务，工作进程使用自己的数据库连接并关闭自动提交，
+   每 chunk_size 行 executemany 一次、提交一次。
+已完成分区的输入文件与每个分区已提交的行数记录在 JSON 检查点文件中，中断后以相同
+参数再次运行即从检查点继续。每行带由内容计算的幂等键 (voltage_readings.ingest_key，
+需要数据库结构版本 6)，检查点落后于数据库的那一批被再次提交时由唯一索引去重。
+全部写入后把导入时间范围内每个测试桩的最新读数合并进最新电压表，并回填该范围的汇总表。
+
+    python bulk_loader.py load archive/*.csv --workers 8 --partition-by pile
+    python bulk_loader.py load archive/*.csv --partition-by month --checkpoint backfill.json
+    python bulk_loader.py status --checkpoint backfill.json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+
+from mysql.connector import Error
+
+from db_operations import (
+    INSERT_IGNORE_KEYED_READING_QUERY,
+    backfill_voltage_rollups,
+    close_pool,
+    create_connection,
+    ensure_ingest_key_column,
+    get_test_pile_ids,
+    merge_pile_latest_voltage,
+    pooled_connection,
+)
+
+DEFAULT_CHECKPOINT = "bulk_load_checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+# 每个输入文件最多输出的无效行明细条数
+MAX_REPORTED_ERRORS = 10
+
+# 工作进程中的全局状态，由进程池的 initializer 设置
+_known_pile_ids = None
+_progress_queue = None
+
+
+def reading_key(pile_id, voltage, reading_time):
+    """由读数内容计算的幂等键 (32 位十六进制)，同一条读数重复导入时得到相同的键"""
+    return hashlib.md5(f"{pile_id}|{voltage:.3f}|{reading_time}".encode()).hexdigest()
+
+
+def parse_line(line):
+    """
+    解析一行 "pile_id,voltage,timestamp" (逗号或制表符分隔)，
+    返回 (pile_id, voltage, "YYYY-MM-DD HH:MM:SS")，不合法时抛出 ValueError。
+    """
+    fields = line.rstrip("\r\n").split("\t" if "\t" in line else ",")
+    if len(fields) != 3:
+        raise ValueError(f"应包含 3 个字段，实际为 {len(fields)} 个")
+    pile_id = int(fields[0])
+    voltage = float(fields[1])
+    if not math.isfinite(voltage):
+        raise ValueError(f"电压值无效: {voltage}")
+    reading_time = datetime.fromisoformat(fields[2].strip())
+    return pile_id, voltage, reading_time.isoformat(" ", "seconds")
+
+
+def partition_of(pile_id, reading_time, partition_by, partitions):
+    """读数所属的分区名"""
+    if partition_by == "pile":
+        return f"pile-{pile_id % partitions:03d}"
+    return f"month-{reading_time[:7]}"
+
+
+def partition_file(work_dir, partition, input_index):
+    return os.path.join(work_dir, f"{partition}.{input_index:05d}.tsv")
+
+
+def _init_split_worker(known_pile_ids):
+    global _known_pile_ids
+    _known_pile_ids = known_pile_ids
+
+
+def _init_load_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def split_input(task):
+    """
+    (工作进程) 校验一个输入文件并写入各分区文件 (每行附带幂等键)，返回统计字典
+    {"path", "rows", "rejected", "first", "last", "partitions": {分区名: 行数}}。
+    分区文件先写入临时文件，整个输入文件处理完后才改名，中断后重新处理即可。
+    """
+    path, input_index, work_dir, partition_by, partitions = task
+    outputs = {}
+    counts = {}
+    rows = rejected = 0
+    first = last = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    pile_id, voltage, reading_time = parse_line(line)
+                except ValueError as e:
+                    if line_number == 1:
+                        continue  # 表头
+                    error = e
+                else:
+                    if pile_id in _known_pile_ids:
+                        error = None
+                    else:
+                        error = f"测试桩 {pile_id} 不存在"
+                if error is not None:
+                    rejected += 1
+                    if rejected <= MAX_REPORTED_ERRORS:
+                        print(
+                            f"{path} 第 {line_number} 行无效 ({error}): {line.strip()}"
+                        )
+                    continue
+
+                partition = partition_of(
+                    pile_id, reading_time, partition_by, partitions
+                )
+                output = outputs.get(partition)
+                if output is None:
+                    output = outputs[partition] = open(
+                        partition_file(work_dir, partition, input_index) + ".tmp",
+                        "w",
+                        encoding="utf-8",
+                    )
+                    counts[partition] = 0
+                output.write(
+                    f"{reading_key(pile_id, voltage, reading_time)}\t"
+                    f"{pile_id}\t{voltage:.3f}\t{reading_time}\n"
+                )
+                counts[partition] += 1
+                rows += 1
+                if first is None or reading_time < first:
+                    first = reading_time
+                if last is None or reading_time > last:
+                    last = reading_time
+    finally:
+        for output in outputs.values():
+            output.close()
+    for partition in outputs:
+        target = partition_file(work_dir, partition, input_index)
+        os.replace(target + ".tmp", target)
+    return {
+        "path": path,
+        "rows": rows,
+        "rejected": rejected,
+        "first": first,
+        "last": last,
+        "partitions": counts,
+    }
+
+
+def _iter_partition_rows(files):
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield tuple(line.rstrip("\n").split("\t"))
+
+
+def load_partition(task):
+    """
+    (工作进程) 用独立的连接 (关闭自动提交) 写入一个分区，跳过已提交的前 done 行。
+    每提交一批向父进程发送 (分区名, 已提交行数, 本批行数, 本批新写入行数)。
+    返回 {"partition", "rows", "error"}。
+    """
+    partition, files, done, chunk_size = task
+    connection = create_connection()
+    if not (connection and connection.is_connected()):
+        return {"partition": partition, "rows": done, "error": "无法连接到数据库"}
+    connection.autocommit = False
+    cursor = connection.cursor()
+    committed = done
+    chunk = []
+
+    def flush():
+        nonlocal committed
+        cursor.executemany(INSERT_IGNORE_KEYED_READING_QUERY, chunk)
+        inserted = max(cursor.rowcount, 0)
+        connection.commit()
+        committed += len(chunk)
+        _progress_queue.put((partition, committed, len(chunk), inserted))
+        chunk.clear()
+
+    try:
+        for position, row in enumerate(_iter_partition_rows(files)):
+            if position < done:
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+        return {"partition": partition, "rows": committed, "error": None}
+    except Error as e:
+        connection.rollback()
+        return {"partition": partition, "rows": committed, "error": str(e)}
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    """先写临时文件再替换，中断时不会留下不完整的检查点"""
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(temporary, path)
+
+
+def _new_state(args, inputs):
+    return {
+        "version": CHECKPOINT_VERSION,
+        "inputs": inputs,
+        "partition_by": args.partition_by,
+        "partitions": args.partitions,
+        "work_dir": os.path.abspath(args.work_dir or args.checkpoint + ".parts"),
+        "split": {},
+        "loaded": {},
+        "derived_rebuilt": False,
+    }
+
+
+def _partition_plan(state):
+    """由分区阶段的结果得到 {分区名: (分区文件列表, 总行数)}"""
+    plan = {}
+    for input_index, path in enumerate(state["inputs"]):
+        for partition, rows in state["split"][path]["partitions"].items():
+            files, total = plan.get(partition, ([], 0))
+            files.append(partition_file(state["work_dir"], partition, input_index))
+            plan[partition] = (files, total + rows)
+    return plan
+
+
+def _format_rate(count, seconds):
+    return f"{count / seconds:,.0f} 行/秒" if seconds > 0 else "-"
+
+
+def split_inputs(state, checkpoint_path, known_pile_ids, workers):
+    """阶段 1：并行处理尚未分区的输入文件"""
+    pending = [
+        (
+            path,
+            input_index,
+            state["work_dir"],
+            state["partition_by"],
+            state["partitions"],
+        )
+        for input_index, path in enumerate(state["inputs"])
+        if path not in state["split"]
+    ]
+    if not pending:
+        return
+    print(f"分区阶段: {len(pending)} 个输入文件，{workers} 个进程")
+    os.makedirs(state["work_dir"], exist_ok=True)
+    started = time.perf_counter()
+    rows = 0
+    with multiprocessing.Pool(
+        workers, initializer=_init_split_worker, initargs=(known_pile_ids,)
+    ) as pool:
+        for result in pool.imap_unordered(split_input, pending):
+            state["split"][result["path"]] = result
+            save_checkpoint(checkpoint_path, state)
+            rows += result["rows"] + result["rejected"]
+            print(
+                f"已分区 {len(state['split'])}/{len(state['inputs'])} 个文件 "
+                f"({os.path.basename(result['path'])}: {result['rows']} 行，"
+                f"无效 {result['rejected']} 行)，"
+                f"{_format_rate(rows, time.perf_counter() - started)}"
+            )
+
+
+def load_partitions(state, checkpoint_path, workers, chunk_size, report_interval):
+    """阶段 2：并行写入尚未完成的分区，返回是否全部成功"""
+    plan = _partition_plan(state)
+    loaded = state["loaded"]
+    pending = [
+        (partition, files, loaded.get(partition, 0), chunk_size)
+        for partition, (files, total) in sorted(plan.items())
+        if loaded.get(partition, 0) < total
+    ]
+    total_rows = sum(total for _, total in plan.values())
+    if not pending:
+        return True
+    print(
+        f"写入阶段: {len(pending)} 个分区，{workers} 个进程，"
+        f"已完成 {sum(loaded.values())}/{total_rows} 行"
+    )
+
+    progress_queue = multiprocessing.Queue()
+    started = last_report = last_save = time.perf_counter()
+    committed = inserted = 0
+
+    def drain(timeout):
+        nonlocal committed, inserted
+        try:
+            while True:
+                partition, rows_done, rows, new_rows = progress_queue.get(
+                    timeout=timeout
+                )
+                loaded[partition] = rows_done
+                committed += rows
+                inserted += new_rows
+                timeout = 0
+        except queue.Empty:
+            pass
+
+    with multiprocessing.Pool(
+        workers, initializer=_init_load_worker, initargs=(progress_queue,)
+    ) as pool:
+        results = pool.map_async(load_partition, pending, chunksize=1)
+        while not results.ready():
+            drain(0.5)
+            now = time.perf_counter()
+            if now - last_save >= 1.0:
+                save_checkpoint(checkpoint_path, state)
+                last_save = now
+            if now - last_report >= report_interval:
+                elapsed = now - started
+                print(
+                    f"已提交 {sum(loaded.values())}/{total_rows} 行，"
+                    f"本次 {committed} 行 (重复 {committed - inserted} 行)，"
+                    f"合计 {_format_rate(committed, elapsed)}"
+                )
+                last_report = now
+        outcomes = results.get()
+    drain(0.2)
+    save_checkpoint(checkpoint_path, state)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"写入阶段结束: 本次提交 {committed} 行 (新写入 {inserted} 行)，"
+        f"耗时 {elapsed:.1f} 秒，合计 {_format_rate(committed, elapsed)}"
+    )
+    failed = [outcome for outcome in outcomes if outcome["error"] is not None]
+    for outcome in failed:
+        print(
+            f"分区 {outcome['partition']} 写入失败 (已提交 {outcome['rows']} 行): "
+            f"'{outcome['error']}'"
+        )
+    return not failed
+
+
+def rebuild_derived(state, connection):
+    """
+    阶段 3：把导入时间范围内各测试桩的最新读数合并进最新电压表
+    (不清空整张表，导入期间其他测试桩的最新电压保持不变)，并回填该范围的汇总表
+    """
+    results = [result for result in state["split"].values() if result["rows"]]
+    if not results:
+        return True
+    first = datetime.fromisoformat(min(result["first"] for result in results))
+    end = datetime.fromisoformat(max(result["last"] for result in results))
+    end += timedelta(seconds=1)
+    if merge_pile_latest_voltage(connection, first, end) is None:
+        return False
+    return backfill_voltage_rollups(connection, first, end) is not None
+
+
+def load(args):
+    inputs = sorted(os.path.abspath(path) for path in args.inputs)
+    state = load_checkpoint(args.checkpoint)
+    if state is None:
+        state = _new_state(args, inputs)
+    elif (
+        state["inputs"] != inputs
+        or state["partition_by"] != args.partition_by
+        or state["partitions"] != args.partitions
+    ):
+        print(
+            f"检查点 {args.checkpoint} 对应的输入文件或分区方式与本次不同，"
+            "请使用相同的参数继续，或指定新的 --checkpoint。"
+        )
+        return 1
+    else:
+        print(f"从检查点 {args.checkpoint} 继续。")
+
+    with pooled_connection() as conn:
+        if not (conn and conn.is_connected()):
+            print("无法连接到数据库。")
+            return 1
+        if not ensure_ingest_key_column(conn):
+            return 1
+        pile_ids = get_test_pile_ids(conn)
+        if pile_ids is None:
+            return 1
+        known_pile_ids = set(pile_ids)
+        conn.commit()  # 结束只读事务
+
+    started = time.perf_counter()
+    try:
+        split_inputs(state, args.checkpoint, known_pile_ids, args.workers)
+        if not load_partitions(
+            state, args.checkpoint, args.workers, args.chunk_size, args.report_interval
+        ):
+            print("部分分区写入失败，再次运行相同命令即可从检查点继续。")
+            return 1
+    except KeyboardInterrupt:
+        save_checkpoint(args.checkpoint, state)
+        print("已中断，进度已保存。再次运行相同命令即可从检查点继续。")
+        return 130
+
+    if not state["derived_rebuilt"]:
+        with pooled_connection() as conn:
+            if not (conn and conn.is_connected()) or not rebuild_derived(state, conn):
+                print("更新最新电压表或汇总表失败，可稍后再次运行本命令重试。")
+                return 1
+        state["derived_rebuilt"] = True
+        save_checkpoint(args.checkpoint, state)
+
+    if not args.keep_parts:
+        shutil.rmtree(state["work_dir"], ignore_errors=True)
+    rows = sum(result["rows"] for result in state["split"].values())
+    rejected = sum(result["rejected"] for result in state["split"].values())
+    print(
+        f"导入完成: {rows} 行，无效 {rejected} 行，"
+        f"本次耗时 {time.perf_counter() - started:.1f} 秒。"
+    )
+    return 0
+
+
+def status(args):
+    state = load_checkpoint(args.checkpoint)
+    if state is None:
+        print(f"检查点 {args.checkpoint} 不存在。")
+        return 1
+    print(
+        f"输入文件: 已分区 {len(state['split'])}/{len(state['inputs'])}，"
+        f"分区方式: {state['partition_by']}"
+    )
+    plan = _partition_plan(state)
+    done = 0
+    for partition, (_, total) in sorted(plan.items()):
+        rows = state["loaded"].get(partition, 0)
+        done += rows
+        if rows < total:
+            print(f"  {partition}: {rows}/{total}")
+    print(
+        f"已提交 {done}/{sum(total for _, total in plan.values())} 行，"
+        f"派生表{'已' if state['derived_rebuilt'] else '未'}重建"
+    )
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="历史电压读数多进程批量导入工具")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    load_parser = subparsers.add_parser("load", help="导入 (或从检查点继续导入) 读数")
+    load_parser.add_argument("inputs", nargs="+", help="CSV / TSV 输入文件")
+    load_parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    load_parser.add_argument(
+        "--work-dir", default=None, help="分区文件目录 (默认为检查点文件名加 .parts)"
+    )
+    load_parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 4, help="进程数"
+    )
+    load_parser.add_argument(
+        "--partition-by",
+        choices=["pile", "month"],
+        default="pile",
+        help="按测试桩 ID 取模或按月份分区",
+    )
+    load_parser.add_argument(
+        "--partitions", type=int, default=16, help="按测试桩分区时的分区数"
+    )
+    load_parser.add_argument(
+        "--chunk-size", type=int, default=5000, help="每次提交的行数"
+    )
+    load_parser.add_argument("--report-interval", type=float, default=10.0)
+    load_parser.add_argument(
+        "--keep-parts", action="store_true", help="完成后保留分区文件"
+    )
+    load_parser.set_defaults(func=load)
+
+    status_parser = subparsers.add_parser("status", help="查看检查点中的导入进度")
+    status_parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    status_parser.set_defaults(func=status)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
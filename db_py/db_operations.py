@@ -1,6 +1,11 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 from datetime import datetime, timedelta
+from collections import namedtuple
+from contextlib import contextmanager
+import math
+import threading
+import time
 
 # 数据库连接配置
 db_config = {
@@ -23,6 +28,215 @@ def create_connection():
     return connection
 
 
+class ConnectionPool:
+    """
+    有界的数据库连接池。
+
+    连接在使用后归还池中复用，避免每次刷新、点击或定时任务都重新进行
+    TCP 握手与认证。支持：
+    - 最大连接数限制 (max_size)，池满时借用方阻塞等待，超过 checkout_timeout 返回 None
+    - 空闲超过 idle_timeout 秒的连接会被关闭回收
+    - 空闲超过 health_check_interval 秒的连接在借出前会 ping 一次，失效则丢弃重建
+    """
+
+    def __init__(
+        self,
+        config=None,
+        max_size=5,
+        idle_timeout=300,
+        checkout_timeout=10,
+        health_check_interval=30,
+        connect=None,
+    ):
+        self.config = dict(config if config is not None else db_config)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        # 允许注入自定义的连接工厂，默认使用 mysql.connector.connect
+        self._connect = connect or (lambda: mysql.connector.connect(**self.config))
+
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = []  # [(connection, 归还时间), ...]，按 LIFO 使用以保持热连接
+        self._size = 0  # 当前已创建 (空闲 + 借出) 的连接数
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        """
+        从池中借出一个可用连接。
+        池已满时最多等待 timeout 秒 (默认 checkout_timeout)，超时或连接失败返回 None。
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            candidate = None
+            with self._condition:
+                if self._closed:
+                    print("连接池已关闭，无法借出连接。")
+                    return None
+                self._evict_idle_locked()
+                if self._idle:
+                    candidate, returned_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1  # 先占位，在锁外建立连接
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        print(
+                            f"等待数据库连接超时 ({timeout} 秒)，连接池已满 (max_size={self.max_size})。"
+                        )
+                        return None
+                    self._condition.wait(remaining)
+                    continue
+
+            if candidate is not None:
+                if self._is_healthy(candidate, returned_at):
+                    return candidate
+                self._discard(candidate)
+                continue
+
+            try:
+                connection = self._connect()
+            except Error as e:
+                print(f"连接数据库时发生错误: '{e}'")
+                connection = None
+            if connection is None:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                return None
+            return connection
+
+    def release(self, connection):
+        """将连接归还池中；已断开的连接会被直接丢弃"""
+        if connection is None:
+            return
+        try:
+            healthy = connection.is_connected()
+            if healthy and getattr(connection, "in_transaction", False):
+                # 归还前回滚未提交的事务，避免污染下一个使用者
+                connection.rollback()
+        except Error as e:
+            print(f"归还连接时检测到异常，连接将被丢弃: '{e}'")
+            healthy = False
+
+        if not healthy:
+            self._discard(connection)
+            return
+
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """以上下文管理器方式借出连接，退出时自动归还。无法获取时返回 None"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close_all(self):
+        """关闭所有空闲连接，并拒绝后续借出；借出中的连接在归还时关闭"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """返回连接池当前状态，便于调试"""
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+    def _evict_idle_locked(self):
+        """(需持有锁) 关闭空闲时间超过 idle_timeout 的连接"""
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        kept = []
+        for connection, returned_at in self._idle:
+            if now - returned_at > self.idle_timeout:
+                self._size -= 1
+                self._close_quietly(connection)
+            else:
+                kept.append((connection, returned_at))
+        self._idle = kept
+
+    def _is_healthy(self, connection, returned_at):
+        """刚归还不久的连接直接复用，否则 ping 一次确认服务器端未断开"""
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error as e:
+            print(f"连接池中的连接已失效，将重新建立: '{e}'")
+            return False
+
+    def _discard(self, connection):
+        self._close_quietly(connection)
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+
+# 进程内共享的连接池，首次使用时创建
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """返回进程内共享的连接池实例"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = ConnectionPool(db_config)
+        return _pool
+
+
+@contextmanager
+def pooled_connection(timeout=None):
+    """
+    从共享连接池借出一个连接，用法:
+
+        with db_operations.pooled_connection() as conn:
+            if conn is None:
+                ...  # 无法连接数据库
+    """
+    with get_pool().connection(timeout) as connection:
+        yield connection
+
+
+def close_pool():
+    """关闭共享连接池 (插件卸载或进程退出时调用)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
 def get_pile_by_name(connection, name):
     """根据名称查询测试桩"""
     cursor = connection.cursor(dictionary=True)
@@ -70,6 +284,334 @@ def insert_test_pile_if_not_exists(
                 cursor.close()
 
 
+# 每个测试桩最新一条电压读数的物化表，由写入函数在同一事务中维护，
+# 使地图刷新只需按主键读取 O(测试桩数) 行，而不必扫描全部历史数据
+CREATE_PILE_LATEST_VOLTAGE_TABLE = """
+CREATE TABLE IF NOT EXISTS pile_latest_voltage (
+    pile_id INT NOT NULL PRIMARY KEY,
+    voltage DECIMAL(10, 3) NOT NULL,
+    reading_timestamp DATETIME NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+# 只有更新 (或相同时间) 的读数才会覆盖现有记录；
+# 注意 voltage 必须在 reading_timestamp 之前赋值，MySQL 按从左到右的顺序求值
+UPSERT_PILE_LATEST_VOLTAGE_QUERY = """
+INSERT INTO pile_latest_voltage (pile_id, voltage, reading_timestamp)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    voltage = IF(VALUES(reading_timestamp) >= reading_timestamp,
+                 VALUES(voltage), voltage),
+    reading_timestamp = GREATEST(reading_timestamp, VALUES(reading_timestamp))
+"""
+
+
+def _upsert_pile_latest_voltages(cursor, readings):
+    """
+    (不提交) 根据一组已写入的 (pile_id, voltage, reading_time) 更新最新电压表。
+    同一测试桩只取时间最新的一条，每个测试桩只写一行。
+    """
+    latest = {}
+    for pile_id, voltage, reading_time in readings:
+        current = latest.get(pile_id)
+        if current is None or reading_time >= current[2]:
+            latest[pile_id] = (pile_id, voltage, reading_time)
+    if latest:
+        cursor.executemany(UPSERT_PILE_LATEST_VOLTAGE_QUERY, list(latest.values()))
+
+
+def ensure_pile_latest_voltage_table(connection):
+    """如果最新电压表不存在则创建"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_PILE_LATEST_VOLTAGE_TABLE)
+        connection.commit()
+        return True
+    except Error as e:
+        print(f"创建 pile_latest_voltage 表时发生错误: '{e}'")
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+
+
+# 根据 voltage_readings 计算每个测试桩的最新读数并写入最新电压表
+# (数据库迁移 4 与 rebuild_pile_latest_voltage 共用)
+REBUILD_PILE_LATEST_VOLTAGE_QUERY = """
+INSERT INTO pile_latest_voltage (pile_id, voltage, reading_timestamp)
+SELECT r.pile_id, r.voltage, r.reading_timestamp
+FROM voltage_readings r
+INNER JOIN (
+    SELECT pile_id, MAX(reading_timestamp) AS max_timestamp
+    FROM voltage_readings
+    GROUP BY pile_id
+) AS max_r
+ON r.pile_id = max_r.pile_id AND r.reading_timestamp = max_r.max_timestamp
+ON DUPLICATE KEY UPDATE voltage = VALUES(voltage)
+"""
+
+
+def rebuild_pile_latest_voltage(connection):
+    """
+    根据 voltage_readings 全量重建最新电压表 (用于初次部署或数据修复)。
+    在一个事务中完成删除与重建，返回写入的测试桩数量，失败返回 None。
+    """
+    if not ensure_pile_latest_voltage_table(connection):
+        return None
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        cursor.execute("DELETE FROM pile_latest_voltage")
+        cursor.execute(REBUILD_PILE_LATEST_VOLTAGE_QUERY)
+        cursor.execute("SELECT COUNT(*) FROM pile_latest_voltage")
+        (pile_count,) = cursor.fetchone()
+        connection.commit()
+        print(f"最新电压表重建完成，共 {pile_count} 个测试桩。")
+        return pile_count
+    except Error as e:
+        connection.rollback()
+        print(f"重建 pile_latest_voltage 表时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+# 取 [start, end) 范围内每个测试桩的最新读数合并进最新电压表，
+# 只在比表中已有的读数更新时才覆盖 (与 UPSERT_PILE_LATEST_VOLTAGE_QUERY 相同)
+MERGE_PILE_LATEST_VOLTAGE_RANGE_QUERY = """
+INSERT INTO pile_latest_voltage (pile_id, voltage, reading_timestamp)
+SELECT r.pile_id, r.voltage, r.reading_timestamp
+FROM voltage_readings r
+INNER JOIN (
+    SELECT pile_id, MAX(reading_timestamp) AS max_timestamp
+    FROM voltage_readings
+    WHERE reading_timestamp >= %s AND reading_timestamp < %s
+    GROUP BY pile_id
+) AS max_r
+ON r.pile_id = max_r.pile_id AND r.reading_timestamp = max_r.max_timestamp
+ON DUPLICATE KEY UPDATE
+    voltage = IF(VALUES(reading_timestamp) >= reading_timestamp,
+                 VALUES(voltage), voltage),
+    reading_timestamp = GREATEST(reading_timestamp, VALUES(reading_timestamp))
+"""
+
+
+def merge_pile_latest_voltage(connection, start_time, end_time, chunk_days=30):
+    """
+    把 [start_time, end_time) 范围内 (例如一次历史导入) 每个测试桩的最新读数
+    合并进最新电压表，不清空、不重建整张表。按 chunk_days 天分段，每段一个事务。
+    返回受影响的行数 (MySQL 的计数规则)，失败返回 None。
+    """
+    if not ensure_pile_latest_voltage_table(connection):
+        return None
+    cursor = connection.cursor()
+    try:
+        affected = 0
+        chunk_start = start_time
+        while chunk_start < end_time:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days), end_time)
+            connection.start_transaction()
+            cursor.execute(
+                MERGE_PILE_LATEST_VOLTAGE_RANGE_QUERY, (chunk_start, chunk_end)
+            )
+            affected += max(cursor.rowcount, 0)
+            connection.commit()
+            chunk_start = chunk_end
+        print(f"最新电压表已合并 {start_time} 至 {end_time} 的读数。")
+        return affected
+    except Error as e:
+        connection.rollback()
+        print(f"合并 pile_latest_voltage 表时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+# 占位电压值 (未知状态)，不计入统计汇总
+PLACEHOLDER_VOLTAGE = 9999.0
+
+# 按小时 / 按天的电压汇总表，由写入函数增量维护。
+# 保存 sum 与 count 而非平均值，便于增量合并；平均值在读取时计算
+CREATE_VOLTAGE_ROLLUP_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    pile_id INT NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    min_voltage DECIMAL(10, 3) NOT NULL,
+    max_voltage DECIMAL(10, 3) NOT NULL,
+    sum_voltage DOUBLE NOT NULL,
+    reading_count INT NOT NULL,
+    PRIMARY KEY (pile_id, bucket_start)
+)
+"""
+
+UPSERT_VOLTAGE_ROLLUP_QUERY = """
+INSERT INTO {table}
+    (pile_id, bucket_start, min_voltage, max_voltage, sum_voltage, reading_count)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    min_voltage = LEAST(min_voltage, VALUES(min_voltage)),
+    max_voltage = GREATEST(max_voltage, VALUES(max_voltage)),
+    sum_voltage = sum_voltage + VALUES(sum_voltage),
+    reading_count = reading_count + VALUES(reading_count)
+"""
+
+# 根据 voltage_readings 重新计算 [start, end) 内的汇总数据 (不含占位电压)，
+# 参数为 (start, end, PLACEHOLDER_VOLTAGE)；数据库迁移 5 与 backfill_voltage_rollups 共用
+BACKFILL_VOLTAGE_ROLLUP_QUERY = """
+INSERT INTO {table}
+    (pile_id, bucket_start, min_voltage, max_voltage, sum_voltage, reading_count)
+SELECT pile_id, {bucket_expression} AS bucket,
+       MIN(voltage), MAX(voltage), SUM(voltage), COUNT(*)
+FROM voltage_readings
+WHERE reading_timestamp >= %s AND reading_timestamp < %s
+  AND voltage <> %s
+GROUP BY pile_id, bucket
+"""
+
+# 汇总表名 -> (将时间截断到桶起点的 Python 函数, 对应的 SQL 表达式)
+VOLTAGE_ROLLUPS = {
+    "voltage_rollup_hourly": (
+        lambda t: t.replace(minute=0, second=0, microsecond=0),
+        "TIMESTAMP(DATE(reading_timestamp), MAKETIME(HOUR(reading_timestamp), 0, 0))",
+    ),
+    "voltage_rollup_daily": (
+        lambda t: t.replace(hour=0, minute=0, second=0, microsecond=0),
+        "TIMESTAMP(DATE(reading_timestamp))",
+    ),
+}
+
+
+def _upsert_voltage_rollups(cursor, readings):
+    """
+    (不提交) 将一组已写入的 (pile_id, voltage, reading_time) 合并进小时与天汇总表。
+    先在内存中按 (pile_id, 桶) 聚合，每个桶只写一行。
+    """
+    for table, (truncate, _) in VOLTAGE_ROLLUPS.items():
+        buckets = {}
+        for pile_id, voltage, reading_time in readings:
+            if voltage == PLACEHOLDER_VOLTAGE:
+                continue
+            key = (pile_id, truncate(reading_time))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [voltage, voltage, voltage, 1]
+            else:
+                bucket[0] = min(bucket[0], voltage)
+                bucket[1] = max(bucket[1], voltage)
+                bucket[2] += voltage
+                bucket[3] += 1
+        if buckets:
+            cursor.executemany(
+                UPSERT_VOLTAGE_ROLLUP_QUERY.format(table=table),
+                [key + tuple(values) for key, values in buckets.items()],
+            )
+
+
+# 已提示过不存在的派生表，避免每次写入都输出
+_missing_derived_tables = set()
+
+
+def _update_derived_tables(cursor, readings):
+    """
+    (不提交) 同步更新由电压读数派生的最新电压表与汇总表。
+    派生表不存在 (数据库尚未迁移，写入端不会自行建表) 时跳过该表，读数照常写入；
+    MySQL 中单条语句出错不会回滚整个事务，已执行的写入仍保留在事务中。
+    """
+    for name, update in (
+        ("pile_latest_voltage", _upsert_pile_latest_voltages),
+        ("voltage_rollup_*", _upsert_voltage_rollups),
+    ):
+        try:
+            update(cursor, readings)
+        except Error as e:
+            if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                raise
+            if name not in _missing_derived_tables:
+                _missing_derived_tables.add(name)
+                print(
+                    f"派生表 {name} 不存在，暂不维护 ('{e}')。"
+                    "运行插件的 db_migrations.py upgrade 创建并填充后自动维护。"
+                )
+
+
+def ensure_voltage_rollup_tables(connection):
+    """如果汇总表不存在则创建"""
+    cursor = connection.cursor()
+    try:
+        for table in VOLTAGE_ROLLUPS:
+            cursor.execute(CREATE_VOLTAGE_ROLLUP_TABLE.format(table=table))
+        connection.commit()
+        return True
+    except Error as e:
+        print(f"创建电压汇总表时发生错误: '{e}'")
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def backfill_voltage_rollups(connection, start_time=None, end_time=None, chunk_days=7):
+    """
+    根据 voltage_readings 重新计算 [start_time, end_time) 范围内的汇总数据。
+    范围会扩展到整天边界，并按 chunk_days 天分段处理，每段一个事务，
+    避免一次性锁定整个历史。未指定范围时处理全部历史。返回处理的读数条数，失败返回 None。
+    """
+    if not ensure_voltage_rollup_tables(connection):
+        return None
+    cursor = connection.cursor()
+    try:
+        if start_time is None or end_time is None:
+            cursor.execute(
+                "SELECT MIN(reading_timestamp), MAX(reading_timestamp) FROM voltage_readings"
+            )
+            first, last = cursor.fetchone()
+            connection.commit()  # 结束只读事务，以便下面按段开启新事务
+            if first is None:
+                print("voltage_readings 表中没有数据，无需回填汇总表。")
+                return 0
+            start_time = start_time or first
+            end_time = end_time or last + timedelta(seconds=1)
+
+        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        total = 0
+        while day_start < end_time:
+            day_end = day_start + timedelta(days=chunk_days)
+            connection.start_transaction()
+            for table, (_, bucket_expression) in VOLTAGE_ROLLUPS.items():
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE bucket_start >= %s AND bucket_start < %s",
+                    (day_start, day_end),
+                )
+                cursor.execute(
+                    BACKFILL_VOLTAGE_ROLLUP_QUERY.format(
+                        table=table, bucket_expression=bucket_expression
+                    ),
+                    (day_start, day_end, PLACEHOLDER_VOLTAGE),
+                )
+            cursor.execute(
+                "SELECT COALESCE(SUM(reading_count), 0) FROM voltage_rollup_daily "
+                "WHERE bucket_start >= %s AND bucket_start < %s",
+                (day_start, day_end),
+            )
+            total += int(cursor.fetchone()[0])
+            connection.commit()
+            print(f"已回填 {day_start:%Y-%m-%d} 起 {chunk_days} 天的汇总数据")
+            day_start = day_end
+        print(f"汇总表回填完成，共汇总 {total} 条读数。")
+        return total
+    except Error as e:
+        connection.rollback()
+        print(f"回填电压汇总表时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
 def insert_voltage_reading(connection, pile_id, voltage, reading_timestamp_str):
     """向 voltage_readings 表插入一个新的电压读数"""
     cursor = connection.cursor()
@@ -80,13 +622,16 @@ def insert_voltage_reading(connection, pile_id, voltage, reading_timestamp_str):
     try:
         reading_time = datetime.strptime(reading_timestamp_str, "%Y-%m-%d %H:%M:%S")
         cursor.execute(query, (pile_id, voltage, reading_time))
-        connection.commit()
         reading_id = cursor.lastrowid
+        # 在同一事务中更新最新电压表与汇总表，保证各表一致
+        _update_derived_tables(cursor, [(pile_id, voltage, reading_time)])
+        connection.commit()
         print(
             f"为测试桩 ID {pile_id} 成功插入电压读数 {voltage}V，时间: {reading_timestamp_str}, 记录 ID: {reading_id}"
         )
         return reading_id
     except Error as e:
+        connection.rollback()
         print(f"为测试桩 ID {pile_id} 插入电压读数时发生错误: '{e}'")
         return None
     finally:
@@ -94,6 +639,275 @@ def insert_voltage_reading(connection, pile_id, voltage, reading_timestamp_str):
             cursor.close()
 
 
+# 批量插入结果: inserted 为成功写入的行数，
+# failures 为 [(输入中的行号, 原始行, 错误信息), ...]
+BatchInsertResult = namedtuple("BatchInsertResult", ["inserted", "failures"])
+
+INSERT_VOLTAGE_READING_QUERY = """
+INSERT INTO voltage_readings (pile_id, voltage, reading_timestamp)
+VALUES (%s, %s, %s)
+"""
+
+
+# 由行本身的数据导致、重试也无法写入的错误 (例如测试桩已被删除)
+ROW_DATA_ERRORS = {
+    errorcode.ER_NO_REFERENCED_ROW,
+    errorcode.ER_NO_REFERENCED_ROW_2,
+    errorcode.ER_BAD_NULL_ERROR,
+    errorcode.ER_DATA_TOO_LONG,
+    errorcode.ER_WARN_DATA_OUT_OF_RANGE,
+    errorcode.ER_TRUNCATED_WRONG_VALUE,
+    errorcode.ER_TRUNCATED_WRONG_VALUE_FOR_FIELD,
+}
+
+
+def _rollback_quietly(connection):
+    """回滚当前事务；连接已断开时回滚本身也会失败，忽略该错误以免掩盖原始异常"""
+    try:
+        connection.rollback()
+    except Error as e:
+        print(f"回滚事务时发生错误: '{e}'")
+
+
+def _to_datetime(value):
+    """将 datetime / 字符串 / numpy.datetime64 统一转换为 datetime"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    if hasattr(value, "astype"):  # numpy.datetime64，无需在此导入 numpy
+        converted = value.astype("datetime64[us]").item()
+        if isinstance(converted, datetime):
+            return converted
+    raise ValueError(f"无法识别的时间戳: {value!r}")
+
+
+def _normalize_reading(row):
+    """
+    将一行 (pile_id, voltage, timestamp) 校验并转换为可写入数据库的参数元组。
+    支持元组、列表以及 NumPy 结构化数组的行；不合法时抛出 ValueError。
+    """
+    if len(row) != 3:
+        raise ValueError(
+            f"读数应包含 3 个字段 (pile_id, voltage, timestamp)，实际为 {len(row)} 个"
+        )
+    pile_id, voltage, timestamp = row[0], row[1], row[2]
+    if pile_id is None or voltage is None or timestamp is None:
+        raise ValueError("pile_id、voltage 和 timestamp 均不能为空")
+    voltage = float(voltage)
+    if not math.isfinite(voltage):
+        raise ValueError(f"电压值无效: {voltage}")
+    return int(pile_id), voltage, _to_datetime(timestamp)
+
+
+def _execute_voltage_chunk(connection, cursor, chunk):
+    """
+    写入一个分块并提交一次，同一事务中同步更新最新电压表与汇总表。
+    executemany 因行数据错误 (ROW_DATA_ERRORS) 失败时回滚，并逐行重试以定位出错的行，
+    其余行仍在同一次提交中写入。连接断开、死锁、锁等待超时等其他错误回滚后原样抛出，
+    整块未写入，由调用方重试。返回 (成功行数, 失败列表)。
+    """
+    params = [normalized for _, _, normalized in chunk]
+    try:
+        cursor.executemany(INSERT_VOLTAGE_READING_QUERY, params)
+        _update_derived_tables(cursor, params)
+        connection.commit()
+        return len(chunk), []
+    except Error as e:
+        _rollback_quietly(connection)
+        if e.errno not in ROW_DATA_ERRORS:
+            raise
+        print(f"批量插入 {len(chunk)} 条电压读数失败，改为逐行插入以定位错误: '{e}'")
+
+    written = []
+    failures = []
+    try:
+        for index, row, normalized in chunk:
+            try:
+                cursor.execute(INSERT_VOLTAGE_READING_QUERY, normalized)
+            except Error as e:
+                if e.errno not in ROW_DATA_ERRORS:
+                    raise
+                failures.append((index, row, str(e)))
+                continue
+            written.append(normalized)
+        _update_derived_tables(cursor, written)
+        connection.commit()
+    except Error:
+        # 派生表无法更新或连接失效时整块回滚，避免各表不一致，由调用方重试
+        _rollback_quietly(connection)
+        raise
+    return len(written), failures
+
+
+def insert_voltage_readings_batch(connection, readings, chunk_size=1000, verbose=True):
+    """
+    批量插入电压读数。
+
+    readings 可以是任意可迭代对象或 NumPy (结构化) 数组，每行为
+    (pile_id, voltage, timestamp)，timestamp 支持 datetime、"%Y-%m-%d %H:%M:%S"
+    字符串或 numpy.datetime64。数据按 chunk_size 分块，每块使用一次
+    executemany (驱动会合并为多行 VALUES) 并只提交一次；
+    pile_latest_voltage 表及小时/天汇总表在同一事务中更新。
+
+    返回 BatchInsertResult(inserted, failures)，failures 只记录因数据本身无法写入的行
+    (行号、原始内容和错误原因)。连接断开、死锁等可重试的错误以 Error 抛出，
+    出错的分块整体未写入，此前的分块已提交；单块写入 (chunk_size 不小于行数) 时
+    调用方可以原样重试整批。verbose 为 False 时不打印汇总信息 (供高频定时写入使用)。
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size 必须大于 0")
+
+    cursor = connection.cursor()
+    inserted = 0
+    failures = []
+    chunk = []
+    try:
+        for index, row in enumerate(readings):
+            try:
+                chunk.append((index, row, _normalize_reading(row)))
+            except (TypeError, ValueError) as e:
+                failures.append((index, row, str(e)))
+                continue
+            if len(chunk) >= chunk_size:
+                chunk_inserted, chunk_failures = _execute_voltage_chunk(
+                    connection, cursor, chunk
+                )
+                inserted += chunk_inserted
+                failures.extend(chunk_failures)
+                chunk = []
+        if chunk:
+            chunk_inserted, chunk_failures = _execute_voltage_chunk(
+                connection, cursor, chunk
+            )
+            inserted += chunk_inserted
+            failures.extend(chunk_failures)
+    finally:
+        if cursor:
+            cursor.close()
+
+    if verbose:
+        print(f"批量插入电压读数完成: 成功 {inserted} 条，失败 {len(failures)} 条")
+    return BatchInsertResult(inserted, failures)
+
+
+# 带幂等键的写入 (见 spool.py)，需要数据库结构版本 6 (voltage_readings.ingest_key 唯一索引)
+INSERT_SPOOLED_READING_QUERY = """
+INSERT INTO voltage_readings (ingest_key, pile_id, voltage, reading_timestamp)
+VALUES (%s, %s, %s, %s)
+"""
+
+# 历史数据回填 (bulk_loader.py) 使用 INSERT IGNORE 跳过已导入的读数；
+# 回填不逐批维护派生表，导入完成后统一更新
+INSERT_IGNORE_KEYED_READING_QUERY = """
+INSERT IGNORE INTO voltage_readings (ingest_key, pile_id, voltage, reading_timestamp)
+VALUES (%s, %s, %s, %s)
+"""
+
+# 带幂等键写入的结果: inserted 为本事务新写入的行数；duplicates 为数据库中已存在
+# (此前已重放，或被另一个重放进程抢先写入) 的行数；rejected 为无法写入而丢弃的行
+# [(ingest_key, 错误信息), ...]
+SpooledInsertResult = namedtuple(
+    "SpooledInsertResult", ["inserted", "duplicates", "rejected"]
+)
+
+
+def ensure_ingest_key_column(connection):
+    """
+    如果 voltage_readings 还没有 ingest_key 列及其唯一索引则创建
+    (与插件 db_migrations 的迁移 6 等价，供独立运行的脚本使用)。
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = 'voltage_readings' "
+            "AND column_name = 'ingest_key'"
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(
+                "ALTER TABLE voltage_readings ADD COLUMN ingest_key CHAR(32) NULL, "
+                "ADD UNIQUE INDEX uq_readings_ingest_key (ingest_key)"
+            )
+        connection.commit()
+        return True
+    except Error as e:
+        print(f"添加 voltage_readings.ingest_key 列时发生错误: '{e}'")
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def _insert_spooled_rows_one_by_one(cursor, rows, rejected):
+    """(不提交) 逐行写入，跳过已存在的键，行数据错误记入 rejected，返回实际写入的行"""
+    written = []
+    for row in rows:
+        try:
+            cursor.execute(INSERT_SPOOLED_READING_QUERY, row)
+        except Error as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                continue
+            if e.errno in ROW_DATA_ERRORS:
+                rejected.append((row[0], str(e)))
+                continue
+            raise
+        written.append(row)
+    return written
+
+
+def insert_spooled_readings(connection, readings):
+    """
+    在一个事务中写入一批带幂等键的读数 [(ingest_key, pile_id, voltage, timestamp), ...]，
+    返回 SpooledInsertResult。最新电压表与汇总表只按本事务实际写入的行更新:
+    - 已存在的键先查询出来并跳过 (重放中断后再次重放)；
+    - 使用普通 INSERT，整批写入因唯一键冲突或行数据错误失败时回滚并逐行写入。
+      另一个重放进程正在写入同一条读数时，本事务在唯一索引上等待其提交，
+      随后的冲突计为重复；行数据错误 (例如测试桩已被删除) 的行被丢弃，
+      避免一条坏数据使缓冲永远无法排空。
+    其他错误 (如连接断开) 回滚并抛出 Error，由调用方保留这批读数稍后重试。
+    """
+    keyed = {}
+    rejected = []
+    for row in readings:
+        try:
+            keyed[row[0]] = (row[0],) + _normalize_reading(row[1:])
+        except (TypeError, ValueError) as e:
+            rejected.append((row[0], str(e)))
+    if not keyed:
+        return SpooledInsertResult(0, len(readings) - len(rejected), rejected)
+
+    cursor = connection.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(keyed))
+        cursor.execute(
+            f"SELECT ingest_key FROM voltage_readings WHERE ingest_key IN ({placeholders})",
+            list(keyed),
+        )
+        for (existing_key,) in cursor.fetchall():
+            keyed.pop(existing_key, None)
+        written = list(keyed.values())
+        if written:
+            try:
+                cursor.executemany(INSERT_SPOOLED_READING_QUERY, written)
+            except Error as e:
+                if e.errno != errorcode.ER_DUP_ENTRY and e.errno not in ROW_DATA_ERRORS:
+                    raise
+                connection.rollback()
+                written = _insert_spooled_rows_one_by_one(cursor, written, rejected)
+            _update_derived_tables(cursor, [row[1:] for row in written])
+        connection.commit()
+        return SpooledInsertResult(
+            len(written), len(readings) - len(written) - len(rejected), rejected
+        )
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+
+
 def get_all_test_piles(connection):
     """从 test_piles 表获取所有测试桩信息"""
     cursor = connection.cursor(dictionary=True)
@@ -116,6 +930,39 @@ def get_all_test_piles(connection):
             cursor.close()
 
 
+def get_test_pile_ids(connection):
+    """获取全部测试桩 ID (升序)，不打印明细，查询出错时返回 None"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT id FROM test_piles ORDER BY id")
+        return [row[0] for row in cursor.fetchall()]
+    except Error as e:
+        print(f"查询测试桩 ID 时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def get_test_pile_signature(connection):
+    """
+    测试桩目录的轻量签名 (数量, 最大 ID)，只需扫描主键。
+    签名变化说明有测试桩被新增或删除，调用方据此决定是否重新读取目录。
+    查询出错时返回 None。
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM test_piles")
+        count, max_id = cursor.fetchone()
+        return int(count), int(max_id)
+    except Error as e:
+        print(f"查询测试桩目录签名时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
 def get_voltage_readings_for_pile(connection, pile_id, limit=10):
     """获取特定测试桩的最新电压读数"""
     cursor = connection.cursor(dictionary=True)
@@ -0,0 +1,320 @@
+"""
+数据库不可用时的本地持久化缓冲 (只追加的 SQLite WAL 文件)。
+
+写入端先把读数追加到缓冲 (每条读数生成一个幂等键)，再由重放器按批次
+写入 MySQL，每批提交成功后才从缓冲中删除。进程在 "MySQL 已提交" 与 "缓冲已删除"
+之间崩溃时，这批读数会被再次重放，由 voltage_readings.ingest_key 唯一索引去重
+(需要数据库结构版本 6)。
+
+    python spool.py status  --spool readings.spool
+    python spool.py replay  --spool readings.spool --batch-size 5000
+    python spool.py benchmark --readings 2000000 --target null
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from mysql.connector import Error
+
+from db_operations import (
+    close_pool,
+    ensure_ingest_key_column,
+    insert_spooled_readings,
+    pooled_connection,
+)
+
+DEFAULT_SPOOL_PATH = os.path.join(os.path.dirname(__file__), "readings.spool")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+CREATE_SPOOL_TABLE = """
+CREATE TABLE IF NOT EXISTS spool (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ingest_key TEXT NOT NULL,
+    pile_id INTEGER NOT NULL,
+    voltage REAL NOT NULL,
+    reading_timestamp TEXT NOT NULL
+)
+"""
+
+
+def new_ingest_key():
+    """读数的幂等键 (32 位十六进制，与 voltage_readings.ingest_key CHAR(32) 对应)"""
+    return uuid.uuid4().hex
+
+
+class ReadingSpool:
+    """
+    只追加的本地读数缓冲。
+
+    使用 WAL 日志模式：追加与重放读取可以并发进行，每次追加只顺序写入 WAL。
+    synchronous 默认 NORMAL (进程崩溃不丢数据，断电时可能丢失最后一次提交)；
+    需要抵御断电时传入 "FULL"。
+    """
+
+    def __init__(self, path=DEFAULT_SPOOL_PATH, synchronous="NORMAL"):
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={synchronous}")
+        self.connection.execute(CREATE_SPOOL_TABLE)
+
+    def append(self, readings):
+        """
+        在一个事务中追加 [(pile_id, voltage, timestamp), ...]，timestamp 为 datetime
+        或 "%Y-%m-%d %H:%M:%S" 字符串。返回追加的条数。
+        """
+        rows = [
+            (
+                new_ingest_key(),
+                int(pile_id),
+                float(voltage),
+                (
+                    timestamp.strftime(TIMESTAMP_FORMAT)
+                    if isinstance(timestamp, datetime)
+                    else timestamp
+                ),
+            )
+            for pile_id, voltage, timestamp in readings
+        ]
+        if not rows:
+            return 0
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "INSERT INTO spool (ingest_key, pile_id, voltage, reading_timestamp) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def peek(self, limit):
+        """按写入顺序取出最早的 limit 条 [(seq, ingest_key, pile_id, voltage, timestamp)]"""
+        return self.connection.execute(
+            "SELECT seq, ingest_key, pile_id, voltage, reading_timestamp "
+            "FROM spool ORDER BY seq LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def ack(self, up_to_seq):
+        """删除 seq 不大于 up_to_seq 的读数 (已成功写入数据库)"""
+        with self.connection:
+            self.connection.execute("DELETE FROM spool WHERE seq <= ?", (up_to_seq,))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def checkpoint(self):
+        """把 WAL 合并回主文件并截断 (缓冲排空后调用，回收磁盘空间)"""
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.connection.close()
+
+
+class SpoolReplayer:
+    """
+    把缓冲中的读数按批次重放到 MySQL。
+    ensure_schema 为 True 时，首次重放前确认 voltage_readings.ingest_key 列存在
+    (每个实例只检查一次)。
+    """
+
+    def __init__(
+        self,
+        spool,
+        batch_size=5000,
+        write_batch=insert_spooled_readings,
+        ensure_schema=True,
+    ):
+        self.spool = spool
+        self.batch_size = batch_size
+        # write_batch(connection, rows) -> (新写入行数, 重复行数, 丢弃的行)，出错时抛出 Error
+        self.write_batch = write_batch
+        self.schema_checked = not ensure_schema
+
+    def replay(self, connection, max_batches=None):
+        """
+        重放直到缓冲为空 (或达到 max_batches)。某一批写入失败时停止，
+        该批保留在缓冲中。返回统计字典
+        {"inserted", "duplicates", "rejected", "batches", "seconds", "error"}。
+        无法写入的行 (例如测试桩已被删除) 输出后随该批一起从缓冲中删除。
+        """
+        stats = {
+            "inserted": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "batches": 0,
+            "seconds": 0.0,
+            "error": None,
+        }
+        started = time.perf_counter()
+        if not self.schema_checked:
+            if not ensure_ingest_key_column(connection):
+                stats["error"] = "voltage_readings.ingest_key 列不可用"
+                return stats
+            self.schema_checked = True
+        while max_batches is None or stats["batches"] < max_batches:
+            rows = self.spool.peek(self.batch_size)
+            if not rows:
+                self.spool.checkpoint()
+                break
+            try:
+                inserted, duplicates, rejected = self.write_batch(
+                    connection, [row[1:] for row in rows]
+                )
+            except Error as e:
+                stats["error"] = str(e)
+                print(f"重放缓冲读数失败，稍后重试: '{e}'")
+                break
+            self.spool.ack(rows[-1][0])
+            for ingest_key, reason in rejected:
+                print(f"缓冲中的读数 {ingest_key} 无法写入，已丢弃: {reason}")
+            stats["inserted"] += inserted
+            stats["duplicates"] += duplicates
+            stats["rejected"] += len(rejected)
+            stats["batches"] += 1
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+
+
+def _format_rate(count, seconds):
+    return f"{count / seconds:,.0f} 条/秒" if seconds > 0 else "-"
+
+
+def status(args):
+    spool = ReadingSpool(args.spool)
+    try:
+        pending = len(spool)
+        oldest = spool.peek(1)
+        print(f"缓冲文件: {args.spool}，待重放 {pending} 条")
+        if oldest:
+            print(f"最早的读数: {oldest[0][4]}")
+    finally:
+        spool.close()
+    return 0
+
+
+def replay(args):
+    spool = ReadingSpool(args.spool)
+    try:
+        with pooled_connection() as conn:
+            if not (conn and conn.is_connected()):
+                print(f"无法连接到数据库，{len(spool)} 条读数保留在缓冲中。")
+                return 1
+            stats = SpoolReplayer(spool, args.batch_size).replay(conn)
+        print(
+            f"重放完成: 新写入 {stats['inserted']} 条，重复 {stats['duplicates']} 条，"
+            f"丢弃 {stats['rejected']} 条，"
+            f"{stats['batches']} 批，耗时 {stats['seconds']:.1f} 秒 "
+            f"({_format_rate(stats['inserted'] + stats['duplicates'], stats['seconds'])})，"
+            f"剩余 {len(spool)} 条"
+        )
+        return 0 if stats["error"] is None else 1
+    finally:
+        spool.close()
+
+
+def benchmark(args):
+    """
+    向临时缓冲追加 N 条读数后全部重放，分别测量追加与重放的吞吐量。
+    --target null 只测缓冲自身 (读取 + 删除) 的开销；--target mysql 写入真实数据库
+    (会向 voltage_readings 写入 N 条模拟读数，请使用测试库)。
+    """
+    directory = tempfile.mkdtemp(prefix="spool-benchmark-")
+    path = os.path.join(directory, "benchmark.spool")
+    spool = ReadingSpool(path)
+    try:
+        start_time = datetime.now() - timedelta(seconds=args.readings)
+        append_started = time.perf_counter()
+        chunk = 100000
+        for offset in range(0, args.readings, chunk):
+            count = min(chunk, args.readings - offset)
+            spool.append(
+                (
+                    (offset + i) % args.piles + 1,
+                    -1.0,
+                    start_time + timedelta(seconds=offset + i),
+                )
+                for i in range(count)
+            )
+        append_seconds = time.perf_counter() - append_started
+        size_mb = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        ) / (1024 * 1024)
+        print(
+            f"追加 {args.readings} 条: {append_seconds:.1f} 秒 "
+            f"({_format_rate(args.readings, append_seconds)})，缓冲文件 {size_mb:.0f} MB"
+        )
+
+        if args.target == "null":
+            replayer = SpoolReplayer(
+                spool,
+                args.batch_size,
+                write_batch=lambda conn, rows: (len(rows), 0, []),
+                ensure_schema=False,
+            )
+            stats = replayer.replay(None)
+        else:
+            with pooled_connection() as conn:
+                if not (conn and conn.is_connected()):
+                    print("无法连接到数据库。")
+                    return 1
+                stats = SpoolReplayer(spool, args.batch_size).replay(conn)
+        print(
+            f"重放 ({args.target}) {stats['inserted'] + stats['duplicates']} 条: "
+            f"{stats['seconds']:.1f} 秒 "
+            f"({_format_rate(stats['inserted'] + stats['duplicates'], stats['seconds'])})，"
+            f"批大小 {args.batch_size}，剩余 {len(spool)} 条"
+        )
+        return 0 if stats["error"] is None else 1
+    finally:
+        spool.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地读数缓冲工具")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    status_parser = subparsers.add_parser("status", help="查看缓冲中待重放的读数")
+    status_parser.add_argument("--spool", default=DEFAULT_SPOOL_PATH)
+    status_parser.set_defaults(func=status)
+
+    replay_parser = subparsers.add_parser("replay", help="把缓冲中的读数写入数据库")
+    replay_parser.add_argument("--spool", default=DEFAULT_SPOOL_PATH)
+    replay_parser.add_argument("--batch-size", type=int, default=5000)
+    replay_parser.set_defaults(func=replay)
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark", help="测量大量积压读数的追加与追赶 (重放) 吞吐量"
+    )
+    benchmark_parser.add_argument("--readings", type=int, default=2000000)
+    benchmark_parser.add_argument("--piles", type=int, default=1000)
+    benchmark_parser.add_argument("--batch-size", type=int, default=5000)
+    benchmark_parser.add_argument(
+        "--target",
+        choices=["null", "mysql"],
+        default="null",
+        help="null 只测缓冲开销，mysql 写入真实数据库",
+    )
+    benchmark_parser.set_defaults(func=benchmark)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
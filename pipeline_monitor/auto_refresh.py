@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+自动刷新的增量合并与轮询间隔调整。
+
+自动刷新以 voltage_readings 的最大 id 作为高水位标记，每次读取水位附近之后的新读数，
+合并进内存中的最新电压字典，并只把发生变化的测试桩写入图层。
+"""
+
+import time
+from collections import deque
+
+
+def merge_latest_readings(latest_voltages, readings):
+    """
+    把新读数合并进最新电压字典 {pile_id: {pile_id, voltage, reading_timestamp}}。
+    同一测试桩只保留时间戳最新的读数 (迟到的旧读数不会覆盖更新的值)。
+    返回最新电压发生变化的测试桩 ID 集合。
+    """
+    changed = set()
+    for reading in readings:
+        pile_id = reading["pile_id"]
+        current = latest_voltages.get(pile_id)
+        if (
+            current is not None
+            and current.get("reading_timestamp") is not None
+            and reading["reading_timestamp"] < current["reading_timestamp"]
+        ):
+            continue
+        if current is None or current.get("voltage") != reading["voltage"]:
+            changed.add(pile_id)
+        latest_voltages[pile_id] = {
+            "pile_id": pile_id,
+            "voltage": reading["voltage"],
+            "reading_timestamp": reading["reading_timestamp"],
+        }
+    return changed
+
+
+class ReadingWatermark:
+    """
+    自动刷新的读数 ID 水位。
+
+    自增 id 在插入时分配，而不是按提交顺序可见：id 较小的事务可能晚于 id 较大的
+    事务提交，只查询 id 大于已见最大 id 的读数会永久漏掉它们。因此每次轮询都从
+    grace_seconds 秒前的水位 (最多回退 max_lookback 个 id) 开始重新读取，
+    并按 id 去掉已经合并过的读数。上一次读满一批时从该批末尾继续，保证积压能读完。
+    """
+
+    def __init__(self, max_id, grace_seconds=30, max_lookback=5000, clock=None):
+        self.grace_seconds = grace_seconds
+        self.max_lookback = max_lookback
+        self.clock = clock or time.monotonic
+        # (记录时间, 当时的最大 id)，按时间升序
+        self._marks = deque([(self.clock(), max_id)])
+        self._merged_ids = set()  # 回退窗口内已合并的读数 id
+        self._resume_after = None  # 上一次读满一批时该批最后的 id
+
+    @property
+    def max_id(self):
+        return self._marks[-1][1]
+
+    def _floor(self):
+        """回退窗口的下界：grace_seconds 秒前的水位，且最多回退 max_lookback 个 id"""
+        now = self.clock()
+        while len(self._marks) > 1 and now - self._marks[1][0] >= self.grace_seconds:
+            self._marks.popleft()
+        settled = (
+            self._marks[0][1] if now - self._marks[0][0] >= self.grace_seconds else 0
+        )
+        return max(settled, self.max_id - self.max_lookback, 0)
+
+    def after_id(self):
+        """下一次轮询应读取 id 大于该值的读数"""
+        floor = self._floor()
+        if self._resume_after is not None:
+            return max(floor, self._resume_after)
+        return floor
+
+    def accept(self, readings, batch_full=False):
+        """记录一次轮询的结果 (按 id 升序)，推进水位并返回其中尚未合并过的读数"""
+        new_readings = [
+            reading for reading in readings if reading["id"] not in self._merged_ids
+        ]
+        self._merged_ids.update(reading["id"] for reading in new_readings)
+        if readings and readings[-1]["id"] > self.max_id:
+            self._marks.append((self.clock(), readings[-1]["id"]))
+        self._resume_after = readings[-1]["id"] if batch_full and readings else None
+        floor = self._floor()
+        self._merged_ids = {
+            reading_id for reading_id in self._merged_ids if reading_id > floor
+        }
+        return new_readings
+
+
+class AdaptiveInterval:
+    """
+    根据每次轮询到的新读数条数调整下一次轮询的间隔 (毫秒)。
+
+    - 读满一批 (还有积压)：立即以最短间隔继续读取；
+    - 新读数达到 busy_rows：间隔减半，跟上写入速度；
+    - 没有新读数：间隔逐步放大到 maximum，减轻数据库压力；
+    - 其余情况保持不变。
+    """
+
+    def __init__(self, minimum=5000, maximum=120000, initial=30000, busy_rows=100):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.busy_rows = busy_rows
+        self.initial = max(minimum, min(initial, maximum))
+        self.current = self.initial
+
+    def update(self, row_count, batch_full=False):
+        """记录本次轮询的读数条数，返回下一次轮询的间隔"""
+        if batch_full:
+            self.current = self.minimum
+        elif row_count >= self.busy_rows:
+            self.current = max(self.minimum, self.current // 2)
+        elif row_count == 0:
+            self.current = min(self.maximum, int(self.current * 1.5))
+        return self.current
+
+    def reset(self):
+        """恢复到初始间隔 (例如重新开启自动刷新时)"""
+        self.current = self.initial
+        return self.current
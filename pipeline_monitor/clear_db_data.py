@@ -1,5 +1,5 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 import logging  # Import logging
 
 # Initialize logger for this module
@@ -45,6 +45,19 @@ def clear_voltage_readings_table():
     try:
         query = "DELETE FROM voltage_readings"
         cursor.execute(query)
+        # 同步清空由写入端维护的最新电压表与汇总表
+        for derived_table in (
+            "pile_latest_voltage",
+            "voltage_rollup_hourly",
+            "voltage_rollup_daily",
+        ):
+            try:
+                cursor.execute(f"DELETE FROM {derived_table}")
+            except Error as e:
+                # 未迁移的数据库中没有派生表，跳过 (单条语句出错不会回滚整个事务)
+                if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                    raise
+                logger.info(f"{derived_table} 表不存在，跳过。")
         conn.commit()
         logger.info("成功清空 voltage_readings 表中的数据。")  # Replaced print
     except Error as e:
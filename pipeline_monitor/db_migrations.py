@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+数据库结构版本管理。
+
+每个迁移步骤带有递增的版本号，已执行的版本记录在 schema_migrations 表中，
+upgrade() 只执行尚未应用的步骤。迁移步骤均可重复执行 (例如索引已存在时跳过)，
+因此也可以安全地应用到手工建表的旧数据库上。
+
+命令行用法 (在插件目录下运行):
+    python db_migrations.py status    查看当前版本
+    python db_migrations.py upgrade   升级到最新版本
+    python db_migrations.py verify    用 EXPLAIN 检查关键查询是否命中索引
+"""
+
+import sys
+from datetime import datetime, timedelta
+import logging  # Import logging
+
+from mysql.connector import Error, errorcode
+
+# 派生表的结构与回填查询只在写入端 (db_py/db_operations.py) 定义一处。
+# 本模块既作为插件包的一部分，也会作为脚本在插件目录下直接运行
+try:
+    from .db_py.db_operations import (
+        BACKFILL_VOLTAGE_ROLLUP_QUERY,
+        CREATE_PILE_LATEST_VOLTAGE_TABLE,
+        CREATE_VOLTAGE_ROLLUP_TABLE,
+        PLACEHOLDER_VOLTAGE,
+        REBUILD_PILE_LATEST_VOLTAGE_QUERY,
+        VOLTAGE_ROLLUPS,
+    )
+except ImportError:
+    from db_py.db_operations import (
+        BACKFILL_VOLTAGE_ROLLUP_QUERY,
+        CREATE_PILE_LATEST_VOLTAGE_TABLE,
+        CREATE_VOLTAGE_ROLLUP_TABLE,
+        PLACEHOLDER_VOLTAGE,
+        REBUILD_PILE_LATEST_VOLTAGE_QUERY,
+        VOLTAGE_ROLLUPS,
+    )
+
+# Initialize logger for this module
+logger = logging.getLogger(__name__)
+# Configure basic logging to console if no handlers are already configured
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+
+
+CREATE_SCHEMA_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def _find_index(cursor, table, columns, unique=False):
+    """
+    按列顺序查找已有索引 (而非按名称)，这样手工建库时以其他名称创建的
+    等价索引也会被识别。找到时返回索引名，否则返回 None。
+    """
+    cursor.execute(
+        "SELECT index_name, MIN(non_unique), "
+        "GROUP_CONCAT(column_name ORDER BY seq_in_index) "
+        "FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s "
+        "GROUP BY index_name",
+        (table,),
+    )
+    wanted = ",".join(columns).lower()
+    for index_name, non_unique, index_columns in cursor.fetchall():
+        if (index_columns or "").lower() != wanted:
+            continue
+        if unique and non_unique:
+            continue
+        return index_name
+    return None
+
+
+def _add_index_if_missing(cursor, table, index_name, columns, unique=False):
+    """等价索引不存在时才创建，使迁移可以重复执行"""
+    existing = _find_index(cursor, table, columns, unique)
+    if existing:
+        logger.debug(f"{table} 上已存在等价索引 {existing}，跳过。")
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cursor.execute(
+        f"ALTER TABLE {table} ADD {kind} {index_name} ({', '.join(columns)})"
+    )
+    logger.info(f"已创建索引 {table}.{index_name} ({', '.join(columns)})")
+
+
+def _migration_1_base_tables(cursor):
+    """创建 test_piles 与 voltage_readings 基础表"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS test_piles (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) NOT NULL,
+            longitude DECIMAL(10, 6) NOT NULL,
+            latitude DECIMAL(10, 6) NOT NULL,
+            pipeline_id VARCHAR(50) NULL,
+            description VARCHAR(255) NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS voltage_readings (
+            id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            pile_id INT NOT NULL,
+            voltage DECIMAL(10, 3) NOT NULL,
+            reading_timestamp DATETIME NOT NULL,
+            CONSTRAINT fk_voltage_readings_pile
+                FOREIGN KEY (pile_id) REFERENCES test_piles (id)
+        )
+        """)
+
+
+def _migration_2_pile_name_unique(cursor):
+    """test_piles.name 唯一索引 (get_pile_by_name / insert_test_pile_if_not_exists)"""
+    _add_index_if_missing(cursor, "test_piles", "uq_test_piles_name", ["name"], True)
+
+
+def _migration_3_readings_pile_time(cursor):
+    """voltage_readings (pile_id, reading_timestamp) 复合索引 (历史曲线与最新电压查询)"""
+    _add_index_if_missing(
+        cursor,
+        "voltage_readings",
+        "idx_readings_pile_time",
+        ["pile_id", "reading_timestamp"],
+    )
+
+
+def _migration_4_pile_latest_voltage(cursor):
+    """
+    创建 pile_latest_voltage 物化表并根据全部历史数据重建。
+    表可能已由批量导入等工具提前创建且只有部分测试桩，因此无论表是否已存在都重建。
+    """
+    cursor.execute(CREATE_PILE_LATEST_VOLTAGE_TABLE)
+    cursor.execute("DELETE FROM pile_latest_voltage")
+    cursor.execute(REBUILD_PILE_LATEST_VOLTAGE_QUERY)
+
+
+def _migration_5_voltage_rollups(cursor):
+    """
+    创建按小时 / 按天的电压汇总表并根据全部历史数据回填。
+    表可能已由批量导入等工具提前创建且只有部分数据，因此无论表是否已存在都重新回填。
+    """
+    for table, (_, bucket_expression) in VOLTAGE_ROLLUPS.items():
+        cursor.execute(CREATE_VOLTAGE_ROLLUP_TABLE.format(table=table))
+        cursor.execute(f"DELETE FROM {table}")
+        # 以 DATETIME 的取值范围作为时间范围，回填全部历史
+        cursor.execute(
+            BACKFILL_VOLTAGE_ROLLUP_QUERY.format(
+                table=table, bucket_expression=bucket_expression
+            ),
+            ("1000-01-01 00:00:00", "9999-12-31 23:59:59", PLACEHOLDER_VOLTAGE),
+        )
+
+
+def _migration_6_readings_ingest_key(cursor):
+    """
+    voltage_readings.ingest_key 幂等键及唯一索引。
+    本地缓冲 (db_py/spool.py) 中的读数重放时按该键去重，已有数据保持 NULL。
+    """
+    if not _column_exists(cursor, "voltage_readings", "ingest_key"):
+        cursor.execute(
+            "ALTER TABLE voltage_readings ADD COLUMN ingest_key CHAR(32) NULL"
+        )
+    _add_index_if_missing(
+        cursor, "voltage_readings", "uq_readings_ingest_key", ["ingest_key"], True
+    )
+
+
+# (版本号, 说明, 执行函数)，版本号必须严格递增，已发布的步骤不要再修改
+MIGRATIONS = [
+    (1, "创建 test_piles 与 voltage_readings 基础表", _migration_1_base_tables),
+    (2, "test_piles.name 唯一索引", _migration_2_pile_name_unique),
+    (
+        3,
+        "voltage_readings (pile_id, reading_timestamp) 复合索引",
+        _migration_3_readings_pile_time,
+    ),
+    (4, "创建 pile_latest_voltage 物化表", _migration_4_pile_latest_voltage),
+    (5, "创建小时/天电压汇总表", _migration_5_voltage_rollups),
+    (6, "voltage_readings.ingest_key 幂等键", _migration_6_readings_ingest_key),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_current_version(connection):
+    """返回数据库当前的结构版本，未做过迁移时返回 0，查询失败返回 None"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_migrations")
+        version = cursor.fetchone()[0]
+        return version or 0
+    except Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return 0
+        logger.error(f"查询数据库结构版本时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def upgrade(connection, target_version=None):
+    """
+    将数据库升级到 target_version (默认最新版本)。
+    MySQL 的 DDL 会隐式提交，因此每个步骤成功后立即记录版本号；
+    某一步失败时停止，已完成的步骤保留。返回升级后的版本号，失败返回 None。
+    """
+    target_version = LATEST_VERSION if target_version is None else target_version
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_SCHEMA_MIGRATIONS_TABLE)
+        connection.commit()
+    except Error as e:
+        logger.error(f"创建 schema_migrations 表时发生错误: '{e}'")
+        cursor.close()
+        return None
+
+    current_version = get_current_version(connection)
+    if current_version is None:
+        cursor.close()
+        return None
+
+    try:
+        for version, description, migrate in MIGRATIONS:
+            if version <= current_version or version > target_version:
+                continue
+            logger.info(f"正在执行迁移 {version}: {description}")
+            try:
+                migrate(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description) "
+                    "VALUES (%s, %s)",
+                    (version, description),
+                )
+                connection.commit()
+            except Error as e:
+                connection.rollback()
+                logger.error(f"迁移 {version} ({description}) 失败: '{e}'")
+                return None
+            current_version = version
+        logger.info(f"数据库结构已是版本 {current_version}。")
+        return current_version
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def _explain_checks():
+    """
+    (说明, 查询, 参数, 期望使用的索引) 列表，与 db_operations 中的关键查询一致。
+    期望索引为 None 时只检查是否退化为全表扫描。
+    """
+    end_time = datetime.now()
+    start_time = end_time - timedelta(hours=24)
+    return [
+        (
+            "get_voltage_readings_for_pile",
+            "SELECT id, pile_id, voltage, reading_timestamp FROM voltage_readings "
+            "WHERE pile_id = %s AND reading_timestamp >= %s "
+            "AND reading_timestamp <= %s ORDER BY reading_timestamp ASC",
+            (0, start_time, end_time),
+            "idx_readings_pile_time",
+        ),
+        (
+            "get_voltage_readings_for_piles",
+            "SELECT id, pile_id, voltage, reading_timestamp FROM voltage_readings "
+            "WHERE pile_id IN (%s, %s) AND reading_timestamp >= %s "
+            "AND reading_timestamp <= %s ORDER BY pile_id, reading_timestamp",
+            (0, 1, start_time, end_time),
+            "idx_readings_pile_time",
+        ),
+        (
+            "get_pile_by_name",
+            "SELECT id, name FROM test_piles WHERE name = %s",
+            ("",),
+            "uq_test_piles_name",
+        ),
+        (
+            "rebuild_pile_latest_voltage",
+            "SELECT pile_id, MAX(reading_timestamp) FROM voltage_readings "
+            "GROUP BY pile_id",
+            (),
+            None,
+        ),
+    ]
+
+
+def verify_query_plans(connection, min_rows=1000):
+    """
+    对关键查询执行 EXPLAIN，返回警告信息列表 (为空表示执行计划正常)。
+    当估计扫描行数不少于 min_rows 且出现全表扫描 (type=ALL) 或未使用期望的索引时告警；
+    小表上优化器本就可能选择全表扫描，因此不做告警。
+    """
+    warnings = []
+    cursor = connection.cursor(dictionary=True)
+    try:
+        for name, query, params, expected_key in _explain_checks():
+            try:
+                cursor.execute("EXPLAIN " + query, params)
+                plan = cursor.fetchall()
+            except Error as e:
+                warnings.append(f"{name}: 无法获取执行计划 ('{e}')")
+                continue
+            for row in plan:
+                rows = row.get("rows") or 0
+                if rows < min_rows:
+                    continue
+                if row.get("type") == "ALL":
+                    warnings.append(
+                        f"{name}: 对表 {row.get('table')} 执行全表扫描 (估计 {rows} 行)"
+                    )
+                elif expected_key and row.get("key") != expected_key:
+                    warnings.append(
+                        f"{name}: 未使用索引 {expected_key} (实际为 {row.get('key')})"
+                    )
+    finally:
+        if cursor:
+            cursor.close()
+    for message in warnings:
+        logger.warning(f"查询执行计划退化 - {message}")
+    return warnings
+
+
+def check_schema(connection):
+    """
+    插件启动时调用：检查结构版本是否落后并验证关键查询的执行计划。
+    不执行任何 DDL，返回警告信息列表。
+    """
+    warnings = []
+    version = get_current_version(connection)
+    if version is not None and version < LATEST_VERSION:
+        warnings.append(
+            f"数据库结构版本为 {version}，低于插件所需的 {LATEST_VERSION}，"
+            "请在插件目录下运行 python db_migrations.py upgrade"
+        )
+    warnings.extend(verify_query_plans(connection))
+    return warnings
+
+
+def main(argv=None):
+    """命令行入口"""
+    import argparse
+
+    import db_operations
+
+    parser = argparse.ArgumentParser(description="管线监控数据库结构迁移工具")
+    parser.add_argument("command", choices=["status", "upgrade", "verify"])
+    parser.add_argument("--target", type=int, default=None, help="升级到指定版本")
+    args = parser.parse_args(argv)
+
+    conn = db_operations.create_connection()
+    if not (conn and conn.is_connected()):
+        logger.error("无法连接到数据库。")
+        return 1
+    try:
+        if args.command == "status":
+            version = get_current_version(conn)
+            logger.info(f"当前结构版本: {version}，最新版本: {LATEST_VERSION}")
+            return 0 if version is not None else 1
+        if args.command == "upgrade":
+            return 0 if upgrade(conn, args.target) is not None else 1
+        return 0 if not verify_query_plans(conn) else 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
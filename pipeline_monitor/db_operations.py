@@ -3,8 +3,18 @@
 import mysql.connector
 from mysql.connector import Error
 from datetime import datetime, timedelta
+from contextlib import contextmanager
+import threading
+import time
 import logging  # Import logging
 
+# 表示缺失读数的占位电压只在写入端 (db_py/db_operations.py) 定义一处。
+# 本模块既作为插件包的一部分，也会被独立脚本直接导入
+try:
+    from .db_py.db_operations import PLACEHOLDER_VOLTAGE
+except ImportError:
+    from db_py.db_operations import PLACEHOLDER_VOLTAGE
+
 # Initialize logger for this module
 logger = logging.getLogger(__name__)
 # Configure basic logging to console if no handlers are already configured
@@ -38,6 +48,215 @@ def create_connection():
     return connection
 
 
+class ConnectionPool:
+    """
+    有界的数据库连接池。
+
+    连接在使用后归还池中复用，避免每次刷新、点击或定时任务都重新进行
+    TCP 握手与认证。支持：
+    - 最大连接数限制 (max_size)，池满时借用方阻塞等待，超过 checkout_timeout 返回 None
+    - 空闲超过 idle_timeout 秒的连接会被关闭回收
+    - 空闲超过 health_check_interval 秒的连接在借出前会 ping 一次，失效则丢弃重建
+    """
+
+    def __init__(
+        self,
+        config=None,
+        max_size=5,
+        idle_timeout=300,
+        checkout_timeout=10,
+        health_check_interval=30,
+        connect=None,
+    ):
+        self.config = dict(config if config is not None else db_config)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        # 允许注入自定义的连接工厂 (例如测试)，默认使用 mysql.connector.connect
+        self._connect = connect or (lambda: mysql.connector.connect(**self.config))
+
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = []  # [(connection, 归还时间), ...]，按 LIFO 使用以保持热连接
+        self._size = 0  # 当前已创建 (空闲 + 借出) 的连接数
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        """
+        从池中借出一个可用连接。
+        池已满时最多等待 timeout 秒 (默认 checkout_timeout)，超时或连接失败返回 None。
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            candidate = None
+            with self._condition:
+                if self._closed:
+                    logger.error("连接池已关闭，无法借出连接。")
+                    return None
+                self._evict_idle_locked()
+                if self._idle:
+                    candidate, returned_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1  # 先占位，在锁外建立连接
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logger.error(
+                            f"等待数据库连接超时 ({timeout} 秒)，连接池已满 (max_size={self.max_size})。"
+                        )
+                        return None
+                    self._condition.wait(remaining)
+                    continue
+
+            if candidate is not None:
+                if self._is_healthy(candidate, returned_at):
+                    return candidate
+                self._discard(candidate)
+                continue
+
+            try:
+                connection = self._connect()
+            except Error as e:
+                logger.error(f"连接数据库时发生错误: '{e}'")
+                connection = None
+            if connection is None:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                return None
+            return connection
+
+    def release(self, connection):
+        """将连接归还池中；已断开的连接会被直接丢弃"""
+        if connection is None:
+            return
+        try:
+            healthy = connection.is_connected()
+            if healthy and getattr(connection, "in_transaction", False):
+                # 归还前回滚未提交的事务，避免污染下一个使用者
+                connection.rollback()
+        except Error as e:
+            logger.warning(f"归还连接时检测到异常，连接将被丢弃: '{e}'")
+            healthy = False
+
+        if not healthy:
+            self._discard(connection)
+            return
+
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """以上下文管理器方式借出连接，退出时自动归还。无法获取时返回 None"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close_all(self):
+        """关闭所有空闲连接，并拒绝后续借出；借出中的连接在归还时关闭"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """返回连接池当前状态，便于调试"""
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+    def _evict_idle_locked(self):
+        """(需持有锁) 关闭空闲时间超过 idle_timeout 的连接"""
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        kept = []
+        for connection, returned_at in self._idle:
+            if now - returned_at > self.idle_timeout:
+                self._size -= 1
+                self._close_quietly(connection)
+            else:
+                kept.append((connection, returned_at))
+        self._idle = kept
+
+    def _is_healthy(self, connection, returned_at):
+        """刚归还不久的连接直接复用，否则 ping 一次确认服务器端未断开"""
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error as e:
+            logger.warning(f"连接池中的连接已失效，将重新建立: '{e}'")
+            return False
+
+    def _discard(self, connection):
+        self._close_quietly(connection)
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+
+# 进程内共享的连接池，首次使用时创建
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """返回进程内共享的连接池实例"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = ConnectionPool(db_config)
+        return _pool
+
+
+@contextmanager
+def pooled_connection(timeout=None):
+    """
+    从共享连接池借出一个连接，用法:
+
+        with db_operations.pooled_connection() as conn:
+            if conn is None:
+                ...  # 无法连接数据库
+    """
+    with get_pool().connection(timeout) as connection:
+        yield connection
+
+
+def close_pool():
+    """关闭共享连接池 (插件卸载或进程退出时调用)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
 def get_pile_by_name(connection, name):
     """根据名称查询测试桩"""
     cursor = connection.cursor(dictionary=True)
@@ -76,8 +295,55 @@ def get_all_test_piles(connection):
             cursor.close()
 
 
-def get_voltage_readings_for_pile(connection, pile_id, start_time=None, end_time=None):
-    """获取特定测试桩的电压读数，可根据时间范围筛选"""
+def _voltage_series_module():
+    """延迟导入 voltage_series (本模块既作为插件包的一部分，也会被独立脚本直接导入)"""
+    try:
+        from . import voltage_series
+    except ImportError:
+        import voltage_series
+    return voltage_series
+
+
+def _voltage_series_class():
+    return _voltage_series_module().VoltageSeries
+
+
+def _db_migrations_module():
+    """延迟导入 db_migrations (同 _voltage_series_module)"""
+    try:
+        from . import db_migrations
+    except ImportError:
+        import db_migrations
+    return db_migrations
+
+
+# 派生表由对应的数据库迁移创建并根据历史数据填充。结构版本低于该版本时，
+# 派生表可能不存在，也可能已被其他工具提前创建但只有部分数据，不能作为读取依据
+PILE_LATEST_VOLTAGE_SCHEMA_VERSION = 4
+VOLTAGE_ROLLUPS_SCHEMA_VERSION = 5
+
+
+def _schema_version_at_least(connection, version):
+    """数据库结构版本不低于 version 时返回 True，版本查询失败时返回 False"""
+    current = _db_migrations_module().get_current_version(connection)
+    return current is not None and current >= version
+
+
+def get_voltage_readings_for_pile(
+    connection, pile_id, start_time=None, end_time=None, as_series=False
+):
+    """
+    获取特定测试桩的电压读数，可根据时间范围筛选。
+    as_series 为 True 时流式读取并返回按列存储的 VoltageSeries
+    (datetime64 时间戳、float32 电压与有效性掩码，占位值已标记为无效)，
+    否则返回字典列表。
+    """
+    if as_series:
+        batches = iter_voltage_readings_for_pile(
+            connection, pile_id, start_time, end_time
+        )
+        return _voltage_series_class().from_batches(batches)
+
     cursor = connection.cursor(dictionary=True)
     query = "SELECT id, pile_id, voltage, reading_timestamp FROM voltage_readings WHERE pile_id = %s"
     params = [pile_id]
@@ -105,8 +371,265 @@ def get_voltage_readings_for_pile(connection, pile_id, start_time=None, end_time
             cursor.close()
 
 
+def get_voltage_buckets(
+    connection, pile_id, start_time, end_time, pixel_width, points_per_pixel=1
+):
+    """
+    图表查询模式：在数据库端把 [start_time, end_time] 均分为约
+    pixel_width * points_per_pixel 个时间段，按段计算最小/最大/平均电压。
+    传输与绘制的点数只取决于图表宽度，而与采样频率无关。占位值不参与聚合。
+    返回 VoltageBuckets (按时间升序)，出错时返回 None。
+    """
+    bucket_count = max(1, int(pixel_width * points_per_pixel))
+    span_seconds = max(1, int((end_time - start_time).total_seconds()))
+    bucket_seconds = max(1, -(-span_seconds // bucket_count))  # 向上取整
+
+    cursor = connection.cursor()
+    # TIMESTAMPDIFF 与会话时区无关；分段起点在 Python 端由段号换算
+    query = (
+        "SELECT TIMESTAMPDIFF(SECOND, %s, reading_timestamp) DIV %s AS bucket, "
+        "MIN(voltage), MAX(voltage), AVG(voltage), COUNT(*) "
+        "FROM voltage_readings "
+        "WHERE pile_id = %s AND reading_timestamp >= %s AND reading_timestamp <= %s "
+        "AND voltage <> %s "
+        "GROUP BY bucket ORDER BY bucket"
+    )
+    params = (
+        start_time,
+        bucket_seconds,
+        pile_id,
+        start_time,
+        end_time,
+        PLACEHOLDER_VOLTAGE,
+    )
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    except Error as e:
+        logger.error(f"按时间段聚合测试桩 ID {pile_id} 的电压时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+    import numpy as np  # 延迟导入，只有需要数组时才加载 NumPy
+
+    buckets = np.array([row[0] for row in rows], dtype=np.int64)
+    starts = np.datetime64(start_time, "s") + buckets * np.timedelta64(
+        bucket_seconds, "s"
+    )
+    logger.debug(
+        f"测试桩 {pile_id} 按 {bucket_seconds} 秒分段聚合，得到 {len(rows)} 段。"
+    )
+    return _voltage_series_module().VoltageBuckets(
+        starts,
+        [float(row[1]) for row in rows],
+        [float(row[2]) for row in rows],
+        [float(row[3]) for row in rows],
+        [row[4] for row in rows],
+    )
+
+
+# 流式读取时 NumPy 结构化数组的字段定义 (列名, dtype)
+READING_FIELDS = [
+    ("id", "i8"),
+    ("pile_id", "i4"),
+    ("voltage", "f8"),
+    ("reading_timestamp", "datetime64[s]"),
+]
+
+
+def _iter_batches(connection, query, params, batch_size):
+    """
+    用非缓冲游标执行查询并按 batch_size 分批 fetchmany，逐批产出行元组列表。
+    行在服务器端逐批读取，客户端内存只与批大小有关。
+    调用方提前停止迭代 (关闭生成器) 时关闭连接而不是读完剩余结果：非缓冲游标
+    必须读完结果连接才能执行下一条语句，而剩余结果可能是多年的读数。
+    已关闭的连接归还连接池时会被丢弃。
+    """
+    cursor = connection.cursor(buffered=False)
+    unread = False
+    try:
+        cursor.execute(query, params)
+        unread = True
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                unread = False
+                return
+            yield rows
+    finally:
+        if unread:
+            try:
+                connection.close()
+            except Error:
+                pass
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+
+def _rows_to_layout(rows, columns, layout, dtype=None):
+    """把一批行元组转换为 "rows" (字典列表)、"columns" (按列的元组) 或 "structured" (NumPy)"""
+    if layout == "rows":
+        return [dict(zip(columns, row)) for row in rows]
+    if layout == "columns":
+        return tuple(zip(*rows))
+    if layout == "structured":
+        import numpy as np  # 延迟导入，只有需要数组时才加载 NumPy
+
+        return np.array([tuple(row) for row in rows], dtype=dtype)
+    raise ValueError(f"不支持的批次格式: {layout}")
+
+
+def iter_voltage_readings_for_pile(
+    connection,
+    pile_id,
+    start_time=None,
+    end_time=None,
+    batch_size=10000,
+    layout="structured",
+):
+    """
+    流式读取特定测试桩的电压读数 (按时间升序)，每次产出一批，最多 batch_size 行。
+    layout 为 "structured" 时每批是 NumPy 结构化数组 (字段见 READING_FIELDS)，
+    "columns" 时是 (ids, pile_ids, voltages, timestamps) 元组，"rows" 时是字典列表。
+    适合导出或绘制多年的原始读数；查询出错时记录日志并结束迭代。
+    """
+    query = "SELECT id, pile_id, voltage, reading_timestamp FROM voltage_readings WHERE pile_id = %s"
+    params = [pile_id]
+    if start_time:
+        query += " AND reading_timestamp >= %s"
+        params.append(start_time)
+    if end_time:
+        query += " AND reading_timestamp <= %s"
+        params.append(end_time)
+    query += " ORDER BY reading_timestamp ASC"
+
+    columns = [name for name, _ in READING_FIELDS]
+    try:
+        for rows in _iter_batches(connection, query, tuple(params), batch_size):
+            if layout == "structured":
+                # DECIMAL 列需先转换为 float 才能放入 float64 字段
+                rows = [(r[0], r[1], float(r[2]), r[3]) for r in rows]
+            yield _rows_to_layout(rows, columns, layout, READING_FIELDS)
+    except Error as e:
+        logger.error(f"流式查询测试桩 ID {pile_id} 的电压读数时发生错误: '{e}'")
+
+
+def get_voltage_readings_for_piles(
+    connection, pile_ids, start_time=None, end_time=None, chunk_size=1000
+):
+    """
+    一次查询读取多个测试桩的电压读数 (WHERE pile_id IN (...))，代替逐个测试桩查询。
+    ID 列表按 chunk_size 分块，每块一条查询，结果流式读取。
+    返回 {pile_id: VoltageSeries}，每个请求的测试桩都有一项 (无数据时为空序列)；
+    某一块查询出错时，该块中的测试桩对应 None (而不是空的或只读到一部分的序列)，
+    调用方据此区分 "没有数据" 与 "读取失败"。
+    """
+    import numpy as np  # 延迟导入，只有需要数组时才加载 NumPy
+
+    VoltageSeries = _voltage_series_class()
+    pile_ids = list(dict.fromkeys(pile_ids))  # 去重并保持顺序
+    parts = {pile_id: [] for pile_id in pile_ids}
+
+    for offset in range(0, len(pile_ids), chunk_size):
+        chunk = pile_ids[offset : offset + chunk_size]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        query = (
+            "SELECT id, pile_id, voltage, reading_timestamp FROM voltage_readings "
+            f"WHERE pile_id IN ({placeholders})"
+        )
+        params = list(chunk)
+        if start_time:
+            query += " AND reading_timestamp >= %s"
+            params.append(start_time)
+        if end_time:
+            query += " AND reading_timestamp <= %s"
+            params.append(end_time)
+        # 按 (pile_id, reading_timestamp) 排序，与 idx_readings_pile_time 索引顺序一致
+        query += " ORDER BY pile_id, reading_timestamp"
+
+        try:
+            for rows in _iter_batches(connection, query, tuple(params), 10000):
+                batch = _rows_to_layout(
+                    [(r[0], r[1], float(r[2]), r[3]) for r in rows],
+                    None,
+                    "structured",
+                    READING_FIELDS,
+                )
+                # 批内已按 pile_id 排序，在 pile_id 变化处切分
+                boundaries = np.flatnonzero(np.diff(batch["pile_id"])) + 1
+                for group in np.split(batch, boundaries):
+                    parts[int(group["pile_id"][0])].append(group)
+        except Error as e:
+            logger.error(f"批量查询 {len(chunk)} 个测试桩的电压读数时发生错误: '{e}'")
+            for pile_id in chunk:
+                parts[pile_id] = None
+
+    return {
+        pile_id: None if pile_parts is None else VoltageSeries.from_batches(pile_parts)
+        for pile_id, pile_parts in parts.items()
+    }
+
+
+def iter_all_test_piles(connection, batch_size=10000, layout="rows"):
+    """
+    流式读取全部测试桩 (按 ID 升序)，每次产出最多 batch_size 个。
+    layout 为 "rows" (字典列表，经纬度为 float) 或 "columns" (按列的元组)。
+    查询出错时记录日志并结束迭代。
+    """
+    query = "SELECT id, name, longitude, latitude, pipeline_id, description, created_at FROM test_piles ORDER BY id"
+    columns = [
+        "id",
+        "name",
+        "longitude",
+        "latitude",
+        "pipeline_id",
+        "description",
+        "created_at",
+    ]
+    try:
+        for rows in _iter_batches(connection, query, (), batch_size):
+            # 与 get_all_test_piles 一致，经纬度转为 float 而不是 Decimal
+            rows = [
+                (r[0], r[1], float(r[2]), float(r[3]), r[4], r[5], r[6]) for r in rows
+            ]
+            yield _rows_to_layout(rows, columns, layout)
+    except Error as e:
+        logger.error(f"流式查询测试桩信息时发生错误: '{e}'")
+
+
 def get_latest_voltages(connection):
-    """获取每个测试桩的最新一条电压记录 (兼容旧版MySQL)"""
+    """
+    获取每个测试桩的最新一条电压记录。
+    数据库已迁移到版本 4 时按主键读取由写入端维护的 pile_latest_voltage 表
+    (O(测试桩数))；否则回退到对 voltage_readings 的全表聚合查询。
+    """
+    if not _schema_version_at_least(connection, PILE_LATEST_VOLTAGE_SCHEMA_VERSION):
+        logger.warning(
+            "数据库结构版本低于 4，pile_latest_voltage 表尚未填充，回退到全表聚合查询。"
+            "请在插件目录下运行 python db_migrations.py upgrade。"
+        )
+        return _get_latest_voltages_by_aggregation(connection)
+
+    cursor = connection.cursor(dictionary=True)
+    query = "SELECT pile_id, voltage, reading_timestamp FROM pile_latest_voltage"
+    try:
+        cursor.execute(query)
+        latest_voltages = {row["pile_id"]: row for row in cursor.fetchall()}
+        return latest_voltages
+    except Error as e:
+        logger.error(f"查询最新电压数据时发生错误: '{e}'")
+        return {}
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def _get_latest_voltages_by_aggregation(connection):
+    """获取每个测试桩的最新一条电压记录 (兼容旧版MySQL，需扫描全部历史数据)"""
     cursor = connection.cursor(dictionary=True)
     query = """
     SELECT
@@ -139,4 +662,110 @@ def get_latest_voltages(connection):
             cursor.close()
 
 
+def get_max_reading_id(connection):
+    """返回 voltage_readings 当前最大的 id (没有数据时为 0)，出错时返回 None"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM voltage_readings")
+        row = cursor.fetchone()
+        return int(row[0])
+    except Error as e:
+        logger.error(f"查询最大读数ID时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def get_readings_since(connection, after_id, limit=5000):
+    """
+    增量读取 id 大于 after_id 的电压读数 (按 id 升序，走主键范围扫描)，最多 limit 条。
+    读数 id 由数据库自增分配，可作为自动刷新的高水位标记；id 不按提交顺序可见，
+    调用方应从水位之下重新读取一段并去重 (见 auto_refresh.ReadingWatermark)。
+    出错时返回 None，调用方应保留原水位稍后重试。
+    """
+    cursor = connection.cursor(dictionary=True)
+    query = (
+        "SELECT id, pile_id, voltage, reading_timestamp FROM voltage_readings "
+        "WHERE id > %s ORDER BY id LIMIT %s"
+    )
+    try:
+        cursor.execute(query, (after_id, limit))
+        return cursor.fetchall()
+    except Error as e:
+        logger.error(f"增量查询 ID {after_id} 之后的电压读数时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+# 汇总粒度 -> 汇总表名 (由写入端增量维护，见 db_py/db_operations.py)
+ROLLUP_TABLES = {
+    "hourly": "voltage_rollup_hourly",
+    "daily": "voltage_rollup_daily",
+}
+
+
+def get_voltage_rollups(
+    connection,
+    pile_id,
+    granularity="daily",
+    start_time=None,
+    end_time=None,
+    as_series=False,
+):
+    """
+    读取测试桩按小时 ("hourly") 或按天 ("daily") 的电压汇总 (最小/最大/平均/条数)。
+    一个月的日汇总只需读取约 30 行。
+    返回按时间升序的字典列表；as_series 为 True 时返回以各时间段平均电压
+    构成的 VoltageSeries。数据库尚未迁移到版本 5 (汇总表可能不存在或不完整)
+    或查询出错时返回 None，调用方可回退到原始数据聚合。
+    """
+    table = ROLLUP_TABLES.get(granularity)
+    if table is None:
+        raise ValueError(f"不支持的汇总粒度: {granularity}")
+    if not _schema_version_at_least(connection, VOLTAGE_ROLLUPS_SCHEMA_VERSION):
+        logger.warning(
+            f"数据库结构版本低于 5，汇总表 {table} 尚未回填，"
+            "请在插件目录下运行 python db_migrations.py upgrade"
+        )
+        return None
+
+    cursor = connection.cursor(dictionary=True)
+    query = (
+        "SELECT bucket_start, min_voltage, max_voltage, "
+        "sum_voltage / reading_count AS mean_voltage, reading_count "
+        f"FROM {table} WHERE pile_id = %s"
+    )
+    params = [pile_id]
+    if start_time:
+        query += " AND bucket_start >= %s"
+        params.append(start_time)
+    if end_time:
+        query += " AND bucket_start <= %s"
+        params.append(end_time)
+    query += " ORDER BY bucket_start ASC"
+
+    try:
+        cursor.execute(query, tuple(params))
+        rollups = cursor.fetchall()
+        for row in rollups:
+            row["min_voltage"] = float(row["min_voltage"])
+            row["max_voltage"] = float(row["max_voltage"])
+            row["mean_voltage"] = float(row["mean_voltage"])
+        if as_series:
+            return _voltage_series_class().from_columns(
+                [row["bucket_start"] for row in rollups],
+                [row["mean_voltage"] for row in rollups],
+            )
+        return rollups
+    except Error as e:
+        logger.error(f"查询测试桩 ID {pile_id} 的电压汇总时发生错误: '{e}'")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
 # 注意：此文件是作为库被导入的，因此移除了 if __name__ == "__main__": 部分。
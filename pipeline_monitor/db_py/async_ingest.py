@@ -0,0 +1,312 @@
+"""
+基于 asyncio 的电压读数接入管道。
+
+    读数来源 (每个来源一个生产者协程)
+        -> 有界队列 (满时生产者等待，形成背压)
+        -> 批量消费者 (攒满 batch_size 条或距第一条超过 flush_interval 秒即写入)
+        -> insert_voltage_readings_batch (在线程池中执行，不阻塞事件循环)
+
+MySQL 变慢时队列逐渐填满，生产者在 put 处等待而不是丢弃读数；MySQL 不可用时
+消费者按指数退避一直重试同一批读数，队列同样填满并阻塞生产者。等待时间、队列深度
+等背压指标定期输出。收到 Ctrl+C / SIGTERM 后停止接收新读数，把队列中已有的读数
+全部写入后再退出。
+
+模拟网关突发上传:
+    python async_ingest.py --gateways 4 --burst 500 --gateway-interval 2
+"""
+
+import argparse
+import asyncio
+import random
+import signal
+import time
+from datetime import datetime
+
+from mysql.connector import Error
+
+from db_operations import (
+    close_pool,
+    get_test_pile_ids,
+    insert_voltage_readings_batch,
+    pooled_connection,
+)
+
+
+def write_readings(readings):
+    """(工作线程) 借用连接池中的连接批量写入读数，返回 BatchInsertResult"""
+    with pooled_connection() as conn:
+        if not (conn and conn.is_connected()):
+            raise ConnectionError("无法连接到数据库")
+        return insert_voltage_readings_batch(
+            conn, readings, chunk_size=max(len(readings), 1), verbose=False
+        )
+
+
+class IngestMetrics:
+    """接入管道的计数与背压指标"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.size_flushes = 0  # 因攒满 batch_size 而写入的批次数
+        self.time_flushes = 0  # 因超过 flush_interval 而写入的批次数
+        self.retries = 0
+        self.blocked_puts = 0  # 因队列已满而等待的 put 次数
+        self.blocked_seconds = 0.0  # 生产者累计等待时间
+        self.max_queue_depth = 0
+        self.write_seconds = 0.0
+
+    def summary(self, queue_depth):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        average_write = self.write_seconds / self.batches * 1000 if self.batches else 0
+        return (
+            f"入队 {self.enqueued}，写入 {self.written}，失败 {self.failed}，"
+            f"队列 {queue_depth} (峰值 {self.max_queue_depth})，"
+            f"批次 {self.batches} (满 {self.size_flushes} / 超时 {self.time_flushes})，"
+            f"平均写入 {average_write:.1f} ms，重试 {self.retries}，"
+            f"背压等待 {self.blocked_puts} 次 {self.blocked_seconds:.2f} 秒，"
+            f"吞吐 {self.written / elapsed:.0f} 条/秒"
+        )
+
+
+class AsyncIngestPipeline:
+    """
+    多来源、有界队列、批量写入的接入管道。
+
+    sources 为异步可迭代对象的列表，每个元素产出 (pile_id, voltage, timestamp) 读数；
+    write_batch 为同步写入函数 (默认 write_readings)，在线程池中执行，
+    返回带 inserted / failures 属性的结果。
+    """
+
+    def __init__(
+        self,
+        sources,
+        write_batch=write_readings,
+        queue_size=10000,
+        batch_size=1000,
+        flush_interval=1.0,
+        consumers=2,
+        max_retries=3,
+        retry_delay=0.5,
+        max_retry_delay=30.0,
+        report_interval=10.0,
+    ):
+        self.sources = list(sources)
+        self.write_batch = write_batch
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.consumer_count = consumers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.report_interval = report_interval
+
+        self.metrics = IngestMetrics()
+        self.queue = None
+        self._stopping = None
+
+    def stop(self):
+        """请求停止：不再接收新读数，队列中的读数写完后 run() 返回"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self):
+        """运行直到所有来源结束或调用 stop()，返回 IngestMetrics"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = asyncio.Event()
+        consumers = [
+            asyncio.ensure_future(self._consume()) for _ in range(self.consumer_count)
+        ]
+        producers = [
+            asyncio.ensure_future(self._produce(source)) for source in self.sources
+        ]
+        reporter = asyncio.ensure_future(self._report())
+
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        producers_done = asyncio.ensure_future(
+            asyncio.gather(*producers, return_exceptions=True)
+        )
+        await asyncio.wait(
+            [stopping, producers_done], return_when=asyncio.FIRST_COMPLETED
+        )
+
+        # 停止接收：取消仍在运行的生产者 (正在 put 的读数不会被部分写入)
+        for producer in producers:
+            producer.cancel()
+        await producers_done
+        stopping.cancel()
+
+        # 每个消费者一个结束标记，排在已入队的读数之后，保证队列被完全排空
+        for _ in consumers:
+            await self.queue.put(None)
+        await asyncio.gather(*consumers)
+        reporter.cancel()
+        print(f"[{datetime.now()}] 接入管道已停止: {self._summary()}")
+        return self.metrics
+
+    async def _produce(self, source):
+        async for reading in source:
+            if self.queue.full():
+                # 队列已满，等待消费者写入 (背压)
+                self.metrics.blocked_puts += 1
+                started = time.monotonic()
+                await self.queue.put(reading)
+                self.metrics.blocked_seconds += time.monotonic() - started
+            else:
+                self.queue.put_nowait(reading)
+            self.metrics.enqueued += 1
+            self.metrics.max_queue_depth = max(
+                self.metrics.max_queue_depth, self.queue.qsize()
+            )
+
+    async def _consume(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            reading = await self.queue.get()
+            if reading is None:
+                return
+            batch = [reading]
+            deadline = loop.time() + self.flush_interval
+            finished = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    reading = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if reading is None:
+                    finished = True
+                    break
+                batch.append(reading)
+
+            if len(batch) >= self.batch_size:
+                self.metrics.size_flushes += 1
+            else:
+                self.metrics.time_flushes += 1
+            await self._write(batch)
+            if finished:
+                return
+
+    async def _write(self, batch):
+        """
+        在线程池中写入一批读数。连接类错误按指数退避 (最长 max_retry_delay 秒)
+        一直重试，期间该消费者不再取读数，队列填满后生产者等待 (背压)，读数不会丢弃。
+        请求停止后仍无法写入时最多再重试 max_retries 次，然后计为失败，以免无法退出。
+        """
+        loop = asyncio.get_event_loop()
+        delay = self.retry_delay
+        attempt = retries_after_stop = 0
+        while True:
+            started = time.monotonic()
+            try:
+                result = await loop.run_in_executor(None, self.write_batch, batch)
+            except (Error, ConnectionError) as e:
+                attempt += 1
+                if self._stopping is not None and self._stopping.is_set():
+                    if retries_after_stop >= self.max_retries:
+                        print(
+                            f"已请求停止，写入 {len(batch)} 条读数仍然失败，"
+                            f"放弃这批读数: '{e}'"
+                        )
+                        self.metrics.failed += len(batch)
+                        return
+                    retries_after_stop += 1
+                print(
+                    f"写入 {len(batch)} 条读数失败 (第 {attempt} 次)，"
+                    f"{delay:.1f} 秒后重试: '{e}'"
+                )
+                self.metrics.retries += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            self.metrics.batches += 1
+            self.metrics.write_seconds += time.monotonic() - started
+            self.metrics.written += result.inserted
+            self.metrics.failed += len(result.failures)
+            return
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print(f"[{datetime.now()}] {self._summary()}")
+
+    def _summary(self):
+        return self.metrics.summary(self.queue.qsize() if self.queue else 0)
+
+
+async def simulated_gateway(pile_ids, interval, burst, jitter=0.5):
+    """
+    模拟网关：每隔约 interval 秒一次性上传 burst 条读数 (随机测试桩、随机电压)，
+    以此复现突发上传。无限产出，由管道的 stop() 结束。
+    """
+    while True:
+        await asyncio.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+        now = datetime.now().replace(microsecond=0)
+        for _ in range(burst):
+            yield random.choice(pile_ids), round(random.uniform(-1.5, -0.5), 3), now
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="asyncio 电压读数接入管道 (模拟网关)")
+    parser.add_argument("--gateways", type=int, default=4, help="模拟网关 (来源) 数")
+    parser.add_argument(
+        "--gateway-interval", type=float, default=2.0, help="每个网关的平均上传间隔秒数"
+    )
+    parser.add_argument("--burst", type=int, default=500, help="每次上传的读数条数")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--consumers", type=int, default=2, help="并发写入的消费者数")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    with pooled_connection() as conn:
+        if not (conn and conn.is_connected()):
+            print("无法连接到数据库，无法读取测试桩目录。")
+            return 1
+        pile_ids = get_test_pile_ids(conn)
+    if not pile_ids:
+        print("没有找到测试桩信息，无法生成电压数据。")
+        return 1
+
+    pipeline = AsyncIngestPipeline(
+        [
+            simulated_gateway(pile_ids, args.gateway_interval, args.burst)
+            for _ in range(args.gateways)
+        ],
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+        consumers=args.consumers,
+        report_interval=args.report_interval,
+    )
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, pipeline.stop)
+        except (NotImplementedError, AttributeError, ValueError):
+            pass  # Windows 不支持，Ctrl+C 时走 KeyboardInterrupt
+    print("接入管道已启动。按 Ctrl+C 停止 (会先写完队列中的读数)。")
+    task = loop.create_task(pipeline.run())
+    try:
+        loop.run_until_complete(task)
+    except KeyboardInterrupt:
+        # 未能注册信号处理器时：请求停止后继续运行同一任务，直到队列排空
+        pipeline.stop()
+        loop.run_until_complete(task)
+    finally:
+        loop.close()
+        close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
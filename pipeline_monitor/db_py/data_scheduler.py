@@ -1,59 +1,421 @@
+import argparse
 import schedule
 import time
 import random
+from collections import deque
 from datetime import datetime, timedelta
 
+from mysql.connector import Error
+
 from db_operations import (
-    create_connection,
+    close_pool,
+    ensure_ingest_key_column,
     get_all_test_piles,
+    get_pool,
+    get_test_pile_ids,
+    get_test_pile_signature,
     insert_voltage_reading,
+    insert_voltage_readings_batch,
+    pooled_connection,
 )
+from spool import ReadingSpool, SpoolReplayer
+
+# 最近一次从数据库读到的测试桩 ID；数据库不可用时仍为这些测试桩生成读数并写入缓冲
+_known_pile_ids = []
+# 缓冲模式下各次定时任务共用的重放器 (只在首次重放前检查一次数据库结构)
+_spool_replayer = None
 
 
-def generate_and_insert_new_readings():
-    """模拟生成新的电压读数并插入数据库"""
+def generate_and_insert_new_readings(spool=None):
+    """
+    模拟生成新的电压读数并插入数据库。
+    传入 spool (ReadingSpool) 时先把读数写入本地缓冲，再把缓冲重放到数据库；
+    数据库不可用时读数保留在缓冲中，恢复后由下一次调用补写。
+    """
     print(f"[{datetime.now()}] 检查并插入新的电压读数...")
-    conn = create_connection()
-    if not (conn and conn.is_connected()):
-        print("无法连接到数据库，跳过此次数据生成。")
+    if spool is not None:
+        _generate_readings_into_spool(spool)
         return
+    # 使用共享连接池，连接在各次定时任务之间复用，无需每次重新握手
+    with pooled_connection() as conn:
+        if not (conn and conn.is_connected()):
+            print("无法连接到数据库，跳过此次数据生成。")
+            return
 
-    try:
-        # 获取所有测试桩，或者选择一部分进行模拟
-        piles = get_all_test_piles(conn)
-        if not piles:
+        try:
+            # 获取所有测试桩，或者选择一部分进行模拟
+            piles = get_all_test_piles(conn)
+            if not piles:
+                print("没有找到测试桩信息，无法生成电压数据。")
+                return
+
+            # 随机选择1到3个桩为其生成数据
+            num_piles_to_update = random.randint(1, min(len(piles), 3))
+            selected_piles = random.sample(piles, num_piles_to_update)
+
+            for pile in selected_piles:
+                pile_id = pile["id"]
+                # 模拟电压值 (在 -0.5V 到 -1.5V 之间)
+                simulated_voltage = round(random.uniform(-1.5, -0.5), 3)
+                current_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                insert_voltage_reading(
+                    conn, pile_id, simulated_voltage, current_time_str
+                )
+
+        except Exception as e:
+            print(f"生成并插入电压数据时发生错误: {e}")
+        finally:
+            print(f"[{datetime.now()}] 电压读数检查完毕，连接已归还连接池。")
+
+
+def _generate_readings_into_spool(spool):
+    global _spool_replayer
+    if _spool_replayer is None or _spool_replayer.spool is not spool:
+        _spool_replayer = SpoolReplayer(spool)
+    with pooled_connection() as conn:
+        connected = bool(conn and conn.is_connected())
+        if connected:
+            pile_ids = get_test_pile_ids(conn)
+            if pile_ids:
+                _known_pile_ids[:] = pile_ids
+        if not _known_pile_ids:
             print("没有找到测试桩信息，无法生成电压数据。")
             return
 
-        # 随机选择1到3个桩为其生成数据
-        num_piles_to_update = random.randint(1, min(len(piles), 3))
-        selected_piles = random.sample(piles, num_piles_to_update)
+        # 随机选择1到3个桩为其生成数据，模拟电压值 (在 -0.5V 到 -1.5V 之间)
+        selected = random.sample(
+            _known_pile_ids, random.randint(1, min(len(_known_pile_ids), 3))
+        )
+        now = datetime.now().replace(microsecond=0)
+        spool.append(
+            [
+                (pile_id, round(random.uniform(-1.5, -0.5), 3), now)
+                for pile_id in selected
+            ]
+        )
+        if not connected:
+            print(f"无法连接到数据库，读数已写入本地缓冲 (待重放 {len(spool)} 条)。")
+            return
 
-        for pile in selected_piles:
-            pile_id = pile["id"]
-            # 模拟电压值 (在 -0.5V 到 -1.5V 之间)
-            simulated_voltage = round(random.uniform(-1.5, -0.5), 3)
-            current_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            insert_voltage_reading(conn, pile_id, simulated_voltage, current_time_str)
+        stats = _spool_replayer.replay(conn)
+        print(
+            f"[{datetime.now()}] 已从本地缓冲写入 {stats['inserted']} 条读数"
+            f" (重复 {stats['duplicates']} 条，待重放 {len(spool)} 条)。"
+        )
 
-    except Exception as e:
-        print(f"生成并插入电压数据时发生错误: {e}")
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
-            print(f"[{datetime.now()}] 电压读数检查完毕，数据库连接已关闭。")
 
+class LatencyStats:
+    """保留最近 window 次的耗时 (秒)，计算分位数，用于输出每次写入的延迟统计"""
 
-# --- 定时任务设置 ---
-if __name__ == "__main__":
-    print("定时数据生成程序已启动。按 Ctrl+C 退出。")
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
 
-    # 每分钟执行一次 generate_and_insert_new_readings 函数
-    schedule.every(10).second.do(generate_and_insert_new_readings)
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
 
-    try:
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        """最近窗口内的 p50 / p95 / 最大耗时 (毫秒) 与累计平均值"""
+        if not self.samples:
+            return "暂无数据"
+        return (
+            f"p50 {self.percentile(0.5) * 1000:.1f} ms, "
+            f"p95 {self.percentile(0.95) * 1000:.1f} ms, "
+            f"最大 {max(self.samples) * 1000:.1f} ms, "
+            f"平均 {self.total / self.count * 1000:.1f} ms (共 {self.count} 次)"
+        )
+
+
+class IngestionService:
+    """
+    常驻的数据生成服务。
+
+    与 generate_and_insert_new_readings 每次借用连接、读取并打印全部测试桩、
+    逐条插入不同，本服务：
+    - 长期持有一个数据库连接，断开后自动重新获取；
+    - 缓存测试桩 ID 目录，每 catalog_check_interval 秒用 (数量, 最大ID)
+      签名检查一次，签名变化时才重新读取目录；
+    - 每个周期生成的全部读数用一次 executemany、一次提交写入；
+    - 记录每个周期的写入耗时与总耗时，定期输出分位数统计。
+    传入 spool (ReadingSpool) 时读数先写入本地缓冲再重放到数据库，
+    数据库不可用期间照常生成读数，恢复后一次性追赶。
+    适合以 1 秒的间隔为数千个测试桩持续生成数据。
+    """
+
+    def __init__(
+        self,
+        piles_per_tick=None,
+        catalog_check_interval=30,
+        report_every=60,
+        spool=None,
+    ):
+        self.piles_per_tick = piles_per_tick  # None 表示每个周期为全部测试桩生成读数
+        self.catalog_check_interval = catalog_check_interval
+        self.report_every = report_every
+        self.spool = spool
+        self.replayer = SpoolReplayer(spool) if spool is not None else None
+
+        self.connection = None
+        self.pile_ids = []
+        self.catalog_signature = None
+        self.catalog_checked_at = None
+        self.insert_latency = LatencyStats()
+        self.tick_latency = LatencyStats()
+        self.ticks = 0
+        self.rows_written = 0
+        self.failed_rows = 0
+
+    def ensure_connection(self):
+        """返回可用的长连接，连接已断开时归还连接池并重新获取"""
+        if self.connection is not None:
+            try:
+                if self.connection.is_connected():
+                    return self.connection
+            except Exception:
+                pass
+            print("数据库连接已断开，正在重新连接...")
+            get_pool().release(self.connection)  # 已断开的连接会被连接池丢弃
+            self.connection = None
+        self.connection = get_pool().acquire()
+        return self.connection
+
+    def refresh_catalog(self, connection, force=False):
+        """按签名检查测试桩目录是否变化，变化 (或 force) 时重新读取 ID 列表"""
+        now = time.monotonic()
+        if (
+            not force
+            and self.catalog_checked_at is not None
+            and now - self.catalog_checked_at < self.catalog_check_interval
+        ):
+            return
+        self.catalog_checked_at = now
+        try:
+            signature = get_test_pile_signature(connection)
+            if signature is None or (signature == self.catalog_signature and not force):
+                return
+            pile_ids = get_test_pile_ids(connection)
+            if pile_ids is None:
+                return
+            if self.catalog_signature is not None:
+                print(
+                    f"测试桩目录已变化: {len(self.pile_ids)} -> {len(pile_ids)} 个测试桩"
+                )
+            self.pile_ids = pile_ids
+            self.catalog_signature = signature
+        finally:
+            # 自动提交关闭时只读查询也会开启事务；不及时结束的话 REPEATABLE READ
+            # 快照会一直保留，之后的签名检查看不到新增的测试桩
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except Error as e:
+                print(f"结束测试桩目录查询的事务时发生错误: '{e}'")
+
+    def generate_readings(self):
+        """为本周期选中的测试桩生成模拟读数 [(pile_id, voltage, timestamp), ...]"""
+        if self.piles_per_tick is None or self.piles_per_tick >= len(self.pile_ids):
+            selected = self.pile_ids
+        else:
+            selected = random.sample(self.pile_ids, self.piles_per_tick)
+        # 同一周期的读数使用同一时间戳 (精确到秒，与表结构一致)
+        now = datetime.now().replace(microsecond=0)
+        return [
+            (pile_id, round(random.uniform(-1.5, -0.5), 3), now) for pile_id in selected
+        ]
+
+    def tick(self):
+        """执行一个周期：检查目录、生成读数并批量写入，返回写入的行数"""
+        tick_started = time.perf_counter()
+        connection = self.ensure_connection()
+        if connection is None and self.spool is None:
+            print(f"[{datetime.now()}] 无法连接到数据库，跳过此次数据生成。")
+            return 0
+
+        if connection is not None:
+            self.refresh_catalog(connection)
+        if not self.pile_ids:
+            print(f"[{datetime.now()}] 没有找到测试桩信息，无法生成电压数据。")
+            return 0
+
+        readings = self.generate_readings()
+        if self.spool is not None:
+            self.spool.append(readings)
+            if connection is None:
+                print(
+                    f"[{datetime.now()}] 无法连接到数据库，读数已写入本地缓冲"
+                    f" (待重放 {len(self.spool)} 条)。"
+                )
+                return 0
+
+        insert_started = time.perf_counter()
+        try:
+            if self.spool is not None:
+                inserted, failed = self._replay_spool(connection), 0
+            else:
+                result = insert_voltage_readings_batch(
+                    connection,
+                    readings,
+                    chunk_size=max(len(readings), 1),
+                    verbose=False,
+                )
+                inserted, failed = result.inserted, len(result.failures)
+        except Error as e:
+            # 连接在写入过程中失效，下个周期重新获取连接
+            # (使用缓冲时这些读数仍在缓冲中，下个周期补写)
+            print(f"[{datetime.now()}] 批量写入电压读数失败: '{e}'")
+            if self.spool is None:
+                self.failed_rows += len(readings)
+            get_pool().release(self.connection)
+            self.connection = None
+            return 0
+        finished = time.perf_counter()
+
+        self.insert_latency.add(finished - insert_started)
+        self.tick_latency.add(finished - tick_started)
+        self.ticks += 1
+        self.rows_written += inserted
+        self.failed_rows += failed
+        if self.report_every and self.ticks % self.report_every == 0:
+            self.report()
+        return inserted
+
+    def _replay_spool(self, connection):
+        """把缓冲 (含数据库不可用期间积压的读数) 写入数据库，返回新写入的行数"""
+        stats = self.replayer.replay(connection)
+        if stats["error"] is not None:
+            raise Error(stats["error"])
+        return stats["inserted"]
+
+    def report(self):
+        print(
+            f"[{datetime.now()}] 已运行 {self.ticks} 个周期，"
+            f"写入 {self.rows_written} 条，失败 {self.failed_rows} 条，"
+            f"测试桩 {len(self.pile_ids)} 个"
+        )
+        print(f"    写入耗时: {self.insert_latency.summary()}")
+        print(f"    周期耗时: {self.tick_latency.summary()}")
+
+    def run(self, interval=1.0):
+        """
+        以固定频率运行 (按单调时钟对齐，不因写入耗时而漂移)。
+        某个周期超时后跳过已错过的周期，而不是连续补跑。
+        """
+        next_tick = time.monotonic()
         while True:
-            schedule.run_pending()  # 运行所有已到时间的任务
-            time.sleep(1)  # 等待1秒钟，避免CPU占用过高
+            self.tick()
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                skipped = int(-delay // interval) + 1
+                next_tick += skipped * interval
+                print(f"周期耗时超过间隔，跳过 {skipped} 个周期")
+
+    def close(self):
+        if self.connection is not None:
+            get_pool().release(self.connection)
+            self.connection = None
+        if self.ticks and not (
+            self.report_every and self.ticks % self.report_every == 0
+        ):
+            self.report()  # 退出前输出最后一段未报告的统计
+
+
+def _ensure_spool_schema():
+    """
+    启动时确认缓冲重放所需的 voltage_readings.ingest_key 列存在。
+    数据库暂时不可用时照常启动，由重放器在首次重放前再检查。
+    """
+    with pooled_connection() as conn:
+        if not (conn and conn.is_connected()):
+            print("无法连接到数据库，读数将先写入本地缓冲。")
+            return True
+        return ensure_ingest_key_column(conn)
+
+
+def run_legacy(interval, spool=None):
+    """原有模式：每 interval 秒借用连接，为随机 1~3 个测试桩逐条插入读数"""
+    schedule.every(interval).seconds.do(generate_and_insert_new_readings, spool)
+    while True:
+        schedule.run_pending()  # 运行所有已到时间的任务
+        time.sleep(1)  # 等待1秒钟，避免CPU占用过高
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="定时生成模拟电压读数")
+    parser.add_argument(
+        "--service",
+        action="store_true",
+        help="常驻服务模式：长连接、缓存测试桩目录、每周期批量写入并输出延迟统计",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="生成间隔秒数 (默认 10，服务模式默认 1)",
+    )
+    parser.add_argument(
+        "--piles-per-tick",
+        type=int,
+        default=None,
+        help="服务模式下每周期生成读数的测试桩数 (默认全部)",
+    )
+    parser.add_argument(
+        "--catalog-check-interval",
+        type=float,
+        default=30,
+        help="服务模式下检查测试桩目录是否变化的间隔秒数",
+    )
+    parser.add_argument(
+        "--report-every",
+        type=int,
+        default=60,
+        help="服务模式下每多少个周期输出一次统计",
+    )
+    parser.add_argument(
+        "--spool",
+        default=None,
+        help="本地缓冲文件路径：读数先写入缓冲再重放到数据库，数据库不可用时不丢失",
+    )
+    args = parser.parse_args(argv)
+
+    print("定时数据生成程序已启动。按 Ctrl+C 退出。")
+    service = None
+    spool = ReadingSpool(args.spool) if args.spool else None
+    try:
+        if spool is not None and not _ensure_spool_schema():
+            return 1
+        if args.service:
+            service = IngestionService(
+                piles_per_tick=args.piles_per_tick,
+                catalog_check_interval=args.catalog_check_interval,
+                report_every=args.report_every,
+                spool=spool,
+            )
+            service.run(args.interval or 1.0)
+        else:
+            run_legacy(int(args.interval or 10), spool)
     except KeyboardInterrupt:
         print("定时数据生成程序已停止。")
+    finally:
+        if service is not None:
+            service.close()
+        if spool is not None:
+            spool.close()
+        close_pool()
+    return 0
+
+
+# --- 定时任务设置 ---
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import sys
+from datetime import datetime
+
+from db_operations import (
+    backfill_voltage_rollups,
+    close_pool,
+    pooled_connection,
+    rebuild_pile_latest_voltage,
+)
+
+
+def rebuild_latest(args):
+    """全量重建 pile_latest_voltage 表"""
+    with pooled_connection() as conn:
+        if not (conn and conn.is_connected()):
+            print("无法连接到数据库，无法重建最新电压表。")
+            return 1
+        return 0 if rebuild_pile_latest_voltage(conn) is not None else 1
+
+
+def backfill_rollups(args):
+    """根据历史读数回填小时/天汇总表"""
+    with pooled_connection() as conn:
+        if not (conn and conn.is_connected()):
+            print("无法连接到数据库，无法回填汇总表。")
+            return 1
+        total = backfill_voltage_rollups(
+            conn, args.start, args.end, chunk_days=args.chunk_days
+        )
+        return 0 if total is not None else 1
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="管线监控数据库维护工具")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    rebuild_parser = subparsers.add_parser(
+        "rebuild-latest", help="根据 voltage_readings 重建 pile_latest_voltage 表"
+    )
+    rebuild_parser.set_defaults(func=rebuild_latest)
+
+    backfill_parser = subparsers.add_parser(
+        "backfill-rollups", help="根据 voltage_readings 回填小时/天汇总表"
+    )
+    backfill_parser.add_argument(
+        "--start", type=_parse_date, default=None, help="起始日期 YYYY-MM-DD"
+    )
+    backfill_parser.add_argument(
+        "--end", type=_parse_date, default=None, help="结束日期 YYYY-MM-DD (不含)"
+    )
+    backfill_parser.add_argument(
+        "--chunk-days", type=int, default=7, help="每个事务处理的天数"
+    )
+    backfill_parser.set_defaults(func=backfill_rollups)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    finally:
+        close_pool()
+
+
+# --- 主程序执行部分 ---
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+曲线图的客户端降采样。
+
+两种算法都返回要保留的点的下标 (升序)，调用方用下标同时取时间戳与电压：
+- lttb_indices: Largest-Triangle-Three-Buckets，保留曲线的视觉形状；
+- minmax_indices: 每个时间段保留最小值与最大值点，保证尖峰不会丢失。
+点数按图表像素宽度选取即可，再多的点在屏幕上也无法分辨。
+"""
+
+import numpy as np
+
+# 降采样模式 -> 显示名称
+DOWNSAMPLE_MODES = {
+    "lttb": "LTTB",
+    "minmax": "最小/最大包络",
+    "none": "不降采样",
+}
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[ms]").astype(np.int64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回 threshold 个点的下标。
+    首尾两点固定保留，中间的点均分为 threshold - 2 个桶，每个桶选出与
+    上一个已选点及下一个桶平均点构成三角形面积最大的点。
+    x 可以是数值或 datetime64 数组；点数不超过 threshold 时返回全部下标。
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = np.asarray(y, dtype=np.float64)
+    bucket_count = threshold - 2
+    # 桶 i 覆盖下标 [edges[i], edges[i + 1])，不含首尾两点
+    edges = np.linspace(1, n - 1, bucket_count + 1).astype(np.int64)
+    sizes = np.diff(edges)
+    avg_x = np.add.reduceat(x[: n - 1], edges[:-1]) / sizes
+    avg_y = np.add.reduceat(y[: n - 1], edges[:-1]) / sizes
+    # 最后一个桶的 "下一个桶" 是末尾点
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(bucket_count):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y[i] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, bucket_count):
+    """
+    最小/最大包络降采样：把点均分为 bucket_count 段，每段保留最小值与最大值所在的点
+    (以及首尾两点)，返回升序且不重复的下标，最多 2 * bucket_count + 2 个。
+    """
+    n = len(y)
+    if bucket_count <= 0 or 2 * bucket_count + 2 >= n:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, bucket_count + 1).astype(np.int64)
+    segment = np.repeat(np.arange(bucket_count), np.diff(edges))
+    # 按 (段号, 电压) 排序后，每段的第一个是最小值、最后一个是最大值
+    order = np.lexsort((y, segment))
+    firsts = edges[:-1]
+    lasts = edges[1:] - 1
+    keep = np.concatenate(([0, n - 1], order[firsts], order[lasts]))
+    return np.unique(keep)
+
+
+def downsample_indices(mode, x, y, pixel_width):
+    """按模式 ("lttb" / "minmax" / "none") 返回要绘制的点的下标"""
+    if mode == "lttb":
+        # 每像素约两个点，折线在视觉上与原始数据一致
+        return lttb_indices(x, y, 2 * pixel_width)
+    if mode == "minmax":
+        return minmax_indices(y, pixel_width)
+    if mode == "none":
+        return np.arange(len(y))
+    raise ValueError(f"不支持的降采样模式: {mode}")
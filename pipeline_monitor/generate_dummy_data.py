@@ -1,9 +1,55 @@
+"""
+模拟数据生成工具。
+
+默认 (--profile demo) 为 4 个测试桩生成约 54 条读数，用于界面演示；
+其他规模配置沿随机生成的管线折线布置成千上万个测试桩，并生成百万级以上的读数，
+用于在开发机上复现生产规模下的性能问题:
+
+    python generate_dummy_data.py --profile small             1 千桩 / 100 万读数
+    python generate_dummy_data.py --profile large --method load-data
+    python generate_dummy_data.py --piles 5000 --readings 2000000 --seed 7
+    python generate_dummy_data.py --profile medium --dry-run  只生成不写库，测生成速度
+
+读数按测试桩分块用 NumPy 向量化生成，(测试桩数, 读数数, seed, --end) 相同时
+输出完全相同；写入方式可选分块 executemany 或 LOAD DATA LOCAL INFILE
+(需要服务器开启 local_infile)。
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
 import mysql.connector
 from mysql.connector import Error
+from collections import namedtuple
 from datetime import datetime, timedelta
+import math
 import random
 import logging  # Import logging
 
+import numpy as np
+
+# 批量写入与派生表维护只在写入端 (db_py/db_operations.py) 实现一处。
+# 本模块既作为插件包的一部分，也会作为脚本在插件目录下直接运行
+try:
+    from .db_py.db_operations import (
+        INSERT_VOLTAGE_READING_QUERY,
+        PLACEHOLDER_VOLTAGE,
+        backfill_voltage_rollups,
+        insert_voltage_readings_batch,
+        merge_pile_latest_voltage,
+    )
+except ImportError:
+    from db_py.db_operations import (
+        INSERT_VOLTAGE_READING_QUERY,
+        PLACEHOLDER_VOLTAGE,
+        backfill_voltage_rollups,
+        insert_voltage_readings_batch,
+        merge_pile_latest_voltage,
+    )
+
 # Initialize logger for this module
 logger = logging.getLogger(__name__)
 if not logger.handlers:
@@ -24,11 +70,13 @@ db_config = {
 }
 
 
-def create_connection():
-    """创建并返回一个数据库连接"""
+def create_connection(allow_local_infile=False):
+    """创建并返回一个数据库连接 (allow_local_infile 为 LOAD DATA LOCAL INFILE 所需)"""
     connection = None
     try:
-        connection = mysql.connector.connect(**db_config)
+        connection = mysql.connector.connect(
+            allow_local_infile=allow_local_infile, **db_config
+        )
         if connection.is_connected():
             logger.info("成功连接到 MySQL 数据库。")  # Replaced print
     except Error as e:
@@ -81,6 +129,7 @@ def generate_and_insert_data():
     }
 
     logger.info("正在生成并插入模拟数据...")  # Replaced print
+    readings = []  # 先收集全部读数，最后一次性批量写入
 
     for pile_id, data in piles_data.items():
         base_voltage = data["base_voltage"]
@@ -105,7 +154,7 @@ def generate_and_insert_data():
                     voltage = max(voltage, -0.8)  # 确保高于欠保护阈值
             else:
                 voltage = 9999.0  # 未知状态，使用一个占位符，因为列不允许为 NULL
-            insert_voltage_reading(conn, pile_id, voltage, timestamp)
+            readings.append((pile_id, voltage, timestamp))
 
         # 2. 生成过去一个月的数据 (每天一个点)
         logger.info(
@@ -126,11 +175,500 @@ def generate_and_insert_data():
                     voltage = max(voltage, -0.8)
             else:
                 voltage = 9999.0  # 未知状态，使用一个占位符
-            insert_voltage_reading(conn, pile_id, voltage, timestamp)
+            readings.append((pile_id, voltage, timestamp))
 
+    result = insert_voltage_readings_batch(conn, readings, verbose=False)
     conn.close()
-    logger.info("模拟数据生成完成。")  # Replaced print
+    for index, row, reason in result.failures:
+        logger.error(f"第 {index} 条读数 {row} 插入失败: {reason}")
+    logger.info(
+        f"模拟数据生成完成，成功插入 {result.inserted} 条，失败 {len(result.failures)} 条。"
+    )
+
+
+# --- 大规模模拟数据 ---
+
+# 规模配置: 名称 -> (测试桩数, 读数总数)
+SCALE_PROFILES = {
+    "small": (1000, 1000000),
+    "medium": (10000, 10000000),
+    "large": (100000, 100000000),
+}
+
+# 模拟管线所在区域的经纬度范围
+REGION_LONGITUDE = (105.0, 122.0)
+REGION_LATITUDE = (28.0, 40.0)
+KM_PER_DEGREE = 111.32
+
+# 保护状态 -> (出现比例, 基础电压范围)；未知状态的测试桩使用占位电压
+PILE_STATES = {
+    "正常": (0.80, (-1.15, -0.90)),
+    "过保护": (0.08, (-1.45, -1.25)),
+    "欠保护": (0.10, (-0.80, -0.60)),
+    "未知": (0.02, None),
+}
+
+# 内存中同时存在的读数条数上限。读数按测试桩分块生成，分块方式只取决于
+# 测试桩数与读数数，因此写入方式与 chunk_size 不影响生成结果
+BLOCK_READINGS = 1000000
+
+SyntheticPiles = namedtuple(
+    "SyntheticPiles",
+    ["names", "longitudes", "latitudes", "pipeline_ids", "base_voltages"],
+)
+
+
+def generate_pipeline_polyline(rng, length_km, segment_km=10.0):
+    """
+    生成一条长约 length_km 的管线折线，返回 (经度数组, 纬度数组)。
+    每 segment_km 一个顶点，走向在相邻管段之间随机偏转，形成平缓弯曲的线路。
+    """
+    segments = max(1, int(math.ceil(length_km / segment_km)))
+    start_longitude = rng.uniform(*REGION_LONGITUDE)
+    start_latitude = rng.uniform(*REGION_LATITUDE)
+    headings = rng.uniform(0, 2 * np.pi) + np.cumsum(
+        rng.normal(0, np.radians(15), segments)
+    )
+    step_longitude = (
+        segment_km
+        * np.cos(headings)
+        / (KM_PER_DEGREE * np.cos(np.radians(start_latitude)))
+    )
+    step_latitude = segment_km * np.sin(headings) / KM_PER_DEGREE
+    longitudes = start_longitude + np.concatenate(([0.0], np.cumsum(step_longitude)))
+    latitudes = start_latitude + np.concatenate(([0.0], np.cumsum(step_latitude)))
+    return longitudes, latitudes
+
+
+def place_along_polyline(longitudes, latitudes, count, spacing_km):
+    """沿折线每隔 spacing_km 放置 count 个点 (按近似平面距离插值)，返回 (经度, 纬度)"""
+    scale = np.cos(np.radians(latitudes.mean()))
+    segment_lengths = KM_PER_DEGREE * np.hypot(
+        np.diff(longitudes) * scale, np.diff(latitudes)
+    )
+    distances = np.concatenate(([0.0], np.cumsum(segment_lengths)))
+    targets = np.minimum((np.arange(count) + 0.5) * spacing_km, distances[-1])
+    return (
+        np.interp(targets, distances, longitudes),
+        np.interp(targets, distances, latitudes),
+    )
+
+
+def generate_synthetic_piles(
+    pile_count,
+    seed,
+    piles_per_pipeline=200,
+    spacing_km=1.0,
+    name_prefix="SYN",
+):
+    """
+    沿随机管线折线生成 pile_count 个测试桩 (每条管线约 piles_per_pipeline 个，
+    间距 spacing_km)。管线ID形如 SYN42-001 (前缀 + seed - 序号)，测试桩名称形如
+    SYN42-001-K0012 (管线ID-里程公里数)，不同 seed 生成的测试桩不会同名。
+    base_voltages 为各测试桩的基础电压，未知状态为 NaN。
+    """
+    rng = np.random.default_rng([seed, 0])
+    pipeline_count = max(1, -(-pile_count // piles_per_pipeline))
+    counts = np.full(pipeline_count, pile_count // pipeline_count)
+    counts[: pile_count % pipeline_count] += 1
+
+    names = []
+    longitudes = []
+    latitudes = []
+    pipeline_ids = []
+    for offset, count in enumerate(counts.tolist()):
+        pipeline_id = f"{name_prefix}{seed}-{offset + 1:03d}"
+        line_longitudes, line_latitudes = generate_pipeline_polyline(
+            rng, count * spacing_km
+        )
+        pile_longitudes, pile_latitudes = place_along_polyline(
+            line_longitudes, line_latitudes, count, spacing_km
+        )
+        longitudes.append(pile_longitudes)
+        latitudes.append(pile_latitudes)
+        pipeline_ids.extend([pipeline_id] * count)
+        names.extend(f"{pipeline_id}-K{k:04d}" for k in range(count))
+
+    probabilities = np.array([share for share, _ in PILE_STATES.values()])
+    states = rng.choice(len(PILE_STATES), size=pile_count, p=probabilities)
+    base_voltages = np.full(pile_count, np.nan)
+    for state, (_, voltage_range) in enumerate(PILE_STATES.values()):
+        if voltage_range is None:
+            continue
+        mask = states == state
+        base_voltages[mask] = rng.uniform(*voltage_range, int(mask.sum()))
+
+    return SyntheticPiles(
+        names,
+        np.round(np.concatenate(longitudes), 6),
+        np.round(np.concatenate(latitudes), 6),
+        np.array(pipeline_ids),
+        base_voltages,
+    )
+
+
+def readings_per_pile(pile_count, reading_count):
+    """把 reading_count 条读数尽量平均地分给 pile_count 个测试桩"""
+    counts = np.full(pile_count, reading_count // pile_count, dtype=np.int64)
+    counts[: reading_count % pile_count] += 1
+    return counts
+
+
+def reading_blocks(counts):
+    """按 BLOCK_READINGS 把测试桩划分为若干块，返回 [(first, stop), ...]"""
+    per_pile = max(1, int(counts.max()) if len(counts) else 1)
+    block_piles = max(1, BLOCK_READINGS // per_pile)
+    return [
+        (first, min(first + block_piles, len(counts)))
+        for first in range(0, len(counts), block_piles)
+    ]
+
+
+def generate_reading_block(
+    base_voltages, counts, first, stop, start_time, window_seconds, seed, block_index
+):
+    """
+    为第 first ~ stop-1 个测试桩生成读数，返回 (测试桩下标, 电压, 时间) 三个数组。
+    每个测试桩的读数在时间窗口内大致等间隔 (带抖动)，电压 = 基础电压 + 日周期波动
+    + 缓慢漂移 + 噪声；未知状态的测试桩为占位电压。
+    """
+    rng = np.random.default_rng([seed, 1, block_index])
+    block_counts = counts[first:stop]
+    total = int(block_counts.sum())
+    piles = np.repeat(np.arange(first, stop), block_counts)
+    repeated_counts = np.repeat(block_counts, block_counts)
+    position = np.arange(total) - np.repeat(
+        np.cumsum(block_counts) - block_counts, block_counts
+    )
+    offsets = (position + 0.5 + rng.uniform(-0.4, 0.4, total)) * (
+        window_seconds / repeated_counts
+    )
+    timestamps = np.datetime64(start_time, "s") + offsets.astype("timedelta64[s]")
+
+    seconds_of_day = (timestamps - timestamps.astype("datetime64[D]")).astype(np.int64)
+    daily = 0.03 * np.sin(2 * np.pi * seconds_of_day / 86400)
+    drift_rates = rng.normal(0, 0.05, stop - first)
+    drift = drift_rates[piles - first] * (offsets / window_seconds)
+    base = base_voltages[piles]
+    voltages = np.round(base + daily + drift + rng.normal(0, 0.01, total), 3)
+    voltages[np.isnan(base)] = PLACEHOLDER_VOLTAGE
+    return piles, voltages, timestamps
+
+
+INSERT_SYNTHETIC_PILE_QUERY = (
+    "INSERT IGNORE INTO test_piles (name, longitude, latitude, pipeline_id, description) "
+    "VALUES (%s, %s, %s, %s, %s)"
+)
+
+
+def insert_synthetic_piles(connection, piles, description, chunk_size=5000):
+    """
+    分块写入模拟测试桩 (INSERT IGNORE，同一 seed 重复运行时复用已有的同名测试桩)，
+    返回与 piles 顺序一致的测试桩 ID 数组，失败返回 None。
+    已有的同名测试桩位置或所属管线与本次生成的不一致时 (例如 --piles 或
+    --piles-per-pipeline 不同) 不复用，返回 None。
+    """
+    rows = list(
+        zip(
+            piles.names,
+            piles.longitudes.tolist(),
+            piles.latitudes.tolist(),
+            piles.pipeline_ids.tolist(),
+            [description] * len(piles.names),
+        )
+    )
+    prefix = os.path.commonprefix(piles.names)
+    like_pattern = (
+        prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    )
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            cursor.executemany(
+                INSERT_SYNTHETIC_PILE_QUERY, rows[start : start + chunk_size]
+            )
+            connection.commit()
+        cursor.execute(
+            "SELECT name, id, longitude, latitude, pipeline_id FROM test_piles "
+            "WHERE name LIKE %s",
+            (like_pattern,),
+        )
+        stored = {row[0]: row[1:] for row in cursor.fetchall()}
+        mismatched = [
+            name
+            for name, longitude, latitude, pipeline_id, _ in rows
+            if name in stored
+            and (
+                abs(float(stored[name][1]) - longitude) > 1e-6
+                or abs(float(stored[name][2]) - latitude) > 1e-6
+                or stored[name][3] != pipeline_id
+            )
+        ]
+        if mismatched:
+            logger.error(
+                f"数据库中已有 {len(mismatched)} 个同名但位置或管线不同的模拟测试桩 "
+                f"(如 {mismatched[0]})，可能由不同的测试桩数或每条管线桩数生成。"
+                "请使用其他 --name-prefix，或先删除这些测试桩。"
+            )
+            return None
+        return np.array([stored[name][0] for name in piles.names], dtype=np.int64)
+    except Error as e:
+        connection.rollback()
+        logger.error(f"写入模拟测试桩时发生错误: '{e}'")
+        return None
+    except KeyError as e:
+        logger.error(f"模拟测试桩 {e} 写入后未能查到 ID。")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def load_readings_executemany(connection, pile_ids, voltages, timestamps, chunk_size):
+    """分块 executemany 写入读数，每块提交一次"""
+    ids = pile_ids.tolist()
+    values = voltages.tolist()
+    times = np.datetime_as_string(timestamps, unit="s").tolist()
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(ids), chunk_size):
+            stop = start + chunk_size
+            cursor.executemany(
+                INSERT_VOLTAGE_READING_QUERY,
+                list(zip(ids[start:stop], values[start:stop], times[start:stop])),
+            )
+            connection.commit()
+    finally:
+        cursor.close()
+
+
+LOAD_READINGS_QUERY = (
+    "LOAD DATA LOCAL INFILE %s INTO TABLE voltage_readings "
+    "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+    "(pile_id, voltage, reading_timestamp)"
+)
+
+
+def load_readings_infile(connection, pile_ids, voltages, timestamps, directory):
+    """把读数写成临时 TSV 文件后用 LOAD DATA LOCAL INFILE 一次导入"""
+    path = os.path.join(directory, "voltage_readings.tsv")
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(
+            "\n".join(
+                map(
+                    "{}\t{:.3f}\t{}".format,
+                    pile_ids.tolist(),
+                    voltages.tolist(),
+                    np.datetime_as_string(timestamps, unit="s").tolist(),
+                )
+            )
+        )
+        f.write("\n")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(LOAD_READINGS_QUERY, (path,))
+        connection.commit()
+    finally:
+        cursor.close()
+        os.remove(path)
+
+
+def rebuild_derived_tables(connection, start_time, end_time):
+    """
+    批量导入绕过了逐批维护派生表的写入函数，导入后把 [start_time, end_time)
+    内的读数合并进最新电压表，并重新计算这段时间的汇总数据。成功返回 True。
+    """
+    if merge_pile_latest_voltage(connection, start_time, end_time) is None:
+        return False
+    return backfill_voltage_rollups(connection, start_time, end_time) is not None
+
+
+def generate_synthetic_data(
+    pile_count,
+    reading_count,
+    seed=42,
+    days=30,
+    end_time=None,
+    method="executemany",
+    chunk_size=10000,
+    name_prefix="SYN",
+    piles_per_pipeline=200,
+    rebuild_derived=True,
+    dry_run=False,
+):
+    """
+    生成 pile_count 个测试桩与 reading_count 条分布在结束时间前 days 天内的读数并写入数据库。
+    method 为 "executemany" 或 "load-data" (LOAD DATA LOCAL INFILE，服务器不允许时
+    自动改用 executemany)。dry_run 时只生成不写库。成功返回 True。
+    """
+    if pile_count < 1 or reading_count < 0:
+        raise ValueError("测试桩数必须大于 0，读数数不能为负")
+    end_time = end_time or datetime.now().replace(minute=0, second=0, microsecond=0)
+    start_time = end_time - timedelta(days=days)
+    window_seconds = days * 86400
+
+    started = time.perf_counter()
+    piles = generate_synthetic_piles(
+        pile_count,
+        seed,
+        piles_per_pipeline=piles_per_pipeline,
+        name_prefix=name_prefix,
+    )
+    logger.info(
+        f"已生成 {pile_count} 个测试桩 ({len(np.unique(piles.pipeline_ids))} 条管线)，"
+        f"耗时 {time.perf_counter() - started:.1f} 秒。"
+    )
+
+    conn = None
+    if dry_run:
+        pile_ids = np.arange(1, pile_count + 1, dtype=np.int64)
+    else:
+        conn = create_connection(allow_local_infile=method == "load-data")
+        if conn is None:
+            logger.error("无法连接到数据库。无法生成数据。")
+            return False
+        pile_ids = insert_synthetic_piles(conn, piles, f"模拟数据 seed={seed}")
+        if pile_ids is None:
+            conn.close()
+            return False
+
+    counts = readings_per_pile(pile_count, reading_count)
+    blocks = reading_blocks(counts)
+    directory = tempfile.mkdtemp(prefix="pipeline-monitor-dummy-")
+    generate_seconds = 0.0
+    load_seconds = 0.0
+    written = 0
+    try:
+        if conn is not None:
+            # 测试桩 ID 均来自上面的写入结果，导入期间关闭外键检查以加快写入
+            conn.cmd_query("SET SESSION foreign_key_checks = 0")
+        for block_index, (first, stop) in enumerate(blocks):
+            block_started = time.perf_counter()
+            indices, voltages, timestamps = generate_reading_block(
+                piles.base_voltages,
+                counts,
+                first,
+                stop,
+                start_time,
+                window_seconds,
+                seed,
+                block_index,
+            )
+            generate_seconds += time.perf_counter() - block_started
+            if conn is not None and len(indices):
+                load_started = time.perf_counter()
+                block_ids = pile_ids[indices]
+                if method == "load-data":
+                    try:
+                        load_readings_infile(
+                            conn, block_ids, voltages, timestamps, directory
+                        )
+                    except Error as e:
+                        conn.rollback()
+                        logger.warning(
+                            f"LOAD DATA LOCAL INFILE 失败，改用 executemany: '{e}'"
+                        )
+                        method = "executemany"
+                if method == "executemany":
+                    load_readings_executemany(
+                        conn, block_ids, voltages, timestamps, chunk_size
+                    )
+                load_seconds += time.perf_counter() - load_started
+            written += len(indices)
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"读数 {written}/{reading_count} (块 {block_index + 1}/{len(blocks)})，"
+                f"{written / elapsed:,.0f} 条/秒"
+            )
+
+        if conn is not None:
+            conn.cmd_query("SET SESSION foreign_key_checks = 1")
+            if rebuild_derived:
+                logger.info("正在重建最新电压表与汇总表...")
+                if not rebuild_derived_tables(conn, start_time, end_time):
+                    return False
+    except Error as e:
+        logger.error(f"写入模拟读数时发生错误 (已写入 {written} 条): '{e}'")
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        if conn is not None:
+            conn.close()
+
+    logger.info(
+        f"模拟数据完成: {pile_count} 个测试桩，{written} 条读数，"
+        f"生成 {generate_seconds:.1f} 秒 ({written / max(generate_seconds, 1e-9):,.0f} 条/秒)，"
+        f"写入 {load_seconds:.1f} 秒，总耗时 {time.perf_counter() - started:.1f} 秒。"
+    )
+    return True
+
+
+def _parse_end_time(value):
+    return datetime.strptime(value, "%Y-%m-%d %H:%M")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="管线监控模拟数据生成工具")
+    parser.add_argument(
+        "--profile",
+        choices=["demo"] + list(SCALE_PROFILES),
+        default="demo",
+        help="规模配置: demo 为 4 个演示测试桩；"
+        + "，".join(
+            f"{name} {piles} 桩 / {readings} 读数"
+            for name, (piles, readings) in SCALE_PROFILES.items()
+        ),
+    )
+    parser.add_argument("--piles", type=int, default=None, help="覆盖测试桩数")
+    parser.add_argument("--readings", type=int, default=None, help="覆盖读数总数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--days", type=int, default=30, help="读数覆盖的天数")
+    parser.add_argument(
+        "--end",
+        type=_parse_end_time,
+        default=None,
+        help='读数的结束时间 "YYYY-MM-DD HH:MM" (默认当前整点，固定后输出可复现)',
+    )
+    parser.add_argument(
+        "--method", choices=["executemany", "load-data"], default="executemany"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=10000, help="executemany 每次提交的行数"
+    )
+    parser.add_argument("--name-prefix", default="SYN", help="模拟测试桩名称前缀")
+    parser.add_argument("--piles-per-pipeline", type=int, default=200)
+    parser.add_argument(
+        "--skip-derived",
+        action="store_true",
+        help="不重建最新电压表与汇总表 (之后可用 db_py/maintenance.py 重建)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="只生成不写入数据库")
+    args = parser.parse_args(argv)
+
+    pile_count, reading_count = SCALE_PROFILES.get(args.profile, (None, None))
+    pile_count = args.piles if args.piles is not None else pile_count
+    reading_count = args.readings if args.readings is not None else reading_count
+    if pile_count is None and reading_count is None:
+        generate_and_insert_data()
+        return 0
+    if pile_count is None or reading_count is None:
+        parser.error("--piles 与 --readings 需要同时指定，或选择一个规模配置")
+
+    ok = generate_synthetic_data(
+        pile_count,
+        reading_count,
+        seed=args.seed,
+        days=args.days,
+        end_time=args.end,
+        method=args.method,
+        chunk_size=args.chunk_size,
+        name_prefix=args.name_prefix,
+        piles_per_pipeline=args.piles_per_pipeline,
+        rebuild_derived=not args.skip_derived,
+        dry_run=args.dry_run,
+    )
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
-    generate_and_insert_data()
+    sys.exit(main())
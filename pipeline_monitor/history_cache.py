@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+进程内共享的测试桩历史数据缓存。
+
+按 (pile_id, 时间范围) 缓存 PileDetailsDialog 读取的曲线数据，重复查看同一测试桩
+或来回切换时间范围时直接使用内存中的数据。缓存条目在以下情况失效：
+- 超过 TTL (24 小时曲线的时间窗口随时间推移，数据不能无限期使用)；
+- 测试桩有了比缓存时更新的读数 (按最新读数时间戳比较，或由自动刷新主动失效)；
+- 缓存总字节数超过上限时，按最近最少使用 (LRU) 的顺序淘汰。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def _value_nbytes(value):
+    """估算缓存值占用的字节数 (VoltageSeries / VoltageBuckets 或它们组成的元组)"""
+    if value is None:
+        return 0
+    if isinstance(value, (tuple, list)):
+        return sum(_value_nbytes(item) for item in value)
+    return int(getattr(value, "nbytes", 0))
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "stored_at", "latest_reading")
+
+    def __init__(self, value, nbytes, stored_at, latest_reading):
+        self.value = value
+        self.nbytes = nbytes
+        self.stored_at = stored_at
+        self.latest_reading = latest_reading
+
+
+class HistoryCache:
+    """
+    按字节数限制大小、带 TTL 的 LRU 缓存。键为 (pile_id, range_key)，
+    range_key 可以是任意可哈希对象 (例如 "month" 或 ("24_hours", 图表宽度))。
+    各方法加锁，可在后台任务与主线程之间共享。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=300.0, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pile_id, range_key, latest_reading=None):
+        """
+        返回缓存的数据，未命中时返回 None。
+        latest_reading 为调用方已知的该测试桩最新读数时间；比缓存时更新则条目失效。
+        """
+        key = (pile_id, range_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_fresh(entry, latest_reading):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, pile_id, range_key, value, latest_reading=None):
+        """缓存数据，latest_reading 为读取数据时该测试桩的最新读数时间"""
+        nbytes = _value_nbytes(value)
+        key = (pile_id, range_key)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if nbytes > self.max_bytes:
+                return  # 单个条目超过上限，不缓存
+            self._entries[key] = _Entry(value, nbytes, self._clock(), latest_reading)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, pile_ids=None):
+        """使指定测试桩 (可迭代的 ID) 的全部条目失效；pile_ids 为 None 时清空缓存"""
+        with self._lock:
+            if pile_ids is None:
+                self._entries.clear()
+                self.total_bytes = 0
+                return
+            pile_ids = set(pile_ids)
+            for key in [key for key in self._entries if key[0] in pile_ids]:
+                self._remove(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _is_fresh(self, entry, latest_reading):
+        if self._clock() - entry.stored_at > self.ttl:
+            return False
+        if latest_reading is None:
+            return True
+        return (
+            entry.latest_reading is not None and latest_reading <= entry.latest_reading
+        )
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.nbytes
+
+
+# 所有详情对话框共用的缓存实例
+history_cache = HistoryCache()
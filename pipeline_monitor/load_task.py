@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+from itertools import takewhile
+
+from qgis.core import QgsTask
+
+from . import db_operations
+from . import db_migrations
+from .downsampling import downsample_indices
+from .pile_features import build_pile_features, build_pipeline_points, pile_risk_levels
+from .pile_search import PileSearchIndex
+from .snapshot_cache import load_snapshot, save_snapshot
+from .voltage_series import VoltageSeries
+
+
+class LoadDataTask(QgsTask):
+    """
+    在后台线程中读取测试桩与最新电压数据并构建图层要素。
+
+    from_snapshot 为 True 时只读取本地快照 (snapshot_path)，不访问数据库；
+    否则从数据库读取，成功后把结果写回快照，供下次打开插件时立即显示。
+
+    run() 在工作线程中执行，只访问数据库和普通的 QgsFeature 对象；
+    finished() 由 QGIS 在主线程中调用，再通过 on_finished 回调把结果交给对话框，
+    由对话框完成图层替换等必须在主线程进行的操作。
+    """
+
+    def __init__(
+        self,
+        on_finished,
+        position_cache,
+        check_schema=False,
+        logger=None,
+        snapshot_path=None,
+        from_snapshot=False,
+    ):
+        super(LoadDataTask, self).__init__("加载管线监控数据", QgsTask.CanCancel)
+        self.on_finished = on_finished
+        # 按测试桩缓存的投影坐标 (ProjectedPositionCache)，测试桩与管线图层共用
+        self.position_cache = position_cache
+        self.check_schema = check_schema
+        self.logger = logger
+        self.snapshot_path = snapshot_path
+        self.from_snapshot = from_snapshot
+
+        # --- 结果 ---
+        self.all_piles = []
+        self.latest_voltages = {}
+        self.max_reading_id = None  # 读取最新电压前的最大读数ID，作为自动刷新的起始水位
+        self.pile_xs = None  # 与 all_piles 顺序一致的投影坐标
+        self.pile_ys = None
+        self.pile_features = []
+        self.pipeline_points = []
+        self.pile_search_index = None  # 测试桩列表的搜索索引
+        self.schema_warnings = []
+        self.error_message = None
+        self.snapshot_saved_at = None  # 从快照加载时为快照的保存时间
+
+    def run(self):
+        """(工作线程) 读取数据并构建要素，返回是否成功"""
+        try:
+            if self.from_snapshot:
+                snapshot = load_snapshot(self.snapshot_path)
+                if snapshot is None:
+                    self.error_message = "没有可用的本地快照。"
+                    return False
+                self.all_piles = snapshot["piles"]
+                self.latest_voltages = snapshot["latest_voltages"]
+                self.snapshot_saved_at = snapshot["saved_at"]
+                # 快照中已保存投影坐标，直接填充缓存，无需重新投影
+                xs, ys = snapshot["xs"], snapshot["ys"]
+                self.position_cache.seed(self.all_piles, xs, ys)
+            else:
+                if not self.read_database():
+                    return False
+                # 一次向量化投影全部 (新增或移动过的) 测试桩坐标
+                xs, ys = self.position_cache.project(self.all_piles)
+                self.position_cache.retain(pile["id"] for pile in self.all_piles)
+                if self.snapshot_path:
+                    save_snapshot(
+                        self.snapshot_path, self.all_piles, self.latest_voltages, xs, ys
+                    )
+
+            if not self.all_piles:
+                return True
+            self.pile_xs, self.pile_ys = xs, ys
+            self.setProgress(60)
+
+            self.pile_features = build_pile_features(
+                self.all_piles,
+                self.latest_voltages,
+                xs,
+                ys,
+                logger=self.logger,
+                is_canceled=self.isCanceled,
+            )
+            if self.pile_features is None or self.isCanceled():
+                return False
+            self.setProgress(80)
+
+            self.pipeline_points = build_pipeline_points(xs, ys)
+            self.pile_search_index = PileSearchIndex.from_piles(
+                self.all_piles, pile_risk_levels(self.all_piles, self.latest_voltages)
+            )
+            self.setProgress(100)
+            return True
+        except Exception as e:
+            self.error_message = f"发生错误: {type(e).__name__}。详情见日志面板。"
+            if self.logger:
+                self.logger.exception("后台加载数据时发生严重错误！")
+            return False
+
+    def read_database(self):
+        """(工作线程) 从数据库读取测试桩与最新电压，返回是否成功"""
+        with db_operations.pooled_connection() as conn:
+            if not (conn and conn.is_connected()):
+                self.error_message = "错误: 无法连接到数据库。"
+                return False
+            self.setProgress(10)
+
+            # 先记录水位再读最新电压：期间新写入的读数会在下次增量刷新时重复合并，
+            # 合并按时间戳比较，不会丢失也不会出错
+            self.max_reading_id = db_operations.get_max_reading_id(conn)
+            self.all_piles = db_operations.get_all_test_piles(conn)
+            if self.isCanceled():
+                return False
+            self.setProgress(30)
+
+            self.latest_voltages = db_operations.get_latest_voltages(conn)
+            if self.isCanceled():
+                return False
+            self.setProgress(50)
+
+            if self.check_schema:
+                self.schema_warnings = db_migrations.check_schema(conn)
+        # 数据已读取完毕，连接已归还连接池，构建要素时不再占用连接
+        return True
+
+    def finished(self, result):
+        """(主线程) 任务结束后回调对话框"""
+        if self.on_finished:
+            self.on_finished(self, result)
+
+
+class PollReadingsTask(QgsTask):
+    """
+    (自动刷新) 在后台读取高水位 after_id 之后的新电压读数。
+    结果 readings 按 id 升序；batch_full 表示读满了 limit 条，可能还有积压。
+    """
+
+    def __init__(self, on_finished, after_id, limit=5000, logger=None):
+        super(PollReadingsTask, self).__init__("检查新的电压读数", QgsTask.CanCancel)
+        self.on_finished = on_finished
+        self.after_id = after_id
+        self.limit = limit
+        self.logger = logger
+
+        # --- 结果 ---
+        self.readings = []
+        self.batch_full = False
+        self.error_message = None
+
+    def run(self):
+        """(工作线程) 增量查询新读数，返回是否成功"""
+        try:
+            with db_operations.pooled_connection() as conn:
+                if not (conn and conn.is_connected()):
+                    self.error_message = "错误: 无法连接到数据库。"
+                    return False
+                readings = db_operations.get_readings_since(
+                    conn, self.after_id, limit=self.limit
+                )
+            if readings is None:
+                self.error_message = "增量查询新读数失败。"
+                return False
+            self.readings = readings
+            self.batch_full = len(readings) >= self.limit
+            return not self.isCanceled()
+        except Exception as e:
+            self.error_message = f"发生错误: {type(e).__name__}。详情见日志面板。"
+            if self.logger:
+                self.logger.exception("自动刷新查询新读数时发生错误！")
+            return False
+
+    def finished(self, result):
+        """(主线程) 任务结束后回调对话框"""
+        if self.on_finished:
+            self.on_finished(self, result)
+
+
+class LoadZoomedReadingsTask(QgsTask):
+    """
+    (详情图表放大后) 在后台读取可见时间范围内的全部原始读数，并按 mode 降采样到
+    width 个像素。结果 timestamps / voltages 为降采样后的点，raw_count 为有效原始读数条数。
+    任务被取消时停止读取后续批次。
+    """
+
+    def __init__(
+        self, on_finished, pile_id, start_time, end_time, mode, width, logger=None
+    ):
+        super(LoadZoomedReadingsTask, self).__init__(
+            "读取放大区域的电压读数", QgsTask.CanCancel
+        )
+        self.on_finished = on_finished
+        self.pile_id = pile_id
+        self.start_time = start_time
+        self.end_time = end_time
+        self.mode = mode
+        self.width = width
+        self.logger = logger
+
+        # --- 结果 ---
+        self.timestamps = None
+        self.voltages = None
+        self.raw_count = 0
+        self.error_message = None
+
+    def run(self):
+        """(工作线程) 流式读取原始读数并降采样，返回是否成功"""
+        try:
+            with db_operations.pooled_connection() as conn:
+                if not (conn and conn.is_connected()):
+                    self.error_message = "无法连接到数据库来读取原始电压数据。"
+                    return False
+                batches = db_operations.iter_voltage_readings_for_pile(
+                    conn, self.pile_id, self.start_time, self.end_time
+                )
+                try:
+                    series = VoltageSeries.from_batches(
+                        takewhile(lambda _: not self.isCanceled(), batches)
+                    )
+                finally:
+                    batches.close()  # 取消时不再读取剩余结果
+            if self.isCanceled():
+                return False
+            series = series.valid_only()
+            self.raw_count = len(series)
+            if series:
+                indices = downsample_indices(
+                    self.mode, series.timestamps, series.voltages, self.width
+                )
+                self.timestamps = series.timestamps[indices]
+                self.voltages = series.voltages[indices]
+            return not self.isCanceled()
+        except Exception as e:
+            self.error_message = f"发生错误: {type(e).__name__}。详情见日志面板。"
+            if self.logger:
+                self.logger.exception("读取放大区域的电压读数时发生错误！")
+            return False
+
+    def finished(self, result):
+        """(主线程) 任务结束后回调对话框"""
+        if self.on_finished:
+            self.on_finished(self, result)
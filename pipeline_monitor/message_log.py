@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+把 logging 日志转发到 QGIS 日志面板的处理器。
+
+单独成模块，插件入口 (pipeline_monitor.py) 在 initGui 时只需导入本模块，
+不必提前加载对话框及其依赖的 NumPy 等模块。
+"""
+
+import logging
+
+from qgis.core import QgsMessageLog, Qgis
+
+
+# Custom logging handler for QGIS Message Log
+class QgsMessageLogHandler(logging.Handler):
+    def emit(self, record):
+        msg = self.format(record)
+        # Map logging levels to QgsMessageLog message types using Qgis enum
+        if record.levelno >= logging.CRITICAL:
+            QgsMessageLog.logMessage(
+                msg, "PipelineMonitor", Qgis.Critical
+            )  # Use Qgis.Critical
+        elif record.levelno >= logging.ERROR:
+            QgsMessageLog.logMessage(
+                msg, "PipelineMonitor", Qgis.Critical
+            )  # Map ERROR to Critical for visibility
+        elif record.levelno >= logging.WARNING:
+            QgsMessageLog.logMessage(
+                msg, "PipelineMonitor", Qgis.Warning
+            )  # Use Qgis.Warning
+        elif record.levelno >= logging.INFO:
+            QgsMessageLog.logMessage(msg, "PipelineMonitor", Qgis.Info)  # Use Qgis.Info
+        else:  # DEBUG and NOTSET
+            QgsMessageLog.logMessage(
+                msg, "PipelineMonitor", Qgis.Info
+            )  # Map DEBUG to Info
@@ -2,30 +2,13 @@
 
 import os
 from qgis.PyQt import uic
-from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QWidget
-from PyQt5.QtCore import Qt
+from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QPushButton, QWidget
+from PyQt5.QtCore import QTimer
 import logging  # Import logging
 
-# Import Qgis for message levels
-from qgis.core import QgsMessageLog, Qgis
-
-
-# Custom logging handler for QGIS Message Log
-class QgsMessageLogHandler(logging.Handler):
-    def emit(self, record):
-        msg = self.format(record)
-        # Map logging levels to QgsMessageLog message types using Qgis enum
-        if record.levelno >= logging.CRITICAL:
-            QgsMessageLog.logMessage(msg, "PipelineMonitor", Qgis.Critical)
-        elif record.levelno >= logging.ERROR:
-            QgsMessageLog.logMessage(msg, "PipelineMonitor", Qgis.Critical)
-        elif record.levelno >= logging.WARNING:
-            QgsMessageLog.logMessage(msg, "PipelineMonitor", Qgis.Warning)
-        elif record.levelno >= logging.INFO:
-            QgsMessageLog.logMessage(msg, "PipelineMonitor", Qgis.Info)
-        else:  # DEBUG and NOTSET
-            QgsMessageLog.logMessage(msg, "PipelineMonitor", Qgis.Info)
+from qgis.core import QgsApplication
 
+from .message_log import QgsMessageLogHandler
 
 # Initialize logger for this module
 logger = logging.getLogger(__name__)
@@ -59,13 +42,17 @@ logger.debug("pile_details_dialog logger initialized with QgsMessageLog.")
 # 导入 Matplotlib
 # 注意：这需要您的QGIS Python环境中已安装matplotlib
 # 如果没有，请在OSGeo4W Shell中运行: python -m pip install matplotlib
+# 本模块由 pipeline_monitor_dialog 在首次打开详情对话框时才导入，
+# matplotlib 的加载与字体配置不会计入 QGIS 启动时间。
+# 图表直接使用 FigureCanvasQTAgg 嵌入对话框，不导入 pyplot (其加载开销最大)
 import matplotlib
 
 # Force matplotlib to use a non-interactive backend, to avoid issues with Qt
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
 from matplotlib.figure import Figure
+import matplotlib.dates as mdates
 
 # Configure matplotlib to display Chinese characters
 matplotlib.rcParams["font.sans-serif"] = [
@@ -78,6 +65,10 @@ matplotlib.rcParams["axes.unicode_minus"] = False  # Correctly display minus sig
 from . import db_operations
 from datetime import datetime, timedelta
 import numpy as np
+from .voltage_series import PLACEHOLDER_VOLTAGE, VoltageSeries
+from .downsampling import DOWNSAMPLE_MODES
+from .history_cache import history_cache
+from .load_task import LoadZoomedReadingsTask
 
 # 从 .ui 文件加载窗体类
 FORM_CLASS, _ = uic.loadUiType(
@@ -90,22 +81,48 @@ class PileDetailsDialog(QDialog, FORM_CLASS):
     显示单个测试桩详细信息的对话框。
     """
 
-    def __init__(self, feature, parent=None):
+    # 图表尚未布局时假定的像素宽度
+    DEFAULT_CHART_WIDTH = 600
+    # 曲线点数不超过该值时才绘制数据点标记
+    MAX_MARKER_POINTS = 100
+    # 缩放停止后读取原始读数前的等待时间 (毫秒)
+    ZOOM_REFINE_DELAY_MS = 300
+
+    def __init__(self, feature, parent=None, latest_reading_time=None):
         """
         Constructor.
         :param feature: 被点击的测试桩要素 (QgsFeature)
+        :param latest_reading_time: 该测试桩已知的最新读数时间，用于判断缓存的历史数据是否过期
         """
         super(PileDetailsDialog, self).__init__(parent)
         self.setupUi(self)
         self.feature = feature
+        self.latest_reading_time = latest_reading_time
 
         # --- 初始化变量 ---
-        self.db_conn = None
+        # 图表对象在对话框生命周期内只创建一次，切换时间范围时原地更新数据
+        self.chart_figure = None
         self.chart_canvas = None
+        self.chart_toolbar = None
+        self.chart_axes = None
+        self.overview_line = None  # 总览曲线 (汇总数据)
+        self.detail_line = None  # 放大后按原始读数绘制的曲线
+        self.envelope = None  # 分段最小/最大值范围 (fill_between)
+        self.chart_message = None  # 无数据时显示在坐标区中央的提示
+        self.overview_xlim = None
+        self._updating_chart = False
+        self.downsample_mode = "lttb"
+        # 缩放/平移停止一段时间后才读取原始数据，避免拖动过程中频繁查询
+        self.zoom_timer = QTimer(self)
+        self.zoom_timer.setSingleShot(True)
+        self.zoom_timer.setInterval(self.ZOOM_REFINE_DELAY_MS)
+        self.zoom_timer.timeout.connect(self.refine_zoomed_view)
+        self.zoom_task = None  # 正在读取放大区域原始读数的后台任务
 
         # --- 填充静态信息 ---
         self.populate_static_info()
         self.connect_signals()
+        self.setup_chart()
 
         # --- 绘制电压历史曲线图 ---
         self.plot_voltage_history("24_hours")
@@ -116,6 +133,19 @@ class PileDetailsDialog(QDialog, FORM_CLASS):
             lambda: self.plot_voltage_history("24_hours")
         )
         self.pastMonthButton.clicked.connect(lambda: self.plot_voltage_history("month"))
+        if hasattr(self, "pastYearButton"):
+            self.pastYearButton.clicked.connect(
+                lambda: self.plot_voltage_history("year")
+            )
+        if hasattr(self, "downsampleComboBox"):
+            for mode, label in DOWNSAMPLE_MODES.items():
+                self.downsampleComboBox.addItem(label, mode)
+            self.downsampleComboBox.setCurrentIndex(
+                self.downsampleComboBox.findData(self.downsample_mode)
+            )
+            self.downsampleComboBox.currentIndexChanged.connect(
+                self.on_downsample_mode_changed
+            )
 
     def populate_static_info(self):
         """用要素的属性填充UI上的标签"""
@@ -140,146 +170,301 @@ class PileDetailsDialog(QDialog, FORM_CLASS):
 
         self.riskLabel.setText(f"<b>风险评估：</b> {risk_level}")
 
-    def _ensure_and_clear_chart_layout(self):
-        """确保 chartContainer 有布局并清除其所有子部件"""
-        current_layout = self.chartContainer.layout()
-        if current_layout:
-            # 如果已有布局，则移除所有子部件
-            while current_layout.count():
-                item = current_layout.takeAt(0)
-                widget = item.widget()
-                if widget is not None:
-                    widget.deleteLater()
-                elif item.layout() is not None:  # 如果是嵌套布局
-                    self._clear_layout(item.layout())
-        else:
-            # 如果没有布局，则创建一个新的
-            self.chartContainer.setLayout(QVBoxLayout())
+    def setup_chart(self):
+        """创建唯一的 Figure、画布、工具栏与曲线对象，并嵌入 chartContainer"""
+        layout = self.chartContainer.layout()
+        if layout is None:
+            layout = QVBoxLayout()
+            self.chartContainer.setLayout(layout)
+
+        self.chart_figure = Figure(figsize=(5, 4), dpi=100)
+        ax = self.chart_figure.add_subplot(111)
+        ax.xaxis_date()  # 预先设置日期坐标，之后 set_data 可直接传入 datetime64
+        ax.set_ylabel("电压 (V)")
+        ax.grid(True)
+        (self.overview_line,) = ax.plot([], [], linestyle="-")
+        (self.detail_line,) = ax.plot(
+            [], [], linestyle="-", color=self.overview_line.get_color()
+        )
+        self.detail_line.set_visible(False)
+        self.chart_message = ax.text(
+            0.5, 0.5, "", transform=ax.transAxes, ha="center", va="center"
+        )
+        self.chart_figure.autofmt_xdate()  # 自动格式化日期标签
+        self.chart_axes = ax
+
+        # 工具栏提供缩放与平移
+        self.chart_canvas = FigureCanvas(self.chart_figure)
+        self.chart_toolbar = NavigationToolbar2QT(self.chart_canvas, self)
+        layout.addWidget(self.chart_toolbar)
+        layout.addWidget(self.chart_canvas)
+        ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+    def _on_xlim_changed(self, _ax):
+        # 程序切换时间范围时不触发原始数据读取
+        if not self._updating_chart:
+            self.zoom_timer.start()
+
+    def show_chart_message(self, message):
+        """清空曲线，在坐标区中央显示提示信息"""
+        self.overview_line.set_data([], [])
+        self.detail_line.set_visible(False)
+        self._remove_envelope()
+        self.chart_message.set_text(message)
+        self.overview_xlim = None
+        self.chart_canvas.draw_idle()
+
+    def _remove_envelope(self):
+        if self.envelope is not None:
+            self.envelope.remove()
+            self.envelope = None
 
     def plot_voltage_history(self, time_range="24_hours"):
         """
         获取并绘制测试桩的电压历史曲线。
-        time_range: '24_hours' (过去24小时) 或 'month' (过去一个月，每天一个点)
+        time_range: '24_hours' (过去24小时)、'month' (过去一个月，每天一个点)
+                    或 'year' (过去一年，每天一个点)
+        月/年曲线直接读取按天汇总表，只需传输约 30/365 行。
+        图表对象保持不变，只替换曲线数据、坐标范围与标题。
         """
-        self._ensure_and_clear_chart_layout()  # 确保布局存在并已清理
+        self.zoom_timer.stop()
+        self.cancel_zoom_task()
 
-        if self.db_conn is None or not self.db_conn.is_connected():
-            self.db_conn = db_operations.create_connection()
-            if self.db_conn is None:
-                logger.error("无法连接到数据库来获取历史数据。")
-                # 如果无法连接数据库，也要显示"无数据"信息
-                layout = self.chartContainer.layout()
-                no_data_label = QLabel("无法连接到数据库。")
-                no_data_label.setAlignment(Qt.AlignCenter)
-                layout.addWidget(no_data_label)
-                return
+        if time_range not in ("24_hours", "month", "year"):
+            logger.error("不支持的时间范围。")
+            return
 
         pile_id = self.feature.attribute("id")
-        readings = []
-
+        end_time = datetime.now()
         if time_range == "24_hours":
-            end_time = datetime.now()
             start_time = end_time - timedelta(hours=24)
-            readings = db_operations.get_voltage_readings_for_pile(
-                self.db_conn, pile_id, start_time, end_time
-            )
+            # 汇总段数取决于图表宽度，宽度不同的结果分别缓存
+            range_key = (time_range, self.chart_pixel_width())
             title_suffix = "过去24小时电压曲线"
             x_label = "时间"
-        elif time_range == "month":
-            end_time = datetime.now()
-            start_time = end_time - timedelta(days=30)
-            all_readings = db_operations.get_voltage_readings_for_pile(
-                self.db_conn, pile_id, start_time, end_time
+        else:
+            days = 30 if time_range == "month" else 365
+            start_time = end_time - timedelta(days=days)
+            range_key = time_range
+            title_suffix = (
+                "过去一个月电压曲线" if time_range == "month" else "过去一年电压曲线"
             )
-            readings = self.process_daily_data(all_readings)  # 聚合每天的数据
-            title_suffix = "过去一个月电压曲线"
             x_label = "日期"
+
+        # 同一测试桩最近查看过且没有更新的读数时，直接使用共享缓存
+        cached = history_cache.get(pile_id, range_key, self.latest_reading_time)
+        if cached is None:
+            cached = self.fetch_history(time_range, pile_id, start_time, end_time)
+            if cached is None:
+                # 如果无法连接数据库，也要显示"无数据"信息
+                self.show_chart_message("无法连接到数据库。")
+                return
+            if cached[1] is not None:  # 查询出错的结果不缓存
+                history_cache.put(pile_id, range_key, cached, self.latest_reading_time)
         else:
-            logger.error("不支持的时间范围。")
-            return
+            logger.debug(f"测试桩 {pile_id} 的 {time_range} 历史数据命中缓存。")
+        buckets, series = cached
+
+        ax = self.chart_axes
+        ax.set_title(f"测试桩 {self.feature.attribute('name')} {title_suffix}")
+        ax.set_xlabel(x_label)
 
-        if not readings:
-            self._ensure_and_clear_chart_layout()  # 清理布局并确保存在
-            layout = self.chartContainer.layout()
-            no_data_label = QLabel("无可用电压历史数据。")
-            no_data_label.setAlignment(Qt.AlignCenter)
-            layout.addWidget(no_data_label)
+        if not series:
+            self.show_chart_message("无可用电压历史数据。")
             logger.debug(f"测试桩 {pile_id} 没有历史数据。")
             return
 
-        # Filter out 9999.0 placeholder for plotting
-        filtered_readings = [r for r in readings if r["voltage"] != 9999.0]
+        # 占位值已在有效性掩码中标记为无效，绘图只使用有效读数
+        valid_series = series.valid_only()
 
-        if not filtered_readings:
-            self._ensure_and_clear_chart_layout()  # 清理布局并确保存在
-            layout = self.chartContainer.layout()
-            no_data_label = QLabel("无可用电压历史数据 (已过滤无效值)。")
-            no_data_label.setAlignment(Qt.AlignCenter)
-            layout.addWidget(no_data_label)
+        if not valid_series:
+            self.show_chart_message("无可用电压历史数据 (已过滤无效值)。")
             logger.debug(f"测试桩 {pile_id} 过滤后没有有效历史数据。")
             return
 
-        timestamps = [r["reading_timestamp"] for r in filtered_readings]
-        voltages = [r["voltage"] for r in filtered_readings]
+        self._updating_chart = True
+        try:
+            self.chart_message.set_text("")
+            self._remove_envelope()
+            if buckets is not None and len(buckets):
+                # 每段的最小/最大值范围，保留段内的尖峰
+                self.envelope = ax.fill_between(
+                    buckets.bucket_starts,
+                    buckets.minimum,
+                    buckets.maximum,
+                    alpha=0.3,
+                    linewidth=0,
+                    color=self.overview_line.get_color(),
+                )
+            # 点数较多时不绘制标记，避免标记重叠成一片
+            marker = "o" if len(valid_series) <= self.MAX_MARKER_POINTS else ""
+            self.overview_line.set_data(valid_series.timestamps, valid_series.voltages)
+            self.overview_line.set_marker(marker)
+            self.overview_line.set_visible(True)
+            self.detail_line.set_visible(False)
+
+            ax.set_xlim(np.datetime64(start_time, "s"), np.datetime64(end_time, "s"))
+            low = float(valid_series.voltages.min())
+            high = float(valid_series.voltages.max())
+            if self.envelope is not None:
+                low = min(low, float(buckets.minimum.min()))
+                high = max(high, float(buckets.maximum.max()))
+            padding = (high - low) * 0.05 or 0.1
+            ax.set_ylim(low - padding, high + padding)
+            self.overview_xlim = ax.get_xlim()
+            # 新的时间范围作为工具栏 "主页" 视图
+            self.chart_toolbar.update()
+        finally:
+            self._updating_chart = False
+        self.chart_canvas.draw_idle()
 
-        # 创建 Matplotlib 图形
-        fig = Figure(figsize=(5, 4), dpi=100)
-        ax = fig.add_subplot(111)
+        logger.debug(f"成功绘制图表：{self.feature.attribute('name')} - {title_suffix}")
 
-        ax.plot(timestamps, voltages, marker="o", linestyle="-")
-        ax.set_title(f"测试桩 {self.feature.attribute('name')} {title_suffix}")
-        ax.set_xlabel(x_label)
-        ax.set_ylabel("电压 (V)")
-        ax.grid(True)
-        fig.autofmt_xdate()  # 自动格式化日期标签
+    def fetch_history(self, time_range, pile_id, start_time, end_time):
+        """
+        从数据库读取曲线数据，返回 (buckets, series)；24 小时曲线为数据库端分段汇总，
+        月/年曲线为每天的平均电压 (buckets 为 None)。无法连接数据库时返回 None。
+        """
+        # 从共享连接池借用连接，查询结束后立即归还
+        with db_operations.pooled_connection() as conn:
+            if conn is None:
+                logger.error("无法连接到数据库来获取历史数据。")
+                return None
+            if time_range == "24_hours":
+                # 在数据库端按图表像素宽度分段聚合，点数与采样频率无关
+                buckets = db_operations.get_voltage_buckets(
+                    conn, pile_id, start_time, end_time, self.chart_pixel_width()
+                )
+                series = buckets.mean_series() if buckets is not None else None
+                return buckets, series
+            return None, self.load_daily_readings(conn, pile_id, start_time, end_time)
+
+    def on_downsample_mode_changed(self, index):
+        """切换降采样方式后，按新的方式重新绘制当前放大的区域"""
+        self.downsample_mode = self.downsampleComboBox.itemData(index)
+        self.refine_zoomed_view()
+
+    def refine_zoomed_view(self):
+        """
+        曲线被放大后，在后台任务中读取可见时间范围内的全部原始读数，
+        按所选方式降采样到图表像素宽度后替换总览曲线；恢复到总览范围时显示汇总数据。
+        """
+        self.cancel_zoom_task()
+        ax = self.chart_axes
+        if self.overview_xlim is None:
+            return
+        x_min, x_max = ax.get_xlim()
+        overview_span = self.overview_xlim[1] - self.overview_xlim[0]
+        if x_max - x_min >= 0.95 * overview_span:
+            self.overview_line.set_visible(True)
+            self.detail_line.set_visible(False)
+            self.chart_canvas.draw_idle()
+            return
 
-        # 将图表嵌入到 QWidget 中
-        layout = self.chartContainer.layout()
-        canvas = FigureCanvas(fig)
-        layout.addWidget(canvas)
+        task = LoadZoomedReadingsTask(
+            self._on_zoomed_readings_loaded,
+            self.feature.attribute("id"),
+            mdates.num2date(x_min).replace(tzinfo=None),
+            mdates.num2date(x_max).replace(tzinfo=None),
+            self.downsample_mode,
+            self.chart_pixel_width(),
+            logger=logger,
+        )
+        self.zoom_task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def _on_zoomed_readings_loaded(self, task, result):
+        """(主线程) 用降采样后的原始读数替换总览曲线"""
+        if task is not self.zoom_task:
+            return  # 已被更新的缩放或时间范围取代
+        self.zoom_task = None
+        if not result:
+            if not task.isCanceled():
+                logger.error(task.error_message or "读取放大区域的电压读数失败。")
+            return
+        if not task.raw_count:
+            return
 
-        logger.debug(f"成功绘制图表：{self.feature.attribute('name')} - {title_suffix}")
+        self.detail_line.set_data(task.timestamps, task.voltages)
+        self.detail_line.set_marker(
+            "o" if len(task.timestamps) <= self.MAX_MARKER_POINTS else ""
+        )
+        self.detail_line.set_visible(True)
+        self.overview_line.set_visible(False)
+        self.chart_canvas.draw_idle()
+        logger.debug(
+            f"放大区域 {task.start_time:%Y-%m-%d %H:%M} ~ {task.end_time:%Y-%m-%d %H:%M}: "
+            f"原始读数 {task.raw_count} 条，绘制 {len(task.timestamps)} 个点"
+        )
+
+    def cancel_zoom_task(self):
+        """取消尚未完成的放大区域读取任务"""
+        if self.zoom_task is not None:
+            try:
+                self.zoom_task.cancel()
+            except RuntimeError:
+                pass  # 任务已结束并被销毁
+            self.zoom_task = None
+
+    def done(self, result):
+        self.zoom_timer.stop()
+        self.cancel_zoom_task()
+        super(PileDetailsDialog, self).done(result)
+
+    def chart_pixel_width(self):
+        """图表区域的像素宽度，窗口尚未布局时使用默认宽度"""
+        width = 0
+        if hasattr(self, "chartContainer"):
+            width = self.chartContainer.width()
+        return width if width >= 100 else self.DEFAULT_CHART_WIDTH
+
+    def load_daily_readings(self, conn, pile_id, start_time, end_time):
+        """
+        读取每天的平均电压 (VoltageSeries)。优先使用按天汇总表；
+        汇总表不可用时回退到拉取原始读数并在本地聚合。
+        """
+        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        rollups = db_operations.get_voltage_rollups(
+            conn, pile_id, "daily", day_start, end_time, as_series=True
+        )
+        if rollups is not None:
+            logger.debug(f"从按天汇总表读取到 {len(rollups)} 条数据。")
+            return rollups
+        batches = db_operations.iter_voltage_readings_for_pile(
+            conn, pile_id, start_time, end_time
+        )
+        return self.process_daily_data(batches)  # 流式聚合每天的数据
 
-    def _clear_layout(self, layout):
-        if layout is not None:
-            while layout.count():
-                item = layout.takeAt(0)
-                widget = item.widget()
-                if widget is not None:
-                    widget.deleteLater()
-                elif item.layout() is not None:
-                    self._clear_layout(item.layout())
-
-    def process_daily_data(self, readings):
-        """将一段时间内的读数按天聚合，计算每天的平均电压"""
-        logger.debug(f"process_daily_data: 收到 {len(readings)} 条原始读数。")
-        daily_data = {}
-        for r in readings:
+    def process_daily_data(self, batches):
+        """
+        将流式读取的读数批次 (NumPy 结构化数组) 按天聚合，返回日平均电压的 VoltageSeries。
+        每批聚合后即丢弃，内存占用只与批大小和天数有关。
+        """
+        daily_sums = {}
+        daily_counts = {}
+        total = 0
+        for batch in batches:
+            total += len(batch)
             # 过滤掉占位符数据
-            if r["voltage"] == 9999.0:
+            batch = batch[batch["voltage"] != PLACEHOLDER_VOLTAGE]
+            if not len(batch):
                 continue
-            date_str = r["reading_timestamp"].strftime("%Y-%m-%d")
-            if date_str not in daily_data:
-                daily_data[date_str] = []
-            daily_data[date_str].append(r["voltage"])
-
-        aggregated_readings = []
-        for date_str in sorted(daily_data.keys()):
-            avg_voltage = np.mean(daily_data[date_str])
-            # 使用每天的开始时间作为聚合点的时间戳
-            aggregated_readings.append(
-                {
-                    "reading_timestamp": datetime.strptime(date_str, "%Y-%m-%d"),
-                    "voltage": avg_voltage,
-                }
+            days, inverse = np.unique(
+                batch["reading_timestamp"].astype("datetime64[D]"), return_inverse=True
             )
+            sums = np.bincount(inverse, weights=batch["voltage"])
+            counts = np.bincount(inverse)
+            for day, day_sum, day_count in zip(days.tolist(), sums, counts):
+                daily_sums[day] = daily_sums.get(day, 0.0) + day_sum
+                daily_counts[day] = daily_counts.get(day, 0) + int(day_count)
+
+        # 使用每天的开始时间作为聚合点的时间戳
+        days = sorted(daily_sums)
+        aggregated = VoltageSeries(
+            np.array(days, dtype="datetime64[s]"),
+            [daily_sums[day] / daily_counts[day] for day in days],
+        )
         logger.debug(
-            f"process_daily_data: 聚合后得到 {len(aggregated_readings)} 条数据。"
+            f"process_daily_data: {total} 条原始读数聚合后得到 {len(aggregated)} 条数据。"
         )
-        return aggregated_readings
-
-    def closeEvent(self, event):
-        """确保在关闭对话框时断开数据库连接"""
-        if self.db_conn and self.db_conn.is_connected():
-            self.db_conn.close()
-        super(PileDetailsDialog, self).closeEvent(event)
+        return aggregated
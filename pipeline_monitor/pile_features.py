@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+测试桩 / 管线要素的构建函数。
+
+这些函数只创建 QgsFeature / QgsPointXY 等普通对象，不访问任何界面控件或图层，
+因此既可以在主线程调用，也可以在后台 QgsTask 中调用。
+"""
+
+from qgis.PyQt.QtCore import QMetaType
+from qgis.core import (
+    QgsFeature,
+    QgsField,
+    QgsGeometry,
+    QgsPointXY,
+)
+
+# 占位电压值，表示未知或缺失的最新电压 (只在写入端定义一处)
+from .db_py.db_operations import PLACEHOLDER_VOLTAGE
+
+# calculate_risk_level 可能返回的全部风险等级
+RISK_LEVELS = ("正常", "欠保护", "过保护", "未知")
+
+
+def pile_fields():
+    """测试桩图层的字段定义"""
+    return [
+        QgsField("id", QMetaType.Int, "Integer"),
+        QgsField("name", QMetaType.QString, "String", 50),
+        QgsField("voltage", QMetaType.Double, "Double", 10, 3),
+        QgsField("risk_level", QMetaType.QString, "String", 20),
+    ]
+
+
+def calculate_risk_level(voltage):
+    """根据电压值计算风险等级字符串"""
+    if voltage is None or voltage == PLACEHOLDER_VOLTAGE:
+        return "未知"
+    elif voltage < -1.2:
+        return "过保护"
+    elif -1.2 <= voltage <= -0.85:
+        return "正常"
+    else:
+        return "欠保护"
+
+
+def latest_voltage_value(latest_voltages, pile_id):
+    """从最新电压字典中取出测试桩的电压，缺失时返回占位值"""
+    current_voltage_info = latest_voltages.get(pile_id)
+    if current_voltage_info and current_voltage_info.get("voltage") is not None:
+        return float(current_voltage_info["voltage"])
+    return PLACEHOLDER_VOLTAGE
+
+
+def pile_risk_levels(piles_data, latest_voltages):
+    """与 piles_data 顺序一致的风险等级列表"""
+    return [
+        calculate_risk_level(latest_voltage_value(latest_voltages, pile["id"]))
+        for pile in piles_data
+    ]
+
+
+def build_pile_features(
+    piles_data, latest_voltages, xs, ys, logger=None, is_canceled=None
+):
+    """
+    构建测试桩点要素列表。
+    xs / ys 为与 piles_data 顺序一致的 Web Mercator 坐标数组 (见 projection.py)。
+    is_canceled 为可选的回调，返回 True 时提前结束并返回 None。
+    """
+    features = []
+    for index, (pile, x, y) in enumerate(zip(piles_data, xs.tolist(), ys.tolist())):
+        if is_canceled and index % 500 == 0 and is_canceled():
+            return None
+        try:
+            current_voltage = latest_voltage_value(latest_voltages, pile["id"])
+            risk_level = calculate_risk_level(current_voltage)
+
+            feat = QgsFeature()
+            feat.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+            feat.setAttributes([pile["id"], pile["name"], current_voltage, risk_level])
+            features.append(feat)
+        except Exception as e:
+            if logger:
+                logger.error(
+                    f"处理测试桩 ID {pile.get('id', 'unknown')} 时出错: {str(e)}"
+                )
+    return features
+
+
+def build_pipeline_points(xs, ys):
+    """按测试桩顺序构建管线折线的顶点 (Web Mercator)"""
+    return [QgsPointXY(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+
+
+def diff_pile_features(existing, incoming, tolerance=1e-6):
+    """
+    比较图层中已有的测试桩要素与新构建的要素，只找出需要变更的部分。
+
+    existing: {pile_id: (fid, [属性...], (x, y))}，来自现有图层
+    incoming: {pile_id: ([属性...], (x, y))}，来自最新数据
+    返回 (attribute_changes, geometry_changes, added_pile_ids, deleted_fids)：
+        attribute_changes: {fid: {字段索引: 新值}}
+        geometry_changes: {fid: (x, y)}
+    """
+    attribute_changes = {}
+    geometry_changes = {}
+    added_pile_ids = []
+
+    for pile_id, (attributes, point) in incoming.items():
+        current = existing.get(pile_id)
+        if current is None:
+            added_pile_ids.append(pile_id)
+            continue
+        fid, current_attributes, current_point = current
+
+        changed = {}
+        for index, value in enumerate(attributes):
+            old_value = (
+                current_attributes[index] if index < len(current_attributes) else None
+            )
+            if isinstance(value, float) and isinstance(old_value, (int, float)):
+                if abs(value - old_value) > 1e-9:
+                    changed[index] = value
+            elif value != old_value:
+                changed[index] = value
+        if changed:
+            attribute_changes[fid] = changed
+
+        if (
+            current_point is None
+            or abs(point[0] - current_point[0]) > tolerance
+            or abs(point[1] - current_point[1]) > tolerance
+        ):
+            geometry_changes[fid] = point
+
+    deleted_fids = [
+        fid for pile_id, (fid, _, _) in existing.items() if pile_id not in incoming
+    ]
+    return attribute_changes, geometry_changes, added_pile_ids, deleted_fids
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+测试桩位置的最近邻索引。
+
+在投影后的坐标数组上建立均匀网格：点按网格单元排序后，
+查询时只检查点击位置附近的若干单元，不必逐个计算全部测试桩的距离。
+只依赖 NumPy，不访问图层，可在主线程中随时查询。
+"""
+
+import numpy as np
+
+
+class PileSpatialIndex:
+    """
+    基于均匀网格的测试桩最近邻索引。
+
+    rebuild() 在测试桩位置未变化时直接返回，不重新建立索引；
+    nearest() 返回搜索半径内距离最近的 k 个测试桩。
+    """
+
+    def __init__(self):
+        self.pile_ids = np.empty(0, dtype=np.int64)
+        self.xs = np.empty(0, dtype=np.float64)
+        self.ys = np.empty(0, dtype=np.float64)
+        self._origin = (0.0, 0.0)
+        self._cell_size = 1.0
+        self._columns = 1
+        self._rows = 1
+        self._sorted_keys = np.empty(0, dtype=np.int64)
+        self._order = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.pile_ids)
+
+    def rebuild(self, pile_ids, xs, ys):
+        """
+        用新的测试桩位置重建索引。位置与当前索引完全一致时跳过，
+        返回是否真正重建了索引。
+        """
+        pile_ids = np.asarray(pile_ids, dtype=np.int64)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if (
+            np.array_equal(pile_ids, self.pile_ids)
+            and np.array_equal(xs, self.xs)
+            and np.array_equal(ys, self.ys)
+        ):
+            return False
+
+        self.pile_ids = pile_ids.copy()
+        self.xs = xs.copy()
+        self.ys = ys.copy()
+        if not len(pile_ids):
+            self._sorted_keys = np.empty(0, dtype=np.int64)
+            self._order = np.empty(0, dtype=np.int64)
+            return True
+
+        min_x, min_y = float(xs.min()), float(ys.min())
+        width = float(xs.max()) - min_x
+        height = float(ys.max()) - min_y
+        # 网格单元大小使平均每个单元约有一个测试桩
+        cell_size = np.sqrt(max(width * height, 1e-12) / len(pile_ids))
+        cell_size = max(cell_size, width / 4096.0, height / 4096.0, 1e-6)
+
+        self._origin = (min_x, min_y)
+        self._cell_size = float(cell_size)
+        cols, rows = self._cells(xs, ys)
+        self._columns = int(cols.max()) + 1
+        self._rows = int(rows.max()) + 1
+        keys = self._cell_keys(cols, rows)
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+        return True
+
+    def nearest(self, x, y, k=1, max_distance=None):
+        """
+        返回距离 (x, y) 最近的 k 个测试桩 [(pile_id, distance), ...]，按距离升序。
+        max_distance 为搜索半径 (与坐标同单位)，超出半径的测试桩不会返回。
+        """
+        if not len(self.pile_ids) or k <= 0:
+            return []
+
+        candidates = None
+        if max_distance is not None:
+            candidates = self._candidates_within(x, y, max_distance)
+        if candidates is None:
+            candidates = np.arange(len(self.pile_ids))
+        if not len(candidates):
+            return []
+
+        distances = np.hypot(self.xs[candidates] - x, self.ys[candidates] - y)
+        if max_distance is not None:
+            within = distances <= max_distance
+            candidates = candidates[within]
+            distances = distances[within]
+        if len(distances) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            candidates = candidates[nearest]
+            distances = distances[nearest]
+        ranked = np.argsort(distances, kind="stable")
+        return [
+            (int(self.pile_ids[candidates[i]]), float(distances[i])) for i in ranked
+        ]
+
+    def _cells(self, xs, ys):
+        col = np.floor((np.asarray(xs) - self._origin[0]) / self._cell_size)
+        row = np.floor((np.asarray(ys) - self._origin[1]) / self._cell_size)
+        return col.astype(np.int64), row.astype(np.int64)
+
+    def _cell_keys(self, cols, rows):
+        return cols * self._rows + rows
+
+    def _candidates_within(self, x, y, radius):
+        """
+        返回搜索半径所覆盖网格单元中的测试桩下标。
+        半径覆盖的单元数超过测试桩数量时 (例如地图缩得很小) 返回 None，
+        由调用方直接在全部测试桩上计算距离。
+        """
+        cols, rows = self._cells([x - radius, x + radius], [y - radius, y + radius])
+        col_min, col_max = max(int(cols[0]), 0), min(int(cols[1]), self._columns - 1)
+        row_min, row_max = max(int(rows[0]), 0), min(int(rows[1]), self._rows - 1)
+        if col_min > col_max or row_min > row_max:
+            return np.empty(0, dtype=np.int64)
+        if (col_max - col_min + 1) * (row_max - row_min + 1) > len(self.pile_ids):
+            return None
+
+        # 同一列中连续的行对应连续的 key，每列只需一次 searchsorted
+        cols = np.arange(col_min, col_max + 1, dtype=np.int64)
+        starts = np.searchsorted(
+            self._sorted_keys, self._cell_keys(cols, row_min), side="left"
+        )
+        ends = np.searchsorted(
+            self._sorted_keys, self._cell_keys(cols, row_max), side="right"
+        )
+        slices = [self._order[s:e] for s, e in zip(starts, ends) if e > s]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+测试桩列表的 Qt 模型。
+
+模型只保存可见行 (过滤结果) 对应的行号数组，文本在视图请求时才从 PileSearchIndex
+中取出，不为每个测试桩创建 QListWidgetItem；配合 QListView.setUniformItemSizes，
+10 万个测试桩时视图也只处理屏幕上可见的几十行。
+重新加载或过滤条件变化时，按测试桩 ID 比较前后两次的可见行，只发出增删行的信号，
+视图的滚动位置与选中项得以保留。
+"""
+
+import numpy as np
+from qgis.PyQt.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from .pile_search import PileSearchIndex, row_update_steps
+
+# data() 中返回测试桩 ID 的角色
+PileIdRole = Qt.UserRole + 1
+
+
+class PileListModel(QAbstractListModel):
+    """基于 PileSearchIndex 的虚拟化测试桩列表，支持按文本、风险等级与管线过滤"""
+
+    # 增删区间超过该数目时直接重置模型，比逐段发信号更快
+    MAX_INCREMENTAL_RUNS = 64
+
+    def __init__(self, parent=None):
+        super(PileListModel, self).__init__(parent)
+        self.search_index = PileSearchIndex([], [], [], [])
+        self.filter_text = ""
+        self.risk_level = None
+        self.pipeline_id = None
+        # 可见行在 search_index 中的行号，以及对应的测试桩 ID (均按 ID 升序)
+        self._rows = np.empty(0, dtype=np.int64)
+        self._ids = np.empty(0, dtype=np.int64)
+
+    # --- QAbstractListModel 接口 ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+            return None
+        row = int(self._rows[index.row()])
+        if role == Qt.DisplayRole:
+            return self.search_index.texts[row]
+        if role == Qt.ToolTipRole:
+            pipeline_id = self.search_index.pipeline_ids[row]
+            pipeline_text = "无" if pipeline_id is None else pipeline_id
+            return (
+                f"风险等级: {self.search_index.risk_levels[row]}\n"
+                f"所属管线ID: {pipeline_text}"
+            )
+        if role == PileIdRole:
+            return int(self.search_index.pile_ids[row])
+        return None
+
+    # --- 数据与过滤 ---
+
+    def pile_id_at(self, index):
+        """视图中某一行对应的测试桩 ID"""
+        return self.data(index, PileIdRole)
+
+    def set_search_index(self, search_index):
+        """替换测试桩目录 (重新加载后)，按 ID 增量更新可见行"""
+        old_ids = self._ids
+        self.search_index = search_index
+        # 保留下来的行换算为新目录中的行号 (将被删除的行的取值无关紧要)
+        positions = np.searchsorted(search_index.pile_ids, old_ids)
+        self._rows = np.minimum(positions, max(len(search_index) - 1, 0))
+        self._apply_rows(self._filtered_rows(), data_changed=True)
+
+    def set_filter(self, text="", risk_level=None, pipeline_id=None):
+        """设置过滤条件 (None 表示不过滤该项)"""
+        self.filter_text = text
+        self.risk_level = risk_level
+        self.pipeline_id = pipeline_id
+        self._apply_rows(self._filtered_rows())
+
+    def update_risk_levels(self, risk_levels):
+        """自动刷新后更新部分测试桩的风险等级 {pile_id: risk_level}"""
+        changed = self.search_index.set_risk_levels(risk_levels)
+        if not changed:
+            return
+        if self.risk_level is not None:
+            # 风险等级变化可能使测试桩进入或离开过滤结果
+            self._apply_rows(self._filtered_rows())
+            return
+        for view_row in np.flatnonzero(np.isin(self._rows, changed)).tolist():
+            model_index = self.index(view_row)
+            self.dataChanged.emit(model_index, model_index, [Qt.ToolTipRole])
+
+    def _filtered_rows(self):
+        return self.search_index.filter(
+            self.filter_text, self.risk_level, self.pipeline_id
+        )
+
+    def _apply_rows(self, new_rows, data_changed=False):
+        """把可见行更新为 new_rows，只对增删的区间发出信号"""
+        new_ids = self.search_index.pile_ids[new_rows]
+        if np.array_equal(self._ids, new_ids):
+            self._rows = new_rows
+            if data_changed and len(new_rows):
+                self.dataChanged.emit(self.index(0), self.index(len(new_rows) - 1))
+            return
+
+        steps = None
+        if len(self._ids):
+            steps = row_update_steps(self._ids, new_ids, self.MAX_INCREMENTAL_RUNS)
+        if steps is None:
+            self.beginResetModel()
+            self._rows, self._ids = new_rows, new_ids
+            self.endResetModel()
+            return
+
+        # 每一步之后行号都与视图保持一致
+        for action, first, last in steps:
+            if action == "remove":
+                self.beginRemoveRows(QModelIndex(), first, last)
+                self._rows = np.delete(self._rows, np.s_[first : last + 1])
+                self._ids = np.delete(self._ids, np.s_[first : last + 1])
+                self.endRemoveRows()
+            else:
+                self.beginInsertRows(QModelIndex(), first, last)
+                self._rows = np.insert(self._rows, first, new_rows[first : last + 1])
+                self._ids = np.insert(self._ids, first, new_ids[first : last + 1])
+                self.endInsertRows()
+        self._rows = new_rows
+        if data_changed and len(new_rows):
+            # 保留下来的测试桩的名称或风险等级可能已变化
+            self.dataChanged.emit(self.index(0), self.index(len(new_rows) - 1))
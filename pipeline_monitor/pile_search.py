@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+测试桩列表的搜索与过滤索引。
+
+测试桩按 ID 升序保存为列数组 (ID、显示文本、风险等级、管线ID)，过滤全部是向量运算：
+- 文本搜索：对预先转为小写的显示文本做子串判断，10 万个测试桩约 10 毫秒；
+  新的搜索词包含上一次的搜索词时 (连续输入)，只在上一次的结果中查找；
+- 风险等级 / 管线ID：数组比较。管线ID 在数据库中是 VARCHAR，按字符串保存
+  (object 数组，没有所属管线时为 None)。
+本模块不依赖 Qt，列表模型见 pile_list_model.py。
+"""
+
+import numpy as np
+
+
+def display_text(pile_id, name):
+    """测试桩在列表中显示的文本"""
+    return f"ID: {pile_id} - {name}"
+
+
+def contiguous_runs(mask):
+    """返回布尔数组中连续 True 区间的 [(first, last), ...] (闭区间，升序)"""
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return []
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return [(int(first), int(end) - 1) for first, end in zip(edges[::2], edges[1::2])]
+
+
+def row_update_steps(old_ids, new_ids, max_runs=None):
+    """
+    把可见行从 old_ids 更新为 new_ids (均按 ID 升序) 的增删步骤
+    [("remove" | "insert", first, last), ...]：先从后往前删除，再从前往后插入，
+    每一步的行号 (闭区间) 都以执行完之前各步后的行为准。
+    增删区间超过 max_runs 个时返回 None，表示应直接重置。
+    """
+    removed_runs = contiguous_runs(~np.isin(old_ids, new_ids))
+    inserted_runs = contiguous_runs(~np.isin(new_ids, old_ids))
+    if max_runs is not None and len(removed_runs) + len(inserted_runs) > max_runs:
+        return None
+    return [("remove", first, last) for first, last in reversed(removed_runs)] + [
+        ("insert", first, last) for first, last in inserted_runs
+    ]
+
+
+class PileSearchIndex:
+    """一次加载的测试桩目录及其搜索索引，行号即按 ID 排序后的下标"""
+
+    def __init__(self, pile_ids, names, pipeline_ids, risk_levels):
+        pile_ids = np.asarray(pile_ids, dtype=np.int64)
+        order = np.argsort(pile_ids, kind="stable")
+        self.pile_ids = pile_ids[order]
+        names = [names[i] or "" for i in order.tolist()]
+        self.texts = [
+            display_text(pile_id, name)
+            for pile_id, name in zip(self.pile_ids.tolist(), names)
+        ]
+        self.pipeline_ids = np.array(
+            [
+                None if pipeline_ids[i] is None else str(pipeline_ids[i])
+                for i in order.tolist()
+            ],
+            dtype=object,
+        )
+        self.risk_levels = np.array(
+            [risk_levels[i] for i in order.tolist()], dtype=object
+        )
+        self._row_of = {
+            pile_id: row for row, pile_id in enumerate(self.pile_ids.tolist())
+        }
+        self._lowered = [text.lower() for text in self.texts]
+        self._last_search = ("", np.arange(len(self.pile_ids), dtype=np.int64))
+
+    @classmethod
+    def from_piles(cls, piles, risk_levels):
+        """由 get_all_test_piles 格式的字典列表构建，risk_levels 与 piles 顺序一致"""
+        return cls(
+            [pile["id"] for pile in piles],
+            [pile.get("name") for pile in piles],
+            [pile.get("pipeline_id") for pile in piles],
+            risk_levels,
+        )
+
+    def __len__(self):
+        return len(self.pile_ids)
+
+    def row_of(self, pile_id):
+        """测试桩所在的行，不存在时返回 None"""
+        return self._row_of.get(pile_id)
+
+    def set_risk_levels(self, risk_levels):
+        """更新部分测试桩的风险等级 {pile_id: risk_level}，返回发生变化的行号"""
+        rows = []
+        for pile_id, level in risk_levels.items():
+            row = self._row_of.get(pile_id)
+            if row is not None and self.risk_levels[row] != level:
+                self.risk_levels[row] = level
+                rows.append(row)
+        return rows
+
+    def search(self, text):
+        """显示文本 (不区分大小写) 包含 text 的行号数组 (升序)"""
+        text = text.strip().lower()
+        last_text, last_rows = self._last_search
+        if text == last_text:
+            return last_rows
+        if last_text in text:
+            # 搜索词只是变长了，结果必然是上一次结果的子集
+            candidates = last_rows
+        else:
+            candidates = np.arange(len(self), dtype=np.int64)
+        lowered = self._lowered
+        matched = np.fromiter(
+            (text in lowered[row] for row in candidates.tolist()),
+            bool,
+            len(candidates),
+        )
+        rows = candidates[matched]
+        self._last_search = (text, rows)
+        return rows
+
+    def filter(self, text="", risk_level=None, pipeline_id=None):
+        """按搜索文本、风险等级与管线ID (None 表示不过滤) 过滤，返回行号数组 (升序)"""
+        mask = np.ones(len(self), dtype=bool)
+        if risk_level is not None:
+            mask &= self.risk_levels == risk_level
+        if pipeline_id is not None:
+            mask &= self.pipeline_ids == pipeline_id
+        rows = np.flatnonzero(mask)
+        if text and text.strip():
+            rows = np.intersect1d(rows, self.search(text), assume_unique=True)
+        return rows
+
+    def distinct_pipeline_ids(self):
+        """出现过的管线ID (升序，不含 None)"""
+        return sorted({pipeline_id for pipeline_id in self.pipeline_ids} - {None})
@@ -25,16 +25,14 @@ from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
 import logging  # Import the logging module
+import sys
 import traceback
 
 # Initialize Qt resources from file resources.py
 from .resources import *
 
-# Import the code for the dialog
-from .pipeline_monitor_dialog import (
-    PipelineMonitorDialog,
-    QgsMessageLogHandler,
-)
+# 对话框 (及其依赖的 NumPy、数据库驱动等) 在首次运行插件时才导入，见 run()
+from .message_log import QgsMessageLogHandler
 import os.path
 
 # # Get a logger for the main plugin class # REMOVED: Module-level logger is moved to instance level
@@ -198,6 +196,10 @@ class PipelineMonitor:
         for action in self.actions:
             self.iface.removePluginMenu(self.tr("&管线监控工具"), action)
             self.iface.removeToolBarIcon(action)
+        # 插件卸载时关闭共享连接池中的所有连接 (从未打开过对话框时没有连接池)
+        db_operations = sys.modules.get(f"{__package__}.db_operations")
+        if db_operations is not None:
+            db_operations.close_pool()
 
     def run(self):
         if self.plugin_logger:
@@ -209,12 +211,14 @@ class PipelineMonitor:
                 self.plugin_logger.debug(
                     "Dialog instance not found, is None, or not visible. Creating new dialog."
                 )
+            from .pipeline_monitor_dialog import PipelineMonitorDialog
+
             # 创建对话框实例，并将主窗口作为父级
             self.dlg = PipelineMonitorDialog(self.iface.mainWindow())
             # 将QGIS的iface接口传递给对话框，以便对话框能访问地图画布等
             self.dlg.set_iface(self.iface)
-            # 实现首次打开时自动加载数据
-            self.dlg.load_and_display_data()
+            # 实现首次打开时自动加载数据 (先显示本地快照，再与数据库同步)
+            self.dlg.load_snapshot_then_database()
 
             # 在加载数据完成后再初始化底图
             try:
@@ -2,17 +2,17 @@
 
 import os
 import traceback
+from datetime import datetime
 import logging  # Import the logging module
 import sys  # Import sys for robust logging
 from qgis.PyQt import uic
-from qgis.PyQt.QtWidgets import QDialog, QListWidgetItem, QLabel
+from qgis.PyQt.QtWidgets import QDialog, QLabel
 from qgis.PyQt.QtGui import QColor
-from qgis.PyQt.QtCore import Qt, QMetaType
+from qgis.PyQt.QtCore import Qt, QTimer, pyqtSlot
 from PyQt5.QtCore import QVariant, QSettings  # 添加QSettings导入
 from qgis.core import (
     QgsProject,
     QgsVectorLayer,
-    QgsField,
     QgsFeature,
     QgsGeometry,
     QgsPointXY,
@@ -29,40 +29,26 @@ from qgis.core import (
     QgsRasterLayer,
     QgsLayerTree,
     QgsLayerTreeLayer,
-    QgsMessageLog,
     Qgis,  # Import Qgis for message levels
     QgsSingleSymbolRenderer,  # 用于行政规划图样式设置
+    QgsApplication,
 )
 
 from .map_tool import PointTool
-from .pile_details_dialog import PileDetailsDialog
-from . import db_operations
-
-
-# Custom logging handler for QGIS Message Log
-class QgsMessageLogHandler(logging.Handler):
-    def emit(self, record):
-        msg = self.format(record)
-        # Map logging levels to QgsMessageLog message types using Qgis enum
-        if record.levelno >= logging.CRITICAL:
-            QgsMessageLog.logMessage(
-                msg, "PipelineMonitor", Qgis.Critical
-            )  # Use Qgis.Critical
-        elif record.levelno >= logging.ERROR:
-            QgsMessageLog.logMessage(
-                msg, "PipelineMonitor", Qgis.Critical
-            )  # Map ERROR to Critical for visibility
-        elif record.levelno >= logging.WARNING:
-            QgsMessageLog.logMessage(
-                msg, "PipelineMonitor", Qgis.Warning
-            )  # Use Qgis.Warning
-        elif record.levelno >= logging.INFO:
-            QgsMessageLog.logMessage(msg, "PipelineMonitor", Qgis.Info)  # Use Qgis.Info
-        else:  # DEBUG and NOTSET
-            QgsMessageLog.logMessage(
-                msg, "PipelineMonitor", Qgis.Info
-            )  # Map DEBUG to Info
-
+from .message_log import QgsMessageLogHandler
+from .load_task import LoadDataTask, PollReadingsTask
+from .auto_refresh import AdaptiveInterval, ReadingWatermark, merge_latest_readings
+from .history_cache import history_cache
+from .projection import ProjectedPositionCache
+from .pile_index import PileSpatialIndex
+from .pile_list_model import PileListModel
+from .pile_features import (
+    RISK_LEVELS,
+    calculate_risk_level,
+    diff_pile_features,
+    latest_voltage_value,
+    pile_fields,
+)
 
 FORM_CLASS, _ = uic.loadUiType(
     os.path.join(os.path.dirname(__file__), "pipeline_monitor_dialog_base.ui")
@@ -70,6 +56,11 @@ FORM_CLASS, _ = uic.loadUiType(
 
 
 class PipelineMonitorDialog(QDialog, FORM_CLASS):
+    # 地图点击识别测试桩时的搜索半径 (屏幕像素)
+    CLICK_TOLERANCE_PIXELS = 10
+    # 测试桩搜索框停止输入后过滤前的等待时间 (毫秒)
+    PILE_FILTER_DELAY_MS = 150
+
     def __init__(self, parent=None):
         super(PipelineMonitorDialog, self).__init__(parent)
         self.setupUi(self)
@@ -79,6 +70,28 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
         self.point_tool = None
         self.first_open = True  # 标记是否是首次打开插件
         self.data_loaded = False  # 标记数据是否已加载
+        self.schema_checked = False  # 标记是否已检查数据库结构与索引
+        self.load_task = None  # 正在运行的后台加载任务
+        self.snapshot_saved_at = None  # 当前显示的是本地快照时为其保存时间
+        self.position_cache = ProjectedPositionCache()  # 测试桩投影坐标缓存
+        self.pile_index = PileSpatialIndex()  # 点击识别用的测试桩位置索引
+        self.pile_fids = None  # (图层ID, {测试桩ID: 要素fid})
+
+        # --- 自动刷新 (按读数ID高水位增量轮询) ---
+        self.latest_voltages = {}  # 当前图层所显示的最新电压
+        self.reading_watermark = None  # ReadingWatermark，数据库加载完成后创建
+        self.poll_task = None
+        self.refresh_interval = AdaptiveInterval()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.poll_new_readings)
+        # 测试桩列表模型 (虚拟化，不为每个测试桩创建列表项)
+        self.pile_list_model = PileListModel(self)
+        # 输入搜索文字停顿后才过滤，连续输入时不重复计算
+        self.pile_filter_timer = QTimer(self)
+        self.pile_filter_timer.setSingleShot(True)
+        self.pile_filter_timer.setInterval(self.PILE_FILTER_DELAY_MS)
+        self.pile_filter_timer.timeout.connect(self.apply_pile_filter)
 
         # Initialize logger
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -112,6 +125,11 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
         if hasattr(self, "loadDataButton"):
             self.loadDataButton.clicked.connect(lambda: self.load_and_display_data())
 
+        if hasattr(self, "autoRefreshCheckBox"):
+            self.autoRefreshCheckBox.toggled.connect(self.set_auto_refresh)
+
+        self.setup_pile_list()
+
         if hasattr(self, "identifyButton"):
             self.identifyButton.setCheckable(True)
             self.identifyButton.clicked.connect(self.activate_point_tool)
@@ -138,14 +156,7 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
 
     def calculate_risk_level(self, voltage):
         """根据电压值计算风险等级字符串"""
-        if voltage is None or voltage == 9999.0:
-            return "未知"
-        elif voltage < -1.2:
-            return "过保护"
-        elif -1.2 <= voltage <= -0.85:
-            return "正常"
-        else:
-            return "欠保护"
+        return calculate_risk_level(voltage)
 
     def initialize_base_maps(self):
         """初始化所有底图图层 - 一次性创建所有底图并添加到图层树，通过控制可见性来切换"""
@@ -440,63 +451,46 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
         layer_crs = self.piles_layer.crs()
         canvas_crs = canvas.mapSettings().destinationCrs()
 
+        # 搜索容差以屏幕像素为单位，在任何比例尺下点击手感一致
+        search_radius = self.CLICK_TOLERANCE_PIXELS * canvas.mapUnitsPerPixel()
+
         click_point_in_layer_crs = point
         if layer_crs.authid() != canvas_crs.authid():
             transform = QgsCoordinateTransform(
                 canvas_crs, layer_crs, QgsProject.instance()
             )
             click_point_in_layer_crs = transform.transform(point)
+            # 把搜索半径也换算到图层坐标系的单位
+            edge_point = transform.transform(
+                QgsPointXY(point.x() + search_radius, point.y())
+            )
+            search_radius = click_point_in_layer_crs.distance(edge_point)
             self.logger.debug(
                 f"转换点击坐标从 {canvas_crs.authid()} 到 {layer_crs.authid()}"
             )
         else:
             self.logger.debug(f"画布和图层使用相同的坐标系: {canvas_crs.authid()}")
 
-        # Web Mercator (EPSG:3857)坐标系下的搜索容差需要较大
-        # 因为EPSG:3857的单位是米，而不是度
-        tolerance = 50  # 50米的搜索半径
-
-        # 创建一个搜索矩形
-        search_rect = QgsRectangle(
-            click_point_in_layer_crs.x() - tolerance,
-            click_point_in_layer_crs.y() - tolerance,
-            click_point_in_layer_crs.x() + tolerance,
-            click_point_in_layer_crs.y() + tolerance,
+        # 在测试桩位置索引中查找搜索半径内最近的测试桩
+        matches = self.pile_index.nearest(
+            click_point_in_layer_crs.x(),
+            click_point_in_layer_crs.y(),
+            k=1,
+            max_distance=search_radius,
         )
+        closest_feature = None
+        if matches:
+            pile_id, distance = matches[0]
+            self.logger.debug(
+                f"Nearest pile {pile_id} at {distance:.1f} (radius {search_radius:.1f})."
+            )
+            closest_feature = self.get_pile_feature(pile_id)
 
-        # 创建一个要素请求
-        request = QgsFeatureRequest().setFilterRect(search_rect)
-        found_features = list(self.piles_layer.getFeatures(request))
-
-        if found_features:
-            self.logger.debug(f"Found {len(found_features)} feature(s) nearby.")
-
-            # 找到最接近点击位置的要素
-            closest_feature = None
-            min_distance = float("inf")
-
-            for feature in found_features:
-                if feature.geometry() and not feature.geometry().isEmpty():
-                    distance = (
-                        feature.geometry()
-                        .centroid()
-                        .asPoint()
-                        .distance(click_point_in_layer_crs)
-                    )
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_feature = feature
-
-            if closest_feature:
-                self.show_details_dialog(closest_feature)
-                self.logger.debug(
-                    f"Selected feature for dialog - ID: {closest_feature.attribute('id')}, Name: {closest_feature.attribute('name')}, Voltage: {closest_feature.attribute('voltage')}, Risk: {closest_feature.attribute('risk_level')}"
-                )
-            else:
-                self.logger.debug("No valid feature found among nearby features.")
-                self.iface.messageBar().pushMessage(
-                    "提示", "未找到附近的测试桩。", level=Qgis.Info
-                )
+        if closest_feature:
+            self.show_details_dialog(closest_feature)
+            self.logger.debug(
+                f"Selected feature for dialog - ID: {closest_feature.attribute('id')}, Name: {closest_feature.attribute('name')}, Voltage: {closest_feature.attribute('voltage')}, Risk: {closest_feature.attribute('risk_level')}"
+            )
         else:
             self.logger.debug("No feature found nearby.")
             self.iface.messageBar().pushMessage(
@@ -504,65 +498,189 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
             )
         self.logger.debug("-" * 50)
 
+    def get_pile_feature(self, pile_id):
+        """按测试桩 ID 取出测试桩图层中的要素，找不到时返回 None"""
+        fid = self.pile_fid_map().get(pile_id)
+        if fid is None:
+            return None
+        feature = self.piles_layer.getFeature(fid)
+        if not feature.isValid() or feature.attribute("id") != pile_id:
+            # 映射已过期 (例如图层被外部修改)，下次使用时重新生成
+            self.pile_fids = None
+            return None
+        return feature
+
+    def pile_fid_map(self):
+        """
+        返回测试桩 ID 到测试桩图层要素 fid 的映射。
+        映射按图层缓存，图层被重建或位置索引更新后重新生成。
+        """
+        layer_id = self.piles_layer.id()
+        if self.pile_fids is None or self.pile_fids[0] != layer_id:
+            request = QgsFeatureRequest()
+            request.setFlags(QgsFeatureRequest.NoGeometry)
+            request.setSubsetOfAttributes(["id"], self.piles_layer.fields())
+            fids = {
+                feature.attribute("id"): feature.id()
+                for feature in self.piles_layer.getFeatures(request)
+            }
+            self.pile_fids = (layer_id, fids)
+        return self.pile_fids[1]
+
     def show_details_dialog(self, feature):
-        dialog = PileDetailsDialog(feature, self)
+        # 详情对话框依赖 matplotlib，首次打开时才导入，避免拖慢 QGIS 启动与插件加载
+        from .pile_details_dialog import PileDetailsDialog
+
+        latest = self.latest_voltages.get(feature.attribute("id")) or {}
+        dialog = PileDetailsDialog(
+            feature, self, latest_reading_time=latest.get("reading_timestamp")
+        )
         dialog.exec_()
 
     def closeEvent(self, event):
+        self.cancel_loading()
+        self.stop_auto_refresh()
         if self.point_tool and self.iface:
             self.iface.mapCanvas().unsetMapTool(self.point_tool)
         super(PipelineMonitorDialog, self).closeEvent(event)
 
-    def load_and_display_data(self, auto_zoom=False):
+    def load_and_display_data(self, auto_zoom=False, center_on_layers=False):
         """
-        加载并显示数据
+        在后台任务中加载数据，完成后在主线程中更新图层
 
         参数:
             auto_zoom (bool): 是否自动缩放到图层范围，默认为False
+            center_on_layers (bool): 是否移动到图层中心并保持当前比例尺，默认为False
         """
         self.update_status_label("正在连接数据库并加载数据...")
-        conn = db_operations.create_connection()
-        if not (conn and conn.is_connected()):
-            self.update_status_label("错误: 无法连接到数据库。")
+        self.start_load_task(
+            lambda finished_task, result: self._on_load_finished(
+                finished_task, result, auto_zoom, center_on_layers
+            )
+        )
+
+    def load_snapshot_then_database(self, auto_zoom=False, center_on_layers=False):
+        """
+        先用本地快照立即绘制地图，再在后台与数据库同步 (增量更新图层)。
+        没有快照时直接从数据库加载。
+        """
+        if not os.path.exists(self.snapshot_path()):
+            self.load_and_display_data(auto_zoom, center_on_layers)
+            return
+
+        self.update_status_label("正在读取本地快照...")
+        self.start_load_task(
+            lambda finished_task, result: self._on_snapshot_loaded(
+                finished_task, result, auto_zoom, center_on_layers
+            ),
+            from_snapshot=True,
+        )
+
+    def start_load_task(self, on_finished, from_snapshot=False):
+        """创建并提交后台加载任务，新的加载请求会取消尚未完成的旧请求"""
+        self.cancel_loading()
+
+        task = LoadDataTask(
+            on_finished,
+            self.position_cache,
+            check_schema=not from_snapshot and not self.schema_checked,
+            logger=self.logger,
+            snapshot_path=self.snapshot_path(),
+            from_snapshot=from_snapshot,
+        )
+        task.progressChanged.connect(self._on_load_progress)
+        # 必须保留Python端引用，否则任务对象可能在执行期间被回收
+        self.load_task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def snapshot_path(self):
+        """本地快照文件路径 (QGIS 用户配置目录下)"""
+        return os.path.join(
+            QgsApplication.qgisSettingsDirPath(), "pipeline_monitor", "snapshot.sqlite"
+        )
+
+    def _on_snapshot_loaded(self, task, result, auto_zoom, center_on_layers):
+        """(主线程) 快照显示完毕后，在后台从数据库读取最新数据"""
+        if task is not self.load_task:
+            self.logger.debug("忽略已被取代的快照加载结果")
+            return
+        self._on_load_finished(task, result, auto_zoom, center_on_layers)
+        # 视图已按快照定位，与数据库同步时不再移动地图
+        self.load_and_display_data()
+
+    def cancel_loading(self):
+        """取消正在运行的后台加载任务"""
+        if self.load_task is not None:
+            try:
+                self.load_task.cancel()
+            except RuntimeError:
+                pass  # 任务已结束并被销毁
+            self.load_task = None
+
+    @pyqtSlot(float)
+    def _on_load_progress(self, progress):
+        """后台任务进度变化时更新状态标签 (经由队列连接在主线程中调用)"""
+        if self.load_task is not None:
+            self.update_status_label(f"正在加载数据... {progress:.0f}%")
+
+    def _on_load_finished(self, task, result, auto_zoom, center_on_layers):
+        """(主线程) 后台任务完成后替换图层并刷新界面"""
+        if task is not self.load_task:
+            self.logger.debug("忽略已被取代的加载任务结果")
+            return
+        self.load_task = None
+
+        if task.check_schema:
+            self.schema_checked = True
+            self.report_schema_warnings(task.schema_warnings)
+
+        if not result:
+            if task.isCanceled():
+                self.update_status_label("数据加载已取消。")
+            elif not task.from_snapshot and self.snapshot_saved_at is not None:
+                # 数据库不可达时继续以只读方式显示快照数据
+                self.update_status_label(
+                    f"{task.error_message or '数据加载失败。'} 当前显示的是 "
+                    f"{self.snapshot_saved_at:%Y-%m-%d %H:%M} 保存的本地快照 (只读)。"
+                )
+            else:
+                self.update_status_label(task.error_message or "数据加载失败。")
             return
-        try:
-            self.logger.debug("成功连接到数据库，正在获取测试桩和电压数据...")
-            all_piles = db_operations.get_all_test_piles(conn)
-            latest_voltages = db_operations.get_latest_voltages(conn)
 
+        all_piles = task.all_piles
+        try:
             if not all_piles:
+                self.pile_index.rebuild([], [], [])
                 self.update_status_label("警告: 数据库中没有测试桩数据。")
-                if conn.is_connected():
-                    conn.close()
                 return
 
             # 检查图层是否已经存在
             existing_piles_layer = self.find_existing_layer("测试桩图层 (带风险状态)")
             existing_pipeline_layer = self.find_existing_layer("管线图层")
 
-            # 记录是否需要创建新图层
-            new_layers_created = False
-
-            # 如果不存在测试桩图层或其引用已失效，则创建新图层
-            if not existing_piles_layer:
-                self.logger.debug("测试桩图层不存在或已失效，创建新图层")
-                self.create_or_update_piles_layer(all_piles, latest_voltages)
-                new_layers_created = True
-            else:
-                self.logger.debug("测试桩图层已存在，使用现有图层")
-                self.piles_layer = existing_piles_layer
+            # 如果不存在测试桩图层或其引用已失效，则创建新图层；
+            # 否则只把变化的部分增量应用到现有图层，保留渲染器与图层树位置
+            if not existing_piles_layer or not self.update_piles_layer_in_place(
+                existing_piles_layer, task.pile_features
+            ):
+                self.logger.debug("测试桩图层不存在或无法增量更新，创建新图层")
+                self.create_or_update_piles_layer(task.pile_features)
 
             # 如果不存在管线图层或其引用已失效，则创建新图层
-            if not existing_pipeline_layer:
-                self.logger.debug("管线图层不存在或已失效，创建新图层")
-                self.create_or_update_pipeline_layer(all_piles)
-                new_layers_created = True
-            else:
-                self.logger.debug("管线图层已存在，使用现有图层")
-                self.pipeline_layer = existing_pipeline_layer
+            if not existing_pipeline_layer or not self.update_pipeline_layer_in_place(
+                existing_pipeline_layer, task.pipeline_points
+            ):
+                self.logger.debug("管线图层不存在或无法增量更新，创建新图层")
+                self.create_or_update_pipeline_layer(task.pipeline_points)
+
+            # 测试桩位置变化时才重建点击识别索引
+            if self.pile_index.rebuild(
+                [pile["id"] for pile in all_piles], task.pile_xs, task.pile_ys
+            ):
+                self.pile_fids = None
 
             # 更新测试桩列表
-            self.populate_pile_list(all_piles)
+            self.populate_pile_list(task.pile_search_index)
 
             # 确保数据图层在顶部
             self.ensure_data_layers_on_top()
@@ -571,25 +689,257 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
             if auto_zoom:
                 self.logger.debug("自动缩放到图层范围")
                 self.zoom_to_layers()
+            elif center_on_layers:
+                self.logger.debug("移动到图层中心并保持当前比例尺")
+                self.zoom_to_layers(preserve_scale=True)
             else:
                 self.logger.debug("跳过自动缩放，保留当前视图")
 
             # 标记数据已加载
             self.data_loaded = True
 
+            # 记录当前显示的最新电压；数据库加载时同时更新自动刷新的高水位
+            self.latest_voltages = dict(task.latest_voltages)
+            if not task.from_snapshot and task.max_reading_id is not None:
+                self.reading_watermark = ReadingWatermark(task.max_reading_id)
+
             # 更新状态
-            self.update_status_label(f"加载成功！共加载 {len(all_piles)} 个测试桩。")
+            if task.from_snapshot:
+                self.snapshot_saved_at = task.snapshot_saved_at
+                self.update_status_label(
+                    f"已显示本地快照 ({len(all_piles)} 个测试桩，保存于 "
+                    f"{self.snapshot_saved_at:%Y-%m-%d %H:%M})，正在与数据库同步..."
+                )
+            else:
+                self.snapshot_saved_at = None
+                self.update_status_label(
+                    f"加载成功！共加载 {len(all_piles)} 个测试桩。"
+                )
         except Exception as e:
             self.update_status_label(
                 f"发生错误: {type(e).__name__}。详情见Python控制台。"
             )
             self.logger.exception("插件执行时发生严重错误！")
-        finally:
-            if conn and conn.is_connected():
-                conn.close()
 
-    def create_or_update_piles_layer(self, piles_data, latest_voltages):
-        """根据最新电压数据创建或更新测试桩的点图层，并应用分类渲染"""
+    def set_auto_refresh(self, enabled):
+        """开启或关闭自动刷新"""
+        if enabled:
+            self.refresh_interval.reset()
+            self.schedule_auto_refresh()
+            self.logger.debug(
+                f"自动刷新已开启，间隔 {self.refresh_interval.current / 1000:.0f} 秒"
+            )
+        else:
+            self.stop_auto_refresh()
+            self.logger.debug("自动刷新已关闭")
+
+    def schedule_auto_refresh(self):
+        """自动刷新开启时，按当前自适应间隔安排下一次轮询"""
+        if (
+            hasattr(self, "autoRefreshCheckBox")
+            and self.autoRefreshCheckBox.isChecked()
+        ):
+            self.refresh_timer.start(self.refresh_interval.current)
+
+    def stop_auto_refresh(self):
+        """停止定时器并取消正在进行的轮询"""
+        self.refresh_timer.stop()
+        if self.poll_task is not None:
+            try:
+                self.poll_task.cancel()
+            except RuntimeError:
+                pass  # 任务已结束并被销毁
+            self.poll_task = None
+
+    def poll_new_readings(self):
+        """(定时器) 在后台只查询高水位之后的新读数"""
+        if (
+            self.load_task is not None
+            or self.poll_task is not None
+            or self.reading_watermark is None
+        ):
+            # 完整加载尚未完成 (或尚无数据库水位)，稍后再试
+            self.schedule_auto_refresh()
+            return
+
+        task = PollReadingsTask(
+            self._on_poll_finished,
+            self.reading_watermark.after_id(),
+            logger=self.logger,
+        )
+        self.poll_task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def _on_poll_finished(self, task, result):
+        """(主线程) 合并新读数，只更新最新电压发生变化的测试桩"""
+        if task is not self.poll_task:
+            return
+        self.poll_task = None
+
+        if not result:
+            if not task.isCanceled():
+                self.logger.warning(f"自动刷新失败: {task.error_message or '未知错误'}")
+                self.refresh_interval.update(0)
+                self.schedule_auto_refresh()
+            return
+
+        # 重新读取的回退窗口中已合并过的读数被去掉
+        readings = self.reading_watermark.accept(task.readings, task.batch_full)
+        if readings:
+            changed_pile_ids = merge_latest_readings(self.latest_voltages, readings)
+            # 有新读数的测试桩 (电压不一定变化) 的历史曲线缓存都已过期
+            history_cache.invalidate({reading["pile_id"] for reading in readings})
+            if changed_pile_ids:
+                self.apply_voltage_changes(changed_pile_ids)
+
+        interval = self.refresh_interval.update(len(readings), task.batch_full)
+        self.logger.debug(
+            f"自动刷新: 新读数 {len(readings)} 条，水位 {self.reading_watermark.max_id}，"
+            f"下次间隔 {interval / 1000:.0f} 秒"
+        )
+        self.schedule_auto_refresh()
+
+    def apply_voltage_changes(self, pile_ids):
+        """把指定测试桩的最新电压与风险等级写入现有测试桩图层"""
+        try:
+            if not (self.piles_layer and self.piles_layer.isValid()):
+                return
+        except RuntimeError:
+            self.piles_layer = None
+            return
+
+        fids = self.pile_fid_map()
+        if any(pile_id not in fids for pile_id in pile_ids):
+            # 出现图层中没有的测试桩，说明测试桩目录有变化，执行一次完整刷新
+            self.logger.debug("自动刷新发现新的测试桩，执行完整加载")
+            self.load_and_display_data()
+            return
+
+        fields = self.piles_layer.fields()
+        voltage_index = fields.indexOf("voltage")
+        risk_index = fields.indexOf("risk_level")
+        changes = {}
+        risk_levels = {}
+        for pile_id in pile_ids:
+            voltage = latest_voltage_value(self.latest_voltages, pile_id)
+            risk_levels[pile_id] = calculate_risk_level(voltage)
+            changes[fids[pile_id]] = {
+                voltage_index: voltage,
+                risk_index: risk_levels[pile_id],
+            }
+        self.piles_layer.dataProvider().changeAttributeValues(changes)
+        self.pile_list_model.update_risk_levels(risk_levels)
+        self.piles_layer.triggerRepaint()
+        self.update_status_label(
+            f"自动刷新: {len(changes)} 个测试桩的电压已更新 "
+            f"({datetime.now():%H:%M:%S})。"
+        )
+
+    def report_schema_warnings(self, schema_warnings):
+        """记录数据库结构检查 (版本与 EXPLAIN 执行计划) 发现的问题"""
+        for message in schema_warnings:
+            self.logger.warning(f"数据库结构检查: {message}")
+        if schema_warnings and self.iface:
+            self.iface.messageBar().pushMessage(
+                "提示",
+                "数据库索引或结构版本存在问题，详情见日志面板。",
+                level=Qgis.Warning,
+            )
+
+    def update_piles_layer_in_place(self, layer, new_features):
+        """
+        将最新要素与现有测试桩图层做差异比较，只提交变化的属性和几何，
+        并只增删新增或已移除的测试桩。渲染器、图层树位置均保持不变。
+        图层结构不符 (例如字段不同) 时返回 False，由调用方重建图层。
+        """
+        expected_fields = [field.name() for field in pile_fields()]
+        if [field.name() for field in layer.fields()] != expected_fields:
+            self.logger.debug("现有测试桩图层字段与预期不符，无法增量更新")
+            return False
+
+        pr = layer.dataProvider()
+        existing = {}
+        for feature in layer.getFeatures():
+            geometry = feature.geometry()
+            point = None
+            if geometry and not geometry.isEmpty():
+                point = geometry.asPoint()
+                point = (point.x(), point.y())
+            existing[feature.attribute("id")] = (
+                feature.id(),
+                feature.attributes(),
+                point,
+            )
+
+        incoming = {}
+        features_by_pile = {}
+        for feature in new_features:
+            pile_id = feature.attributes()[0]
+            point = feature.geometry().asPoint()
+            incoming[pile_id] = (feature.attributes(), (point.x(), point.y()))
+            features_by_pile[pile_id] = feature
+
+        attribute_changes, geometry_changes, added_pile_ids, deleted_fids = (
+            diff_pile_features(existing, incoming)
+        )
+
+        if attribute_changes:
+            pr.changeAttributeValues(attribute_changes)
+        if geometry_changes:
+            pr.changeGeometryValues(
+                {
+                    fid: QgsGeometry.fromPointXY(QgsPointXY(x, y))
+                    for fid, (x, y) in geometry_changes.items()
+                }
+            )
+        if added_pile_ids:
+            pr.addFeatures([features_by_pile[pile_id] for pile_id in added_pile_ids])
+        if deleted_fids:
+            pr.deleteFeatures(deleted_fids)
+
+        self.logger.debug(
+            f"测试桩图层增量更新: 属性变化 {len(attribute_changes)}，几何变化 {len(geometry_changes)}，"
+            f"新增 {len(added_pile_ids)}，删除 {len(deleted_fids)}"
+        )
+        if geometry_changes or added_pile_ids or deleted_fids:
+            layer.updateExtents()
+        if attribute_changes or geometry_changes or added_pile_ids or deleted_fids:
+            layer.triggerRepaint()
+
+        self.piles_layer = layer
+        return True
+
+    def update_pipeline_layer_in_place(self, layer, points):
+        """管线顶点有变化时直接替换现有管线要素的几何，返回是否成功"""
+        pr = layer.dataProvider()
+        features = list(layer.getFeatures())
+        if len(points) < 2:
+            if features:
+                pr.deleteFeatures([feature.id() for feature in features])
+                layer.triggerRepaint()
+            self.pipeline_layer = layer
+            return True
+
+        geometry = QgsGeometry(QgsLineString(points))
+        if not features:
+            feat = QgsFeature()
+            feat.setGeometry(geometry)
+            pr.addFeature(feat)
+        elif features[0].geometry().equals(geometry):
+            self.pipeline_layer = layer
+            return True
+        else:
+            pr.changeGeometryValues({features[0].id(): geometry})
+        layer.updateExtents()
+        layer.triggerRepaint()
+        self.pipeline_layer = layer
+        return True
+
+    def create_or_update_piles_layer(self, features_to_add):
+        """
+        用后台任务构建好的要素创建测试桩的点图层，并应用分类渲染
+        (要素几何已是Web Mercator坐标)
+        """
         layer_name = "测试桩图层 (带风险状态)"
         self.remove_layer_by_name(layer_name)
 
@@ -619,61 +969,11 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
 
             # 添加字段
             try:
-                # 使用推荐的QgsField构造方式
-                pr.addAttributes(
-                    [
-                        QgsField("id", QMetaType.Int, "Integer"),
-                        QgsField("name", QMetaType.QString, "String", 50),
-                        QgsField("voltage", QMetaType.Double, "Double", 10, 3),
-                        QgsField("risk_level", QMetaType.QString, "String", 20),
-                    ]
-                )
+                pr.addAttributes(pile_fields())
                 vl.updateFields()
             except Exception as e:
                 self.logger.error(f"添加测试桩图层字段时出错: {str(e)}")
 
-            # 创建坐标转换器，从WGS84转换到Web Mercator
-            source_crs = QgsCoordinateReferenceSystem("EPSG:4326")  # WGS84
-            dest_crs = QgsCoordinateReferenceSystem("EPSG:3857")  # Web Mercator
-            transform = QgsCoordinateTransform(
-                source_crs, dest_crs, QgsProject.instance()
-            )
-
-            # Create features
-            features_to_add = []
-            for pile in piles_data:
-                try:
-                    pile_id = pile["id"]
-                    current_voltage_info = latest_voltages.get(pile_id)
-                    self.logger.debug(
-                        f"DEBUG: pile_id: {pile_id}, current_voltage_info type: {type(current_voltage_info)}, value: {current_voltage_info}"
-                    )
-
-                    current_voltage = (
-                        float(current_voltage_info["voltage"])
-                        if current_voltage_info
-                        and current_voltage_info.get("voltage") is not None
-                        else 9999.0  # Use 9999.0 for unknown/missing latest voltage
-                    )
-                    self.logger.debug(
-                        f"DEBUG: current_voltage type: {type(current_voltage)}, value: {current_voltage}"
-                    )
-                    risk_level = self.calculate_risk_level(current_voltage)
-
-                    feat = QgsFeature()
-                    # 将WGS84坐标转换为Web Mercator
-                    point = QgsPointXY(pile["longitude"], pile["latitude"])
-                    transformed_point = transform.transform(point)
-                    feat.setGeometry(QgsGeometry.fromPointXY(transformed_point))
-                    feat.setAttributes(
-                        [pile["id"], pile["name"], current_voltage, risk_level]
-                    )
-                    features_to_add.append(feat)
-                except Exception as e:
-                    self.logger.error(
-                        f"处理测试桩 ID {pile.get('id', 'unknown')} 时出错: {str(e)}"
-                    )
-
             self.logger.debug(f"Number of features to add: {len(features_to_add)}")
 
             if features_to_add:
@@ -729,8 +1029,8 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
             self.logger.error(traceback.format_exc())
             self.update_status_label("创建测试桩图层时出错")
 
-    def create_or_update_pipeline_layer(self, piles_data):
-        """创建或更新管线的线图层"""
+    def create_or_update_pipeline_layer(self, points):
+        """用后台任务构建好的顶点 (Web Mercator) 创建管线的线图层"""
         layer_name = "管线图层"
         self.remove_layer_by_name(layer_name)
 
@@ -754,21 +1054,6 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
             except Exception as e:
                 self.logger.warning(f"连接管线图层销毁信号失败: {str(e)}")
 
-            # 创建坐标转换器，从WGS84转换到Web Mercator
-            source_crs = QgsCoordinateReferenceSystem("EPSG:4326")  # WGS84
-            dest_crs = QgsCoordinateReferenceSystem("EPSG:3857")  # Web Mercator
-            transform = QgsCoordinateTransform(
-                source_crs, dest_crs, QgsProject.instance()
-            )
-
-            # 添加管线数据
-            points = []
-            for p in piles_data:
-                # 转换每个点的坐标
-                point = QgsPointXY(p["longitude"], p["latitude"])
-                transformed_point = transform.transform(point)
-                points.append(transformed_point)
-
             if len(points) > 1:
                 try:
                     feat = QgsFeature()
@@ -909,12 +1194,58 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
             self.current_base_map = None
             self.logger.debug("当前底图引用已清理")
 
-    def populate_pile_list(self, piles_data):
-        if hasattr(self, "pileListWidget"):
-            self.pileListWidget.clear()
-            for pile in piles_data:
-                item_text = f"ID: {pile['id']} - {pile['name']}"
-                self.pileListWidget.addItem(QListWidgetItem(item_text))
+    def setup_pile_list(self):
+        """把测试桩列表视图绑定到模型，并连接搜索与过滤控件"""
+        if hasattr(self, "pileListView"):
+            self.pileListView.setUniformItemSizes(True)
+            self.pileListView.setModel(self.pile_list_model)
+        if hasattr(self, "pileFilterLineEdit"):
+            self.pileFilterLineEdit.textChanged.connect(self.pile_filter_timer.start)
+        if hasattr(self, "riskFilterComboBox"):
+            self.riskFilterComboBox.addItem("全部风险等级", None)
+            for level in RISK_LEVELS:
+                self.riskFilterComboBox.addItem(level, level)
+            self.riskFilterComboBox.currentIndexChanged.connect(self.apply_pile_filter)
+        if hasattr(self, "pipelineFilterComboBox"):
+            self.pipelineFilterComboBox.addItem("全部管线", None)
+            self.pipelineFilterComboBox.currentIndexChanged.connect(
+                self.apply_pile_filter
+            )
+
+    def apply_pile_filter(self):
+        """按搜索文字、风险等级与所属管线过滤测试桩列表"""
+        self.pile_filter_timer.stop()
+        text = ""
+        risk_level = None
+        pipeline_id = None
+        if hasattr(self, "pileFilterLineEdit"):
+            text = self.pileFilterLineEdit.text()
+        if hasattr(self, "riskFilterComboBox"):
+            risk_level = self.riskFilterComboBox.currentData()
+        if hasattr(self, "pipelineFilterComboBox"):
+            pipeline_id = self.pipelineFilterComboBox.currentData()
+        self.pile_list_model.set_filter(text, risk_level, pipeline_id)
+
+    def populate_pile_list(self, search_index):
+        """
+        用后台任务构建的 PileSearchIndex 更新测试桩列表。
+        模型按测试桩 ID 增量更新，滚动位置与选中项保持不变。
+        """
+        if hasattr(self, "pipelineFilterComboBox"):
+            # 重新填充管线选项，尽量保留当前选择
+            combo = self.pipelineFilterComboBox
+            current = combo.currentData()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem("全部管线", None)
+            for pipeline_id in search_index.distinct_pipeline_ids():
+                combo.addItem(f"管线 {pipeline_id}", pipeline_id)
+            combo.setCurrentIndex(max(combo.findData(current), 0))
+            combo.blockSignals(False)
+            if combo.currentData() != current:
+                # 原先选择的管线已不存在，先更新过滤条件再替换数据
+                self.pile_list_model.pipeline_id = None
+        self.pile_list_model.set_search_index(search_index)
 
     def update_status_label(self, message):
         if hasattr(self, "statusLabel"):
@@ -1003,6 +1334,8 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
     def showEvent(self, event):
         """当对话框显示时调用，确保不会重置视图"""
         super(PipelineMonitorDialog, self).showEvent(event)
+        # closeEvent 停止了轮询；自动刷新仍处于勾选状态时重新开始
+        self.schedule_auto_refresh()
 
         # 如果不是首次打开，则不进行任何视图重置操作
         if not self.first_open:
@@ -1014,9 +1347,7 @@ class PipelineMonitorDialog(QDialog, FORM_CLASS):
                 self.initialize_base_maps()
 
                 # 如果数据尚未加载，则加载数据
-                if not self.data_loaded:
+                if not self.data_loaded and self.load_task is None:
                     self.logger.debug("首次打开，加载数据并保持当前比例尺")
-                    self.load_and_display_data(auto_zoom=False)
-                    # 移动到图层中心但保持当前比例尺
-                    self.zoom_to_layers(preserve_scale=True)
-                    self.data_loaded = True
+                    # 加载完成后移动到图层中心但保持当前比例尺
+                    self.load_snapshot_then_database(center_on_layers=True)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+WGS84 (EPSG:4326) 到 Web Mercator (EPSG:3857) 的批量投影。
+
+EPSG:3857 是基于 WGS84 长半轴的球面墨卡托投影，有封闭公式，
+因此可以用一次 NumPy 向量运算完成整批坐标的转换，
+避免逐点调用 QgsCoordinateTransform 的 Python/SIP 往返开销。
+"""
+
+import threading
+
+import numpy as np
+
+# WGS84 长半轴 (米)
+EARTH_RADIUS = 6378137.0
+# Web Mercator 的有效纬度范围，超出部分会被截断
+MAX_LATITUDE = 85.05112877980659
+
+
+def lonlat_to_web_mercator(longitudes, latitudes):
+    """
+    将经纬度数组 (度) 批量转换为 Web Mercator 坐标 (米)。
+    返回 (x, y) 两个 float64 数组，纬度超出 ±85.0511° 时按边界截断。
+    """
+    lon = np.asarray(longitudes, dtype=np.float64)
+    lat = np.clip(np.asarray(latitudes, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    x = np.radians(lon) * EARTH_RADIUS
+    y = np.log(np.tan(np.pi / 4.0 + np.radians(lat) / 2.0)) * EARTH_RADIUS
+    return x, y
+
+
+class ProjectedPositionCache:
+    """
+    按测试桩 ID 缓存投影后的坐标。
+
+    每次刷新只对新增或经纬度发生变化的测试桩做 (向量化的) 投影，
+    其余测试桩直接复用上次的结果。测试桩图层与管线图层共用同一份结果。
+    线程安全：后台加载任务与主线程可以同时访问。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._positions = {}  # pile_id -> (lon, lat, x, y)
+
+    def project(self, piles_data):
+        """
+        返回与 piles_data 顺序一致的 (x, y) 两个 float64 数组。
+        piles_data 中每项需包含 id、longitude、latitude。
+        """
+        count = len(piles_data)
+        xs = np.empty(count, dtype=np.float64)
+        ys = np.empty(count, dtype=np.float64)
+        missing = []
+
+        with self._lock:
+            for index, pile in enumerate(piles_data):
+                cached = self._positions.get(pile["id"])
+                if (
+                    cached is not None
+                    and cached[0] == pile["longitude"]
+                    and cached[1] == pile["latitude"]
+                ):
+                    xs[index] = cached[2]
+                    ys[index] = cached[3]
+                else:
+                    missing.append(index)
+
+        if missing:
+            longitudes = [piles_data[i]["longitude"] for i in missing]
+            latitudes = [piles_data[i]["latitude"] for i in missing]
+            projected_x, projected_y = lonlat_to_web_mercator(longitudes, latitudes)
+            xs[missing] = projected_x
+            ys[missing] = projected_y
+            with self._lock:
+                for i, x, y in zip(missing, projected_x.tolist(), projected_y.tolist()):
+                    pile = piles_data[i]
+                    self._positions[pile["id"]] = (
+                        pile["longitude"],
+                        pile["latitude"],
+                        x,
+                        y,
+                    )
+        return xs, ys
+
+    def seed(self, piles_data, xs, ys):
+        """用已知的投影结果 (例如本地快照中保存的坐标) 填充缓存"""
+        with self._lock:
+            for pile, x, y in zip(
+                piles_data, np.asarray(xs).tolist(), np.asarray(ys).tolist()
+            ):
+                self._positions[pile["id"]] = (
+                    pile["longitude"],
+                    pile["latitude"],
+                    x,
+                    y,
+                )
+
+    def position(self, pile_id):
+        """返回单个测试桩缓存的 (x, y)，未缓存时返回 None"""
+        with self._lock:
+            cached = self._positions.get(pile_id)
+        return None if cached is None else (cached[2], cached[3])
+
+    def retain(self, pile_ids):
+        """只保留给定 ID 的缓存项，清除已删除测试桩的坐标"""
+        pile_ids = set(pile_ids)
+        with self._lock:
+            for pile_id in list(self._positions):
+                if pile_id not in pile_ids:
+                    del self._positions[pile_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._positions)
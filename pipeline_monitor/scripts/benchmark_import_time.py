@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+插件导入耗时基准测试。
+
+在全新的 Python 子进程中分别导入插件入口与各个对话框模块，重复多次取中位数，
+并用 `python -X importtime` 列出最耗时的依赖模块。用于确认 QGIS 启动 / 插件重载时
+(classFactory 只导入 pipeline_monitor 模块) 不再加载 matplotlib、NumPy 等重量级依赖。
+
+需要在 QGIS 的 Python 环境中运行 (例如 OSGeo4W Shell，或先 source run-env-linux.sh):
+    python scripts/benchmark_import_time.py
+    python scripts/benchmark_import_time.py --repeat 10 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+
+# 按 QGIS 实际的导入顺序列出：启动时只导入前两个，其余在使用时才导入
+DEFAULT_MODULES = [
+    PACKAGE,
+    f"{PACKAGE}.pipeline_monitor",
+    f"{PACKAGE}.pipeline_monitor_dialog",
+    f"{PACKAGE}.pile_details_dialog",
+]
+
+# 启动阶段不应加载的重量级模块
+HEAVY_MODULES = ["matplotlib", "numpy", "mysql.connector"]
+
+_TIMING_CODE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(loaded) or "-")
+"""
+
+
+def _run_python(args):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.dirname(PLUGIN_DIR), env.get("PYTHONPATH")])
+    )
+    return subprocess.run(
+        [sys.executable] + args,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def time_import(module, repeat):
+    """在 repeat 个新进程中导入 module，返回 (耗时列表, 已加载的重量级模块)"""
+    timings = []
+    loaded = ""
+    code = _TIMING_CODE.format(module=module, heavy=HEAVY_MODULES)
+    for _ in range(repeat):
+        result = _run_python(["-c", code])
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        elapsed, loaded = result.stdout.split()[-2:]
+        timings.append(float(elapsed))
+    return timings, loaded
+
+
+def slowest_imports(module, top):
+    """用 -X importtime 统计导入 module 时累计耗时最长的 top 个模块"""
+    result = _run_python(["-X", "importtime", "-c", f"import {module}"])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # 格式: "import time: <self us> | <cumulative us> | <模块名>"
+        _, cumulative_us, name = line.split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="测量插件各模块的导入耗时")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块的重复次数")
+    parser.add_argument(
+        "--top", type=int, default=10, help="列出的最耗时依赖模块数 (0 表示不列出)"
+    )
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        try:
+            timings, loaded = time_import(module, args.repeat)
+        except RuntimeError as e:
+            print(f"{module}: 导入失败 ({e})")
+            continue
+        print(
+            f"{module}: 中位数 {statistics.median(timings) * 1000:.1f} ms, "
+            f"最小 {min(timings) * 1000:.1f} ms (共 {len(timings)} 次)"
+        )
+        print(f"    已加载的重量级模块: {loaded if loaded != '-' else '无'}")
+        for cumulative_us, name in (
+            slowest_imports(module, args.top) if args.top else []
+        ):
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
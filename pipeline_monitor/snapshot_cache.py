@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+测试桩数据的本地快照 (SQLite)。
+
+每次从数据库加载成功后保存测试桩、最新电压以及投影后的坐标；
+插件打开时先从快照绘制地图，再在后台与数据库同步。
+数据库不可达时，快照可作为只读数据继续使用。
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import logging
+
+import numpy as np
+
+# Initialize logger for this module
+logger = logging.getLogger(__name__)
+# Configure basic logging to console if no handlers are already configured
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+
+# 快照结构版本，结构变化时递增，旧版本快照会被忽略
+# (版本 2: pipeline_id 改为 TEXT，与数据库中的字符串管线ID一致)
+SNAPSHOT_VERSION = 2
+
+_CREATE_STATEMENTS = (
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    """CREATE TABLE piles (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        longitude REAL NOT NULL,
+        latitude REAL NOT NULL,
+        pipeline_id TEXT,
+        description TEXT,
+        x REAL NOT NULL,
+        y REAL NOT NULL,
+        position INTEGER NOT NULL
+    )""",
+    """CREATE TABLE latest_voltages (
+        pile_id INTEGER PRIMARY KEY,
+        voltage REAL,
+        reading_timestamp TEXT
+    )""",
+)
+
+
+def _to_text(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def _from_text(value):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return value
+
+
+def save_snapshot(path, piles_data, latest_voltages, xs, ys):
+    """
+    将测试桩、最新电压与投影坐标写入快照文件。
+    先写入临时文件再原子替换，读取方不会看到写了一半的快照。
+    成功返回 True，失败记录日志并返回 False。
+    """
+    temp_path = f"{path}.tmp"
+    connection = None
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        connection = sqlite3.connect(temp_path)
+        with connection:
+            for statement in _CREATE_STATEMENTS:
+                connection.execute(statement)
+            connection.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("version", str(SNAPSHOT_VERSION)),
+                    ("saved_at", datetime.now().isoformat(sep=" ")),
+                ],
+            )
+            connection.executemany(
+                "INSERT INTO piles (id, name, longitude, latitude, pipeline_id, "
+                "description, x, y, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        pile["id"],
+                        pile["name"],
+                        pile["longitude"],
+                        pile["latitude"],
+                        pile.get("pipeline_id"),
+                        pile.get("description"),
+                        x,
+                        y,
+                        position,
+                    )
+                    for position, (pile, x, y) in enumerate(
+                        zip(
+                            piles_data, np.asarray(xs).tolist(), np.asarray(ys).tolist()
+                        )
+                    )
+                ],
+            )
+            connection.executemany(
+                "INSERT INTO latest_voltages (pile_id, voltage, reading_timestamp) "
+                "VALUES (?, ?, ?)",
+                [
+                    (
+                        pile_id,
+                        None if info.get("voltage") is None else float(info["voltage"]),
+                        _to_text(info.get("reading_timestamp")),
+                    )
+                    for pile_id, info in latest_voltages.items()
+                ],
+            )
+        connection.close()
+        connection = None
+        os.replace(temp_path, path)
+        return True
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"保存本地快照 {path} 时发生错误: '{e}'")
+        return False
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def load_snapshot(path):
+    """
+    读取快照文件。
+    返回字典 {piles, latest_voltages, xs, ys, saved_at}，其中 piles 按保存时的顺序排列，
+    xs / ys 为对应的投影坐标数组；快照不存在、版本不符或已损坏时返回 None。
+    """
+    if not os.path.exists(path):
+        return None
+
+    connection = None
+    try:
+        # 以只读方式打开，避免读取时意外创建或修改文件
+        uri = Path(path).resolve().as_uri() + "?mode=ro"
+        connection = sqlite3.connect(uri, uri=True)
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+        if meta.get("version") != str(SNAPSHOT_VERSION):
+            logger.warning(f"本地快照版本 {meta.get('version')} 与当前版本不符，已忽略")
+            return None
+
+        rows = connection.execute(
+            "SELECT id, name, longitude, latitude, pipeline_id, description, x, y "
+            "FROM piles ORDER BY position"
+        ).fetchall()
+        piles = [
+            {
+                "id": row[0],
+                "name": row[1],
+                "longitude": row[2],
+                "latitude": row[3],
+                "pipeline_id": row[4],
+                "description": row[5],
+            }
+            for row in rows
+        ]
+        xs = np.array([row[6] for row in rows], dtype=np.float64)
+        ys = np.array([row[7] for row in rows], dtype=np.float64)
+
+        latest_voltages = {
+            pile_id: {
+                "pile_id": pile_id,
+                "voltage": voltage,
+                "reading_timestamp": _from_text(timestamp),
+            }
+            for pile_id, voltage, timestamp in connection.execute(
+                "SELECT pile_id, voltage, reading_timestamp FROM latest_voltages"
+            )
+        }
+        return {
+            "piles": piles,
+            "latest_voltages": latest_voltages,
+            "xs": xs,
+            "ys": ys,
+            "saved_at": _from_text(meta.get("saved_at")),
+        }
+    except sqlite3.Error as e:
+        logger.error(f"读取本地快照 {path} 时发生错误: '{e}'")
+        return None
+    finally:
+        if connection is not None:
+            connection.close()
@@ -0,0 +1,105 @@
+# coding=utf-8
+"""Asyncio ingest pipeline test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import asyncio
+import unittest
+from collections import namedtuple
+
+from utilities import import_db_script
+
+async_ingest = import_db_script('async_ingest')
+
+Result = namedtuple('Result', ['inserted', 'failures'])
+
+
+async def readings(count):
+    for i in range(count):
+        yield i, -1.0, '2025-06-20 08:00:00'
+
+
+class FlakyWriter:
+    """Fake write_batch that fails the first `outages` calls."""
+
+    def __init__(self, outages):
+        self.outages = outages
+        self.calls = 0
+        self.written = []
+
+    def __call__(self, batch):
+        self.calls += 1
+        if self.calls <= self.outages:
+            raise ConnectionError('database unavailable')
+        self.written.extend(batch)
+        return Result(len(batch), [])
+
+
+def run_pipeline(pipeline, stop_after=None):
+    async def main():
+        if stop_after is not None:
+            asyncio.get_event_loop().call_later(stop_after, pipeline.stop)
+        return await pipeline.run()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+class AsyncIngestTest(unittest.TestCase):
+    """Test batching and retrying in the ingest pipeline."""
+
+    def make_pipeline(self, sources, writer, **kwargs):
+        options = dict(batch_size=10, flush_interval=0.01, consumers=1,
+                       retry_delay=0.001, max_retry_delay=0.004,
+                       report_interval=60)
+        options.update(kwargs)
+        return async_ingest.AsyncIngestPipeline(sources, writer, **options)
+
+    def test_all_readings_written_in_batches(self):
+        """Every reading is written once, in batches of at most batch_size."""
+        writer = FlakyWriter(0)
+        metrics = run_pipeline(
+            self.make_pipeline([readings(25), readings(7)], writer))
+        self.assertEqual(len(writer.written), 32)
+        self.assertEqual(metrics.written, 32)
+        self.assertEqual(metrics.failed, 0)
+        self.assertGreaterEqual(metrics.batches, 4)
+
+    def test_outage_retries_instead_of_dropping(self):
+        """A long outage is retried beyond max_retries and nothing is lost."""
+        writer = FlakyWriter(12)
+        pipeline = self.make_pipeline([readings(30)], writer, max_retries=3,
+                                      queue_size=5)
+        metrics = run_pipeline(pipeline)
+        self.assertEqual(sorted(r[0] for r in writer.written), list(range(30)))
+        self.assertEqual(metrics.failed, 0)
+        self.assertEqual(metrics.retries, 12)
+        # 写入失败期间队列被填满，生产者因背压等待
+        self.assertGreater(metrics.blocked_puts, 0)
+
+    def test_gives_up_only_after_stop(self):
+        """Once stopping, a batch is dropped after max_retries more attempts."""
+        writer = FlakyWriter(10 ** 6)
+        pipeline = self.make_pipeline([readings(3)], writer, max_retries=2)
+        metrics = run_pipeline(pipeline, stop_after=0.05)
+        self.assertEqual(metrics.failed, 3)
+        self.assertEqual(writer.written, [])
+        self.assertGreater(metrics.retries, 2)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(AsyncIngestTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
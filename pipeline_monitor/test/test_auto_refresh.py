@@ -0,0 +1,108 @@
+# coding=utf-8
+"""Auto-refresh delta merge test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+from datetime import datetime
+
+from auto_refresh import (
+    AdaptiveInterval,
+    ReadingWatermark,
+    merge_latest_readings,
+)
+
+
+def reading(reading_id, pile_id, voltage, hour):
+    return {
+        'id': reading_id,
+        'pile_id': pile_id,
+        'voltage': voltage,
+        'reading_timestamp': datetime(2025, 6, 20, hour),
+    }
+
+
+class AutoRefreshTest(unittest.TestCase):
+    """Test merging new readings and adapting the poll interval."""
+
+    def test_merge_reports_changed_piles(self):
+        """Only piles whose latest voltage changed are reported."""
+        latest = {1: {'pile_id': 1, 'voltage': -0.9,
+                      'reading_timestamp': datetime(2025, 6, 20, 8)}}
+        changed = merge_latest_readings(latest, [
+            reading(10, 1, -0.9, 9),   # newer but same voltage
+            reading(11, 2, -1.0, 9),   # new pile
+        ])
+        self.assertEqual(changed, {2})
+        self.assertEqual(latest[1]['reading_timestamp'], datetime(2025, 6, 20, 9))
+
+    def test_late_reading_does_not_overwrite(self):
+        """An older reading arriving late keeps the newer value."""
+        latest = {}
+        merge_latest_readings(latest, [reading(1, 1, -0.9, 10)])
+        changed = merge_latest_readings(latest, [reading(2, 1, -1.5, 8)])
+        self.assertEqual(changed, set())
+        self.assertEqual(latest[1]['voltage'], -0.9)
+
+    def test_watermark_rereads_late_commits(self):
+        """Readings committed after a higher id are picked up once."""
+        now = [0.0]
+        watermark = ReadingWatermark(100, grace_seconds=30, max_lookback=50,
+                                     clock=lambda: now[0])
+        self.assertEqual(watermark.after_id(), 50)
+        # id 102 的事务先提交，101 仍未提交
+        new = watermark.accept([reading(102, 1, -0.9, 9)])
+        self.assertEqual([r['id'] for r in new], [102])
+        self.assertEqual(watermark.max_id, 102)
+        now[0] = 10.0
+        self.assertLess(watermark.after_id(), 101)
+        new = watermark.accept([reading(101, 2, -1.0, 9),
+                                reading(102, 1, -0.9, 9)])
+        self.assertEqual([r['id'] for r in new], [101])
+        # 超过 grace_seconds 后窗口下界前移到当时的水位
+        now[0] = 45.0
+        self.assertEqual(watermark.after_id(), 102)
+
+    def test_watermark_lookback_is_capped(self):
+        """The re-read window never reaches more than max_lookback ids back."""
+        watermark = ReadingWatermark(1000, max_lookback=100, clock=lambda: 0.0)
+        self.assertEqual(watermark.after_id(), 900)
+        watermark.accept([reading(1500, 1, -0.9, 9)])
+        self.assertEqual(watermark.after_id(), 1400)
+
+    def test_watermark_resumes_after_full_batch(self):
+        """A full batch continues from its last id so backlogs drain."""
+        watermark = ReadingWatermark(0, clock=lambda: 0.0)
+        batch = [reading(i, 1, -0.9, 9) for i in range(1, 4)]
+        watermark.accept(batch, batch_full=True)
+        self.assertEqual(watermark.after_id(), 3)
+        watermark.accept([reading(4, 1, -0.9, 9)])
+        self.assertEqual(watermark.after_id(), 0)
+
+    def test_interval_adapts_to_row_count(self):
+        """Busy ticks shorten the interval, idle ticks lengthen it."""
+        interval = AdaptiveInterval(minimum=1000, maximum=8000, initial=4000,
+                                    busy_rows=10)
+        self.assertEqual(interval.update(50), 2000)
+        self.assertEqual(interval.update(5), 2000)
+        self.assertEqual(interval.update(0), 3000)
+        self.assertEqual(interval.update(0, batch_full=True), 1000)
+        for _ in range(10):
+            interval.update(0)
+        self.assertEqual(interval.current, 8000)
+        self.assertEqual(interval.reset(), 4000)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(AutoRefreshTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,111 @@
+# coding=utf-8
+"""Batch reading writer test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+from datetime import datetime
+
+from mysql.connector import Error, errorcode
+
+from utilities import import_db_script
+
+db_operations = import_db_script('db_operations')
+
+READING_TIME = datetime(2025, 6, 20, 8, 30)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def executemany(self, query, rows):
+        if 'voltage_readings' not in query:
+            return
+        if self.connection.batch_error is not None:
+            raise Error(msg='batch failed', errno=self.connection.batch_error)
+        self.connection.pending.extend(rows)
+
+    def execute(self, query, row):
+        if row[0] in self.connection.missing_piles:
+            raise Error(msg='no such pile',
+                        errno=errorcode.ER_NO_REFERENCED_ROW_2)
+        self.connection.pending.append(row)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Collects committed readings; batch_error fails every executemany."""
+
+    def __init__(self, batch_error=None, missing_piles=(), dead=False):
+        self.batch_error = batch_error
+        self.missing_piles = set(missing_piles)
+        self.dead = dead
+        self.pending = []
+        self.committed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+        if self.dead:
+            raise Error(msg='connection lost', errno=errorcode.CR_SERVER_LOST)
+
+
+class BatchInsertTest(unittest.TestCase):
+    """Test which errors become per-row failures and which are raised."""
+
+    def readings(self, pile_ids):
+        return [(pile_id, -0.9, READING_TIME) for pile_id in pile_ids]
+
+    def test_row_data_errors_are_isolated(self):
+        """A reading for a deleted pile fails alone; the others are written."""
+        connection = FakeConnection(
+            batch_error=errorcode.ER_NO_REFERENCED_ROW_2, missing_piles=[2])
+        result = db_operations.insert_voltage_readings_batch(
+            connection, self.readings([1, 2, 3]), verbose=False)
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual([index for index, _, _ in result.failures], [1])
+        self.assertEqual([row[0] for row in connection.committed], [1, 3])
+
+    def test_transient_errors_are_raised(self):
+        """Deadlocks and lock waits are raised so the caller can retry."""
+        for errno in (errorcode.ER_LOCK_DEADLOCK,
+                      errorcode.ER_LOCK_WAIT_TIMEOUT):
+            connection = FakeConnection(batch_error=errno)
+            with self.assertRaises(Error) as raised:
+                db_operations.insert_voltage_readings_batch(
+                    connection, self.readings([1, 2]), verbose=False)
+            self.assertEqual(raised.exception.errno, errno)
+            self.assertEqual(connection.committed, [])
+
+    def test_failed_rollback_keeps_original_error(self):
+        """A rollback on a dead connection does not hide the write error."""
+        connection = FakeConnection(batch_error=errorcode.CR_SERVER_LOST,
+                                    dead=True)
+        with self.assertRaises(Error) as raised:
+            db_operations.insert_voltage_readings_batch(
+                connection, self.readings([1]), verbose=False)
+        self.assertEqual(str(raised.exception.msg), 'batch failed')
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(BatchInsertTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,195 @@
+# coding=utf-8
+"""Historical bulk loader test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+
+from utilities import import_db_script
+
+bulk_loader = import_db_script('bulk_loader')
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def executemany(self, query, rows):
+        self.connection.pending.extend(rows)
+        self.rowcount = len(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Records committed rows; fails on the commit number given by fail_on."""
+
+    def __init__(self, fail_on=None):
+        self.autocommit = True
+        self.pending = []
+        self.committed = []
+        self.commits = 0
+        self.fail_on = fail_on
+
+    def is_connected(self):
+        return True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        if self.commits == self.fail_on:
+            raise bulk_loader.Error('connection lost')
+        self.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class BulkLoaderTest(unittest.TestCase):
+    """Test parsing, partitioning and resuming the bulk loader."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_input(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_parse_line(self):
+        """Comma and tab separated lines are normalized."""
+        self.assertEqual(
+            bulk_loader.parse_line('12,-0.85,2025-06-01T08:30\n'),
+            (12, -0.85, '2025-06-01 08:30:00'))
+        self.assertEqual(
+            bulk_loader.parse_line('7\t-1.2\t2025-06-01 08:30:05\r\n'),
+            (7, -1.2, '2025-06-01 08:30:05'))
+        for line in ['pile_id,voltage,reading_timestamp',
+                     '1,-0.9',
+                     '1,nan,2025-06-01 08:00:00',
+                     '1,-0.9,yesterday']:
+            with self.assertRaises(ValueError):
+                bulk_loader.parse_line(line)
+
+    def test_split_input(self):
+        """Valid rows go to partition files, invalid rows are counted."""
+        path = self.write_input('readings.csv', [
+            'pile_id,voltage,reading_timestamp',
+            '1,-0.9,2025-06-02 08:00:00',
+            '2,-1.1,2025-06-01 08:00:00',
+            '',
+            '5,-1.0,2025-06-01 09:00:00',
+            '3,abc,2025-06-01 09:00:00',
+            '3,-1.3,2025-06-03 10:00:00',
+        ])
+        work_dir = os.path.join(self.directory, 'parts')
+        os.makedirs(work_dir)
+        bulk_loader._init_split_worker({1, 2, 3})
+        result = bulk_loader.split_input((path, 0, work_dir, 'pile', 2))
+
+        self.assertEqual(result['rows'], 3)
+        self.assertEqual(result['rejected'], 2)
+        self.assertEqual(result['first'], '2025-06-01 08:00:00')
+        self.assertEqual(result['last'], '2025-06-03 10:00:00')
+        self.assertEqual(result['partitions'], {'pile-001': 2, 'pile-000': 1})
+        self.assertEqual(sorted(os.listdir(work_dir)),
+                         ['pile-000.00000.tsv', 'pile-001.00000.tsv'])
+        with open(os.path.join(work_dir, 'pile-001.00000.tsv'),
+                  encoding='utf-8') as f:
+            rows = [line.rstrip('\n').split('\t') for line in f]
+        self.assertEqual([row[1:] for row in rows], [
+            ['1', '-0.900', '2025-06-02 08:00:00'],
+            ['3', '-1.300', '2025-06-03 10:00:00'],
+        ])
+        self.assertEqual(
+            rows[0][0],
+            bulk_loader.reading_key(1, -0.9, '2025-06-02 08:00:00'))
+
+    def test_load_partition_resumes_from_checkpoint(self):
+        """An interrupted partition continues after its committed rows."""
+        lines = ['key%d\t%d\t-1.000\t2025-06-01 08:00:0%d' % (i, i, i)
+                 for i in range(7)]
+        part = self.write_input('pile-000.00000.tsv', lines)
+        progress = queue.Queue()
+        bulk_loader._init_load_worker(progress)
+        original = bulk_loader.create_connection
+        try:
+            # 第二次提交时连接断开
+            first = FakeConnection(fail_on=2)
+            bulk_loader.create_connection = lambda: first
+            outcome = bulk_loader.load_partition(('pile-000', [part], 0, 3))
+            self.assertEqual(outcome['rows'], 3)
+            self.assertIsNotNone(outcome['error'])
+            self.assertEqual([row[0] for row in first.committed],
+                             ['key0', 'key1', 'key2'])
+
+            second = FakeConnection()
+            bulk_loader.create_connection = lambda: second
+            outcome = bulk_loader.load_partition(
+                ('pile-000', [part], outcome['rows'], 3))
+        finally:
+            bulk_loader.create_connection = original
+        self.assertEqual(outcome, {'partition': 'pile-000', 'rows': 7,
+                                   'error': None})
+        self.assertEqual([row[0] for row in second.committed],
+                         ['key3', 'key4', 'key5', 'key6'])
+        self.assertFalse(second.autocommit)
+        messages = []
+        while not progress.empty():
+            messages.append(progress.get())
+        self.assertEqual(messages[-1], ('pile-000', 7, 1, 1))
+
+    def test_checkpoint_round_trip(self):
+        """Checkpoints are written atomically and drive the partition plan."""
+        checkpoint = os.path.join(self.directory, 'load.json')
+        self.assertIsNone(bulk_loader.load_checkpoint(checkpoint))
+        state = {
+            'inputs': ['/data/a.csv', '/data/b.csv'],
+            'work_dir': '/work',
+            'split': {
+                '/data/a.csv': {'partitions': {'pile-000': 4, 'pile-001': 2}},
+                '/data/b.csv': {'partitions': {'pile-000': 1}},
+            },
+            'loaded': {'pile-000': 3},
+        }
+        bulk_loader.save_checkpoint(checkpoint, state)
+        self.assertEqual(os.listdir(self.directory), ['load.json'])
+        restored = bulk_loader.load_checkpoint(checkpoint)
+        self.assertEqual(restored, state)
+        plan = bulk_loader._partition_plan(restored)
+        self.assertEqual(plan['pile-000'], ([
+            bulk_loader.partition_file('/work', 'pile-000', 0),
+            bulk_loader.partition_file('/work', 'pile-000', 1),
+        ], 5))
+        self.assertEqual(plan['pile-001'][1], 2)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(BulkLoaderTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
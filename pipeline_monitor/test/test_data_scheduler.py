@@ -0,0 +1,193 @@
+# coding=utf-8
+"""Ingestion service test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mysql.connector import errorcode
+
+from utilities import import_db_script
+
+data_scheduler = import_db_script('data_scheduler')
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, query, params=()):
+        connection = self.connection
+        connection.in_transaction = True  # autocommit is off
+        if 'COUNT(*), COALESCE(MAX(id), 0) FROM test_piles' in query:
+            self.rows = [(len(connection.pile_ids), max(connection.pile_ids))]
+        elif 'SELECT id FROM test_piles' in query:
+            connection.catalog_reads += 1
+            self.rows = [(pile_id,) for pile_id in connection.pile_ids]
+        elif 'information_schema' in query:
+            self.rows = [(1,)]
+        elif 'SELECT ingest_key' in query:
+            self.rows = []
+        else:
+            raise AssertionError('unexpected query: %s' % query)
+
+    def executemany(self, query, rows):
+        connection = self.connection
+        connection.in_transaction = True
+        if 'voltage_readings' not in query:
+            return  # derived tables
+        if connection.fail_writes:
+            raise data_scheduler.Error(msg='connection lost',
+                                       errno=errorcode.CR_SERVER_LOST)
+        connection.pending.extend(rows)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    """Serves the pile catalogue and collects committed readings."""
+
+    def __init__(self, pile_ids):
+        self.pile_ids = list(pile_ids)
+        self.connected = True
+        self.fail_writes = False
+        self.in_transaction = False
+        self.catalog_reads = 0
+        self.pending = []
+        self.written = []
+
+    def is_connected(self):
+        return self.connected
+
+    def cursor(self, dictionary=None):
+        return StubCursor(self)
+
+    def commit(self):
+        self.written.extend(self.pending)
+        self.pending = []
+        self.in_transaction = False
+
+    def rollback(self):
+        self.pending = []
+        self.in_transaction = False
+
+
+class StubPool:
+    """Hands out the given connections in order; None means unavailable."""
+
+    def __init__(self, *connections):
+        self.connections = list(connections)
+        self.released = []
+
+    def acquire(self, timeout=None):
+        return self.connections.pop(0)
+
+    def release(self, connection):
+        self.released.append(connection)
+
+
+class IngestionServiceTest(unittest.TestCase):
+    """Test catalogue caching, reconnects and the spool branch."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def service(self, pool, **kwargs):
+        patcher = mock.patch.object(data_scheduler, 'get_pool', lambda: pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return data_scheduler.IngestionService(
+            catalog_check_interval=0, report_every=0, **kwargs)
+
+    def test_catalog_is_cached_by_signature(self):
+        """The id list is only re-read when the (count, max id) changes."""
+        connection = StubConnection([1, 2, 3])
+        service = self.service(StubPool(connection))
+        service.tick()
+        service.tick()
+        self.assertEqual(connection.catalog_reads, 1)
+        self.assertEqual(len(connection.written), 6)
+
+        connection.pile_ids.append(4)
+        self.assertEqual(service.tick(), 4)
+        self.assertEqual(connection.catalog_reads, 2)
+        self.assertEqual(service.pile_ids, [1, 2, 3, 4])
+
+    def test_catalog_read_ends_transaction(self):
+        """The catalogue check does not leave a snapshot open."""
+        connection = StubConnection([1, 2])
+        service = self.service(StubPool(connection))
+        service.refresh_catalog(connection)
+        self.assertFalse(connection.in_transaction)
+
+    def test_reconnects_after_drop(self):
+        """A dropped or failing connection is released and replaced."""
+        first = StubConnection([1, 2])
+        second = StubConnection([1, 2])
+        third = StubConnection([1, 2])
+        pool = StubPool(first, second, third)
+        service = self.service(pool)
+        self.assertEqual(service.tick(), 2)
+
+        first.connected = False
+        self.assertEqual(service.tick(), 2)
+        self.assertEqual(pool.released, [first])
+        self.assertEqual(len(second.written), 2)
+
+        second.fail_writes = True
+        self.assertEqual(service.tick(), 0)
+        self.assertEqual(service.failed_rows, 2)
+        self.assertEqual(pool.released, [first, second])
+        self.assertEqual(service.tick(), 2)
+        self.assertEqual(len(third.written), 2)
+
+    def test_spool_keeps_readings_while_offline(self):
+        """With a spool, readings from offline ticks are replayed later."""
+        spool = data_scheduler.ReadingSpool(
+            os.path.join(self.directory, 'readings.spool'))
+        self.addCleanup(spool.close)
+        connection = StubConnection([1, 2, 3])
+        pool = StubPool(connection, None, connection)
+        service = self.service(pool, spool=spool)
+        self.assertEqual(service.tick(), 3)
+        self.assertEqual(len(spool), 0)
+
+        connection.connected = False
+        self.assertEqual(service.tick(), 0)
+        self.assertEqual(len(spool), 3)
+
+        connection.connected = True
+        self.assertEqual(service.tick(), 6)
+        self.assertEqual(len(spool), 0)
+        self.assertEqual(len(connection.written), 9)
+        self.assertEqual(service.failed_rows, 0)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(IngestionServiceTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
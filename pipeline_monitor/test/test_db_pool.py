@@ -0,0 +1,122 @@
+# coding=utf-8
+"""Connection pool test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+
+from mysql.connector import InterfaceError
+
+from db_operations import ConnectionPool
+
+
+class FakeConnection(object):
+    """Minimal stand-in for a mysql.connector connection."""
+
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def is_connected(self):
+        return self.connected
+
+    def ping(self, reconnect=False):
+        if not self.connected:
+            raise InterfaceError("gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    """Test the bounded connection pool."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.created = []
+
+        def connect():
+            connection = FakeConnection()
+            self.created.append(connection)
+            return connection
+
+        self.pool = ConnectionPool(
+            config={}, max_size=2, checkout_timeout=0.05, connect=connect)
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pool.close_all()
+
+    def test_connection_is_reused(self):
+        """A released connection is handed out again."""
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+
+    def test_checkout_timeout(self):
+        """Acquire returns None once max_size connections are in use."""
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+        self.assertIsNone(self.pool.acquire())
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+
+    def test_broken_connection_is_discarded(self):
+        """Disconnected connections are not returned to the pool."""
+        connection = self.pool.acquire()
+        connection.connected = False
+        self.pool.release(connection)
+        self.assertEqual(self.pool.stats()['size'], 0)
+        self.assertIsNot(self.pool.acquire(), connection)
+
+    def test_health_check_replaces_stale_connection(self):
+        """A connection that fails ping is replaced on checkout."""
+        self.pool.health_check_interval = 0
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+        connection.connected = False
+        self.assertIsNot(self.pool.acquire(), connection)
+        self.assertTrue(connection.closed)
+
+    def test_idle_eviction(self):
+        """Connections idle longer than idle_timeout are closed."""
+        self.pool.idle_timeout = 1e-9
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+        self.pool.acquire()
+        self.assertTrue(connection.closed)
+        self.assertEqual(len(self.created), 2)
+
+    def test_open_transaction_rolled_back_on_release(self):
+        """Uncommitted work is rolled back before reuse."""
+        connection = self.pool.acquire()
+        connection.in_transaction = True
+        self.pool.release(connection)
+        self.assertEqual(connection.rollbacks, 1)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ConnectionPoolTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,114 @@
+# coding=utf-8
+"""Derived table reader test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+from datetime import datetime
+
+from mysql.connector import Error, errorcode
+
+from db_operations import get_latest_voltages, get_voltage_rollups
+
+READING_TIME = datetime(2025, 6, 20, 8, 30)
+
+
+class ScriptedCursor(object):
+    """Cursor stand-in that answers each query from its connection."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, query, params=()):
+        self.connection.queries.append(query)
+        self.rows = self.connection.respond(query)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class ScriptedConnection(object):
+    """Connection stand-in for a database at a given schema version."""
+
+    def __init__(self, version):
+        self.version = version
+        self.queries = []
+
+    def cursor(self, buffered=None, dictionary=None):
+        return ScriptedCursor(self)
+
+    def respond(self, query):
+        if 'schema_migrations' in query:
+            if self.version is None:
+                raise Error(msg="Table doesn't exist",
+                            errno=errorcode.ER_NO_SUCH_TABLE)
+            return [(self.version,)]
+        if 'FROM pile_latest_voltage' in query:
+            return [{'pile_id': 1, 'voltage': -0.9,
+                     'reading_timestamp': READING_TIME}]
+        if 'FROM voltage_rollup_daily' in query:
+            return [{'bucket_start': datetime(2025, 6, 20), 'min_voltage': -1.0,
+                     'max_voltage': -0.8, 'mean_voltage': -0.9,
+                     'reading_count': 24}]
+        if 'max_timestamp' in query:
+            return [{'pile_id': pile_id, 'voltage': -1.0,
+                     'reading_timestamp': READING_TIME}
+                    for pile_id in (1, 2)]
+        raise AssertionError('unexpected query: %s' % query)
+
+    def ran(self, fragment):
+        return any(fragment in query for query in self.queries)
+
+
+class DerivedReaderTest(unittest.TestCase):
+    """Test that derived tables are only read once migrated."""
+
+    def test_latest_voltages_before_migration(self):
+        """Unmigrated databases aggregate the raw readings."""
+        for version in (None, 3):
+            connection = ScriptedConnection(version)
+            latest = get_latest_voltages(connection)
+            self.assertEqual(sorted(latest), [1, 2])
+            self.assertFalse(connection.ran('FROM pile_latest_voltage'))
+
+    def test_latest_voltages_after_migration(self):
+        """From version 4 on the materialized table is read directly."""
+        connection = ScriptedConnection(4)
+        latest = get_latest_voltages(connection)
+        self.assertEqual(list(latest), [1])
+        self.assertFalse(connection.ran('max_timestamp'))
+
+    def test_rollups_before_migration(self):
+        """Rollups are not trusted before version 5."""
+        for version in (None, 4):
+            connection = ScriptedConnection(version)
+            self.assertIsNone(get_voltage_rollups(connection, 1))
+            self.assertFalse(connection.ran('voltage_rollup_daily'))
+
+    def test_rollups_after_migration(self):
+        """From version 5 on the daily rollup table is read."""
+        rollups = get_voltage_rollups(ScriptedConnection(5), 1)
+        self.assertEqual(len(rollups), 1)
+        self.assertEqual(rollups[0]['reading_count'], 24)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(DerivedReaderTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,95 @@
+# coding=utf-8
+"""Chart downsampling test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+
+import numpy as np
+
+from downsampling import downsample_indices, lttb_indices, minmax_indices
+
+
+def reference_lttb(x, y, threshold):
+    """Straightforward loop version of LTTB used as the oracle."""
+    n = len(x)
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(np.floor(i * bucket_size)) + 1
+        end = int(np.floor((i + 1) * bucket_size)) + 1
+        next_start = end
+        next_end = min(int(np.floor((i + 2) * bucket_size)) + 1, n)
+        if i == threshold - 3:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x = np.mean(x[next_start:next_end])
+            avg_y = np.mean(y[next_start:next_end])
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+class DownsamplingTest(unittest.TestCase):
+    """Test LTTB and min/max envelope downsampling."""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.x = np.arange(10000, dtype=np.float64)
+        self.y = np.sin(self.x / 300.0) + rng.normal(0, 0.05, len(self.x))
+        self.y[4321] = 5.0  # a single spike
+
+    def test_lttb_matches_reference(self):
+        """The vectorised LTTB picks the same points as the plain loop."""
+        for threshold in (3, 50, 777):
+            np.testing.assert_array_equal(
+                lttb_indices(self.x, self.y, threshold),
+                reference_lttb(self.x, self.y, threshold))
+
+    def test_lttb_keeps_small_series(self):
+        """Series shorter than the threshold are returned untouched."""
+        np.testing.assert_array_equal(lttb_indices([0, 1, 2], [1, 2, 3], 10), [0, 1, 2])
+
+    def test_lttb_accepts_datetimes(self):
+        """datetime64 x values are supported."""
+        times = np.datetime64('2025-06-01T00:00:00') + np.arange(1000) * np.timedelta64(10, 's')
+        indices = lttb_indices(times, self.y[:1000], 100)
+        self.assertEqual(len(indices), 100)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_minmax_keeps_extremes(self):
+        """Every bucket keeps its minimum and maximum, including spikes."""
+        indices = minmax_indices(self.y, 200)
+        self.assertIn(4321, indices)
+        self.assertIn(int(np.argmin(self.y)), indices)
+        self.assertLessEqual(len(indices), 402)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_mode_dispatch(self):
+        """Modes map to the matching algorithm."""
+        self.assertEqual(len(downsample_indices('lttb', self.x, self.y, 100)), 200)
+        self.assertEqual(len(downsample_indices('none', self.x, self.y, 100)), 10000)
+        with self.assertRaises(ValueError):
+            downsample_indices('cubic', self.x, self.y, 100)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(DownsamplingTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
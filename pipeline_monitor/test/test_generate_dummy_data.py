@@ -0,0 +1,113 @@
+# coding=utf-8
+"""Synthetic data generator test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from generate_dummy_data import (
+    KM_PER_DEGREE,
+    PLACEHOLDER_VOLTAGE,
+    generate_reading_block,
+    generate_synthetic_piles,
+    reading_blocks,
+    readings_per_pile,
+)
+
+START_TIME = datetime(2025, 6, 1)
+WINDOW_SECONDS = 7 * 86400
+
+
+def generate_all(piles, counts, seed):
+    blocks = [
+        generate_reading_block(
+            piles.base_voltages, counts, first, stop, START_TIME,
+            WINDOW_SECONDS, seed, block_index)
+        for block_index, (first, stop) in enumerate(reading_blocks(counts))
+    ]
+    return [np.concatenate(parts) for parts in zip(*blocks)]
+
+
+class GenerateDummyDataTest(unittest.TestCase):
+    """Test the vectorized synthetic pile and reading generator."""
+
+    def test_piles_follow_pipelines(self):
+        """Piles are split over pipelines and spaced along each line."""
+        piles = generate_synthetic_piles(450, seed=1, piles_per_pipeline=200)
+        self.assertEqual(len(piles.names), 450)
+        self.assertEqual(len(set(piles.names)), 450)
+        self.assertEqual(np.unique(piles.pipeline_ids).tolist(),
+                         ['SYN1-001', 'SYN1-002', 'SYN1-003'])
+        self.assertEqual(piles.names[0], 'SYN1-001-K0000')
+
+        first_line = piles.pipeline_ids == 'SYN1-001'
+        longitudes = piles.longitudes[first_line]
+        latitudes = piles.latitudes[first_line]
+        scale = np.cos(np.radians(latitudes.mean()))
+        spacing = KM_PER_DEGREE * np.hypot(
+            np.diff(longitudes) * scale, np.diff(latitudes))
+        # 折线拐角处的直线距离略小于沿线距离
+        self.assertTrue(np.all(spacing <= 1.01))
+        self.assertGreater(np.median(spacing), 0.95)
+
+    def test_names_depend_on_seed(self):
+        """Different seeds never produce piles with the same name."""
+        first = generate_synthetic_piles(300, seed=4)
+        second = generate_synthetic_piles(300, seed=42)
+        self.assertFalse(set(first.names) & set(second.names))
+        self.assertFalse(
+            set(first.pipeline_ids.tolist()) & set(second.pipeline_ids.tolist()))
+
+    def test_readings_are_deterministic(self):
+        """The same seed produces identical readings."""
+        piles = generate_synthetic_piles(20, seed=3)
+        counts = readings_per_pile(20, 1000)
+        first = generate_all(piles, counts, seed=3)
+        second = generate_all(piles, counts, seed=3)
+        other = generate_all(piles, counts, seed=4)
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a, b)
+        self.assertFalse(np.array_equal(first[1], other[1]))
+
+    def test_readings_cover_window(self):
+        """Every pile gets its share of readings inside the time window."""
+        piles = generate_synthetic_piles(7, seed=5)
+        counts = readings_per_pile(7, 100)
+        self.assertEqual(counts.tolist(), [15, 15, 14, 14, 14, 14, 14])
+        indices, voltages, timestamps = generate_all(piles, counts, seed=5)
+        self.assertEqual(np.bincount(indices).tolist(), counts.tolist())
+        self.assertGreaterEqual(timestamps.min(), np.datetime64(START_TIME))
+        self.assertLess(
+            timestamps.max(),
+            np.datetime64(START_TIME + timedelta(seconds=WINDOW_SECONDS)))
+        unknown = np.isnan(piles.base_voltages)[indices]
+        self.assertTrue(np.all(voltages[unknown] == PLACEHOLDER_VOLTAGE))
+        self.assertTrue(np.all(voltages[~unknown] < -0.4))
+        self.assertTrue(np.all(voltages[~unknown] > -1.7))
+
+    def test_blocks_cover_all_piles(self):
+        """Blocks partition the piles without gaps or overlap."""
+        counts = readings_per_pile(10, 5000001)
+        blocks = reading_blocks(counts)
+        self.assertEqual(blocks[0][0], 0)
+        self.assertEqual(blocks[-1][1], 10)
+        for (_, stop), (first, _) in zip(blocks, blocks[1:]):
+            self.assertEqual(stop, first)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(GenerateDummyDataTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,113 @@
+# coding=utf-8
+"""Shared pile history cache test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from history_cache import HistoryCache
+from voltage_series import VoltageSeries
+
+
+class FakeClock(object):
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def series(points):
+    return VoltageSeries(
+        np.arange(points).astype('datetime64[s]'),
+        np.full(points, -1.0),
+    )
+
+
+class HistoryCacheTest(unittest.TestCase):
+    """Test LRU eviction, TTL expiry and invalidation by newer readings."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_hit_and_miss(self):
+        """Stored values are returned per (pile, range) key."""
+        cache = HistoryCache(clock=self.clock)
+        value = (None, series(10))
+        cache.put(1, 'month', value)
+        self.assertIs(cache.get(1, 'month'), value)
+        self.assertIsNone(cache.get(1, 'year'))
+        self.assertIsNone(cache.get(2, 'month'))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_ttl_expiry(self):
+        """Entries older than the TTL are dropped."""
+        cache = HistoryCache(ttl=60, clock=self.clock)
+        cache.put(1, 'month', series(10))
+        self.clock.now = 59
+        self.assertIsNotNone(cache.get(1, 'month'))
+        self.clock.now = 61
+        self.assertIsNone(cache.get(1, 'month'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_newer_reading_invalidates(self):
+        """A newer latest-reading timestamp makes the entry stale."""
+        cache = HistoryCache(clock=self.clock)
+        cached_at = datetime(2025, 6, 20, 8)
+        cache.put(1, 'month', series(10), latest_reading=cached_at)
+        self.assertIsNotNone(cache.get(1, 'month', latest_reading=cached_at))
+        self.assertIsNone(
+            cache.get(1, 'month', latest_reading=datetime(2025, 6, 20, 9)))
+
+    def test_lru_eviction_by_bytes(self):
+        """The least recently used entries are evicted over the byte limit."""
+        size = series(100).nbytes
+        cache = HistoryCache(max_bytes=2 * size, clock=self.clock)
+        cache.put(1, 'month', series(100))
+        cache.put(2, 'month', series(100))
+        cache.get(1, 'month')  # pile 2 is now the least recently used
+        cache.put(3, 'month', series(100))
+        self.assertIsNotNone(cache.get(1, 'month'))
+        self.assertIsNone(cache.get(2, 'month'))
+        self.assertIsNotNone(cache.get(3, 'month'))
+        self.assertEqual(cache.total_bytes, 2 * size)
+
+    def test_oversized_value_not_cached(self):
+        """A single value larger than the limit is not stored."""
+        cache = HistoryCache(max_bytes=10, clock=self.clock)
+        cache.put(1, 'month', series(100))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_piles(self):
+        """Invalidation removes every range of the given piles."""
+        cache = HistoryCache(clock=self.clock)
+        cache.put(1, 'month', series(10))
+        cache.put(1, ('24_hours', 600), series(10))
+        cache.put(2, 'month', series(10))
+        cache.invalidate([1])
+        self.assertEqual(len(cache), 1)
+        self.assertIsNotNone(cache.get(2, 'month'))
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.total_bytes, 0)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(HistoryCacheTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
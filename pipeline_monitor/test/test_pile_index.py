@@ -0,0 +1,69 @@
+# coding=utf-8
+"""Pile spatial index test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+
+import numpy as np
+
+from pile_index import PileSpatialIndex
+
+
+class PileSpatialIndexTest(unittest.TestCase):
+    """Test nearest-neighbour lookups against a brute-force search."""
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.ids = np.arange(1, 5001)
+        # A dense cluster plus a sparse spread, in metres.
+        self.xs = np.concatenate([rng.normal(0, 20, 2500), rng.uniform(-1e5, 1e5, 2500)])
+        self.ys = np.concatenate([rng.normal(0, 20, 2500), rng.uniform(-1e5, 1e5, 2500)])
+        self.index = PileSpatialIndex()
+        self.assertTrue(self.index.rebuild(self.ids, self.xs, self.ys))
+
+    def brute_force(self, x, y, k, max_distance):
+        distances = np.hypot(self.xs - x, self.ys - y)
+        order = np.argsort(distances, kind="stable")
+        return [
+            int(self.ids[i]) for i in order[:k] if distances[i] <= max_distance
+        ]
+
+    def test_matches_brute_force(self):
+        """Results equal a full scan for small and large search radii."""
+        for x, y in [(0.0, 0.0), (15.0, -7.5), (5e4, -3e4), (2e5, 2e5)]:
+            for k, radius in [(1, 5.0), (3, 50.0), (5, 5e3), (2, 1e6)]:
+                found = [pile_id for pile_id, _ in self.index.nearest(x, y, k, radius)]
+                self.assertEqual(found, self.brute_force(x, y, k, radius))
+
+    def test_distance_limit(self):
+        """Nothing is returned when no pile is inside the radius."""
+        self.assertEqual(self.index.nearest(3e5, 3e5, k=1, max_distance=10.0), [])
+
+    def test_rebuild_skipped_when_positions_unchanged(self):
+        """Rebuilding with identical positions is a no-op."""
+        self.assertFalse(self.index.rebuild(self.ids, self.xs, self.ys))
+        moved = self.xs.copy()
+        moved[0] += 1.0
+        self.assertTrue(self.index.rebuild(self.ids, moved, self.ys))
+
+    def test_empty_index(self):
+        """An empty index returns no matches."""
+        index = PileSpatialIndex()
+        index.rebuild([], [], [])
+        self.assertEqual(index.nearest(0.0, 0.0, k=1, max_distance=10.0), [])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(PileSpatialIndexTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,133 @@
+# coding=utf-8
+"""Pile list search index test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+
+from pile_search import PileSearchIndex, contiguous_runs, row_update_steps
+
+
+def make_index():
+    piles = [
+        {'id': 3, 'name': 'North-3', 'pipeline_id': 2},
+        {'id': 1, 'name': 'North-1', 'pipeline_id': 1},
+        {'id': 2, 'name': 'South-2', 'pipeline_id': 1},
+        {'id': 10, 'name': None, 'pipeline_id': None},
+    ]
+    return PileSearchIndex.from_piles(piles, ['正常', '欠保护', '正常', '未知'])
+
+
+class PileSearchTest(unittest.TestCase):
+    """Test searching and filtering the pile list."""
+
+    def test_rows_sorted_by_id(self):
+        """Rows follow pile id order regardless of input order."""
+        index = make_index()
+        self.assertEqual(index.pile_ids.tolist(), [1, 2, 3, 10])
+        self.assertEqual(index.texts[0], 'ID: 1 - North-1')
+        self.assertIsNone(index.pipeline_ids[3])
+        self.assertEqual(index.row_of(3), 2)
+        self.assertIsNone(index.row_of(99))
+
+    def test_search_is_case_insensitive_substring(self):
+        """Text search matches any part of the displayed text."""
+        index = make_index()
+        self.assertEqual(index.search('north').tolist(), [0, 2])
+        self.assertEqual(index.search('ID: 1').tolist(), [0, 3])
+        self.assertEqual(index.search('h-2').tolist(), [1])
+        self.assertEqual(index.search('').tolist(), [0, 1, 2, 3])
+        self.assertEqual(index.search('missing').tolist(), [])
+
+    def test_search_does_not_span_piles(self):
+        """A match never crosses the boundary between two piles."""
+        index = make_index()
+        self.assertEqual(index.search('1\nid').tolist(), [])
+
+    def test_filter_combines_conditions(self):
+        """Text, risk level and pipeline filters are combined."""
+        index = make_index()
+        self.assertEqual(index.filter(risk_level='正常').tolist(), [1, 2])
+        self.assertEqual(index.filter(pipeline_id='1').tolist(), [0, 1])
+        self.assertEqual(
+            index.filter('north', risk_level='正常').tolist(), [2])
+        self.assertEqual(index.distinct_pipeline_ids(), ['1', '2'])
+
+    def test_string_pipeline_ids(self):
+        """Pipeline ids are VARCHAR and kept as strings."""
+        piles = [
+            {'id': 1, 'name': 'A', 'pipeline_id': 'PL-02'},
+            {'id': 2, 'name': 'B', 'pipeline_id': 'PL-01'},
+            {'id': 3, 'name': 'C', 'pipeline_id': None},
+            {'id': 4, 'name': 'D', 'pipeline_id': 'PL-01'},
+        ]
+        index = PileSearchIndex.from_piles(piles, ['正常'] * 4)
+        self.assertEqual(index.distinct_pipeline_ids(), ['PL-01', 'PL-02'])
+        self.assertEqual(index.filter(pipeline_id='PL-01').tolist(), [1, 3])
+        self.assertEqual(index.filter(pipeline_id='PL-03').tolist(), [])
+        self.assertIsNone(index.pipeline_ids[2])
+
+    def test_set_risk_levels(self):
+        """Only rows whose risk level changed are reported."""
+        index = make_index()
+        rows = index.set_risk_levels({1: '欠保护', 2: '过保护', 99: '正常'})
+        self.assertEqual(rows, [1])
+        self.assertEqual(index.filter(risk_level='过保护').tolist(), [1])
+
+    def test_contiguous_runs(self):
+        """Runs of True values are returned as closed intervals."""
+        self.assertEqual(contiguous_runs([]), [])
+        self.assertEqual(
+            contiguous_runs([True, True, False, True, False, False, True]),
+            [(0, 1), (3, 3), (6, 6)])
+
+    def apply_steps(self, old_ids, new_ids):
+        """Replay the steps the list model applies and check every row range."""
+        rows = list(old_ids)
+        for action, first, last in row_update_steps(old_ids, new_ids):
+            self.assertLessEqual(first, last)
+            if action == 'remove':
+                self.assertLess(last, len(rows))
+                del rows[first:last + 1]
+            else:
+                self.assertLessEqual(first, len(rows))
+                rows[first:first] = new_ids[first:last + 1]
+        return rows
+
+    def test_row_update_steps(self):
+        """Incremental removes and inserts turn the old rows into the new ones."""
+        cases = [
+            ([1, 2, 3, 4, 5], [2, 4]),
+            ([2, 4], [1, 2, 3, 4, 5]),
+            ([1, 3, 5, 7], [0, 3, 4, 7, 8]),
+            ([1, 2, 3], [1, 2, 3]),
+            ([1, 2], []),
+            ([], [6, 9]),
+        ]
+        for old_ids, new_ids in cases:
+            self.assertEqual(self.apply_steps(old_ids, new_ids), new_ids)
+        self.assertEqual(
+            row_update_steps([1, 2, 3, 4], [1, 3, 5]),
+            [('remove', 3, 3), ('remove', 1, 1), ('insert', 2, 2)])
+
+    def test_row_update_steps_reset(self):
+        """Too many separate runs ask the model to reset instead."""
+        old_ids = list(range(20))
+        new_ids = list(range(0, 20, 2))
+        self.assertIsNone(row_update_steps(old_ids, new_ids, max_runs=4))
+        self.assertEqual(self.apply_steps(old_ids, new_ids), new_ids)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(PileSearchTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
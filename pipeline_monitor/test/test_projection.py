@@ -0,0 +1,72 @@
+# coding=utf-8
+"""Web Mercator projection test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+
+import numpy as np
+
+from projection import (
+    EARTH_RADIUS,
+    ProjectedPositionCache,
+    lonlat_to_web_mercator,
+)
+
+# Half the EPSG:3857 world width in metres.
+ORIGIN_SHIFT = np.pi * EARTH_RADIUS
+
+
+class ProjectionTest(unittest.TestCase):
+    """Test the vectorised WGS84 to Web Mercator conversion."""
+
+    def test_known_points(self):
+        """Projection matches the EPSG:3857 reference values."""
+        x, y = lonlat_to_web_mercator([0.0, 180.0, -180.0], [0.0, 0.0, 0.0])
+        np.testing.assert_allclose(x, [0.0, ORIGIN_SHIFT, -ORIGIN_SHIFT])
+        np.testing.assert_allclose(y, [0.0, 0.0, 0.0], atol=1e-6)
+
+        # Reference values from EPSG:3857 (e.g. cs2cs / QgsCoordinateTransform).
+        x, y = lonlat_to_web_mercator([90.0], [45.0])
+        self.assertAlmostEqual(x[0], ORIGIN_SHIFT / 2, delta=1e-6)
+        self.assertAlmostEqual(y[0], 5621521.486, delta=0.01)
+
+    def test_latitude_is_clamped(self):
+        """Latitudes beyond the Web Mercator limit are clamped."""
+        _, y = lonlat_to_web_mercator([0.0, 0.0], [90.0, -90.0])
+        np.testing.assert_allclose(y, [ORIGIN_SHIFT, -ORIGIN_SHIFT], rtol=1e-9)
+
+    def test_cache_reuses_and_refreshes_positions(self):
+        """Only new or moved piles are projected again."""
+        cache = ProjectedPositionCache()
+        piles = [
+            {'id': 1, 'longitude': 116.42, 'latitude': 39.91},
+            {'id': 2, 'longitude': 116.425, 'latitude': 39.912},
+        ]
+        xs, ys = cache.project(piles)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.position(1), (xs[0], ys[0]))
+
+        piles[1] = {'id': 2, 'longitude': 0.0, 'latitude': 0.0}
+        xs, ys = cache.project(piles)
+        self.assertAlmostEqual(xs[1], 0.0)
+        self.assertAlmostEqual(ys[1], 0.0)
+
+        cache.retain([2])
+        self.assertIsNone(cache.position(1))
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ProjectionTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,95 @@
+# coding=utf-8
+"""Local snapshot cache test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from snapshot_cache import load_snapshot, save_snapshot
+
+
+class SnapshotCacheTest(unittest.TestCase):
+    """Test saving and restoring the pile snapshot."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "profile", "snapshot.sqlite")
+        self.piles = [
+            {'id': 7, 'name': 'TP-007', 'longitude': 116.42, 'latitude': 39.91,
+             'pipeline_id': '0012', 'description': None},
+            {'id': 3, 'name': 'TP-003', 'longitude': 116.43, 'latitude': 39.92,
+             'pipeline_id': None, 'description': 'valve'},
+        ]
+        self.latest = {
+            7: {'pile_id': 7, 'voltage': -0.95,
+                'reading_timestamp': datetime(2025, 6, 20, 8, 30)},
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """Piles keep their order, positions and latest voltages."""
+        xs = np.array([1.5, 2.5])
+        ys = np.array([-3.0, 4.0])
+        self.assertTrue(save_snapshot(self.path, self.piles, self.latest, xs, ys))
+
+        snapshot = load_snapshot(self.path)
+        self.assertEqual([p['id'] for p in snapshot['piles']], [7, 3])
+        self.assertEqual(snapshot['piles'][1]['description'], 'valve')
+        # Pipeline ids are strings; numeric-looking ones must not become ints.
+        self.assertEqual(
+            [p['pipeline_id'] for p in snapshot['piles']], ['0012', None])
+        np.testing.assert_array_equal(snapshot['xs'], xs)
+        np.testing.assert_array_equal(snapshot['ys'], ys)
+        self.assertEqual(snapshot['latest_voltages'][7]['voltage'], -0.95)
+        self.assertEqual(
+            snapshot['latest_voltages'][7]['reading_timestamp'],
+            datetime(2025, 6, 20, 8, 30),
+        )
+        self.assertIsInstance(snapshot['saved_at'], datetime)
+
+    def test_save_replaces_previous_snapshot(self):
+        """A new save fully replaces the old snapshot."""
+        save_snapshot(self.path, self.piles, self.latest, [0.0, 0.0], [0.0, 0.0])
+        save_snapshot(self.path, self.piles[:1], {}, [1.0], [1.0])
+        snapshot = load_snapshot(self.path)
+        self.assertEqual(len(snapshot['piles']), 1)
+        self.assertEqual(snapshot['latest_voltages'], {})
+
+    def test_missing_or_invalid_snapshot(self):
+        """Missing, outdated or corrupt snapshots are ignored."""
+        self.assertIsNone(load_snapshot(self.path))
+
+        save_snapshot(self.path, self.piles, self.latest, [0.0, 0.0], [0.0, 0.0])
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute("UPDATE meta SET value = '0' WHERE key = 'version'")
+        connection.close()
+        self.assertIsNone(load_snapshot(self.path))
+
+        with open(self.path, 'wb') as handle:
+            handle.write(b'not a database')
+        self.assertIsNone(load_snapshot(self.path))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(SnapshotCacheTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,180 @@
+# coding=utf-8
+"""Local reading spool test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from mysql.connector import errorcode
+
+from utilities import import_db_script
+
+spool_module = import_db_script('spool')
+
+READING_TIME = datetime(2025, 6, 20, 8, 30)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, query, params=()):
+        if query.lstrip().startswith('SELECT ingest_key'):
+            self.rows = [(key,) for key in params
+                         if key in self.connection.committed]
+        else:
+            self.insert(params)
+
+    def executemany(self, query, rows):
+        if 'voltage_readings' not in query:
+            return  # derived tables
+        for row in rows:
+            self.insert(row)
+
+    def insert(self, row):
+        if row[1] in self.connection.missing_piles:
+            raise spool_module.Error(
+                msg='no such pile', errno=errorcode.ER_NO_REFERENCED_ROW_2)
+        self.connection.pending[row[0]] = row
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """MySQL stand-in keyed by ingest_key; fails the given number of commits."""
+
+    def __init__(self, missing_piles=(), failing_commits=0):
+        self.missing_piles = set(missing_piles)
+        self.failing_commits = failing_commits
+        self.pending = {}
+        self.committed = {}
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.failing_commits:
+            self.failing_commits -= 1
+            self.pending = {}
+            raise spool_module.Error(msg='connection lost',
+                                     errno=errorcode.CR_SERVER_LOST)
+        self.committed.update(self.pending)
+        self.pending = {}
+
+    def rollback(self):
+        self.pending = {}
+
+
+class Crash(Exception):
+    """Simulates the process dying between the MySQL commit and the ack."""
+
+
+class SpoolTest(unittest.TestCase):
+    """Test that replaying the spool is idempotent."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'readings.spool')
+        self.spool = spool_module.ReadingSpool(self.path)
+
+    def tearDown(self):
+        self.spool.close()
+        shutil.rmtree(self.directory)
+
+    def replayer(self, **kwargs):
+        return spool_module.SpoolReplayer(
+            self.spool, ensure_schema=False, **kwargs)
+
+    def append(self, pile_ids):
+        self.spool.append((pile_id, -0.9, READING_TIME) for pile_id in pile_ids)
+
+    def test_failed_batch_stays_in_spool(self):
+        """A failed write keeps the batch; the next replay drains it."""
+        self.append([1, 2, 3])
+        connection = FakeConnection(failing_commits=1)
+        stats = self.replayer().replay(connection)
+        self.assertIsNotNone(stats['error'])
+        self.assertEqual(len(self.spool), 3)
+        self.assertEqual(connection.committed, {})
+
+        stats = self.replayer().replay(connection)
+        self.assertIsNone(stats['error'])
+        self.assertEqual(stats['inserted'], 3)
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(len(connection.committed), 3)
+
+    def test_crash_before_ack_does_not_duplicate(self):
+        """Rows committed but not acked are counted as duplicates on replay."""
+        self.append([1, 2, 3])
+        connection = FakeConnection()
+        ack = self.spool.ack
+
+        def crash(up_to_seq):
+            raise Crash()
+
+        self.spool.ack = crash
+        with self.assertRaises(Crash):
+            self.replayer().replay(connection)
+        self.spool.ack = ack
+        self.assertEqual(len(connection.committed), 3)
+        self.assertEqual(len(self.spool), 3)
+
+        # The restarted process opens the same spool file again.
+        self.spool.close()
+        self.spool = spool_module.ReadingSpool(self.path)
+        stats = self.replayer().replay(connection)
+        self.assertEqual((stats['inserted'], stats['duplicates']), (0, 3))
+        self.assertEqual(len(connection.committed), 3)
+        self.assertEqual(len(self.spool), 0)
+
+    def test_rejected_rows_are_dropped(self):
+        """Rows for deleted piles are dropped instead of blocking the spool."""
+        self.append([1, 9, 3])
+        connection = FakeConnection(missing_piles=[9])
+        stats = self.replayer().replay(connection)
+        self.assertEqual((stats['inserted'], stats['rejected']), (2, 1))
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(
+            sorted(row[1] for row in connection.committed.values()), [1, 3])
+
+    def test_replay_stops_at_failing_batch(self):
+        """Batches before the failure are acked, later ones are kept."""
+        self.append(range(1, 6))
+        calls = []
+
+        def write_batch(connection, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise spool_module.Error('connection lost')
+            return len(rows), 0, []
+
+        stats = self.replayer(batch_size=2, write_batch=write_batch).replay(None)
+        self.assertEqual(stats['inserted'], 2)
+        self.assertEqual(len(self.spool), 3)
+        stats = self.replayer(batch_size=2, write_batch=write_batch).replay(None)
+        self.assertEqual(stats['inserted'], 3)
+        self.assertEqual(len(self.spool), 0)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(SpoolTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,187 @@
+# coding=utf-8
+"""Streaming reader test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from mysql.connector import Error
+
+from db_operations import (
+    get_voltage_buckets,
+    get_voltage_readings_for_piles,
+    iter_all_test_piles,
+    iter_voltage_readings_for_pile,
+)
+
+
+class FakeCursor(object):
+    """Unbuffered cursor stand-in that serves rows through fetchmany."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.position = 0
+        self.closed = False
+        self.params = None
+        self.fail_for = ()
+
+    def execute(self, query, params=()):
+        self.params = params
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+    def fetchmany(self, size):
+        if self.params and self.params[0] in self.fail_for:
+            raise Error('connection lost')
+        batch = self.rows[self.position:self.position + size]
+        self.position += len(batch)
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection(object):
+
+    def __init__(self, rows, fail_for=()):
+        self.cursors = []
+        self.rows = rows
+        self.closed = False
+        self.fail_for = fail_for
+
+    def close(self):
+        self.closed = True
+
+    def cursor(self, buffered=None, dictionary=None):
+        cursor = FakeCursor(self.rows)
+        cursor.buffered = buffered
+        cursor.fail_for = self.fail_for
+        self.cursors.append(cursor)
+        return cursor
+
+
+class StreamingReaderTest(unittest.TestCase):
+    """Test the fetchmany based generators."""
+
+    def setUp(self):
+        start = datetime(2025, 6, 1)
+        self.rows = [
+            (i + 1, 7, Decimal('-0.900') - Decimal(i) / 1000, start + timedelta(hours=i))
+            for i in range(25)
+        ]
+
+    def test_structured_batches(self):
+        """Readings arrive as fixed-size NumPy structured arrays."""
+        connection = FakeConnection(self.rows)
+        batches = list(iter_voltage_readings_for_pile(connection, 7, batch_size=10))
+        self.assertEqual([len(b) for b in batches], [10, 10, 5])
+        self.assertEqual(batches[0].dtype.names,
+                         ('id', 'pile_id', 'voltage', 'reading_timestamp'))
+        self.assertAlmostEqual(batches[2]['voltage'][-1], -0.924)
+        self.assertEqual(batches[1]['reading_timestamp'][0],
+                         np.datetime64('2025-06-01T10:00:00'))
+        self.assertTrue(connection.cursors[0].closed)
+        self.assertIs(connection.cursors[0].buffered, False)
+
+    def test_column_and_row_layouts(self):
+        """Columnar tuples and dict rows are available too."""
+        connection = FakeConnection(self.rows)
+        ids, pile_ids, _, _ = next(iter_voltage_readings_for_pile(
+            connection, 7, start_time=datetime(2025, 6, 1), batch_size=3,
+            layout='columns'))
+        self.assertEqual(ids, (1, 2, 3))
+        self.assertEqual(pile_ids, (7, 7, 7))
+        self.assertEqual(connection.cursors[0].params, (7, datetime(2025, 6, 1)))
+
+        piles = FakeConnection([
+            (1, 'TP-001', Decimal('116.420000'), Decimal('39.910000'), None, None, None),
+        ])
+        (batch,) = list(iter_all_test_piles(piles))
+        self.assertEqual(batch[0]['name'], 'TP-001')
+        self.assertIsInstance(batch[0]['longitude'], float)
+
+    def test_early_stop_closes_connection(self):
+        """Stopping early closes the connection instead of reading the rest."""
+        connection = FakeConnection(self.rows)
+        batches = iter_voltage_readings_for_pile(connection, 7, batch_size=4)
+        next(batches)
+        batches.close()
+        cursor = connection.cursors[0]
+        self.assertEqual(cursor.position, 4)
+        self.assertTrue(cursor.closed)
+        self.assertTrue(connection.closed)
+
+    def test_exhausted_reader_keeps_connection(self):
+        """Reading every batch leaves the connection open for reuse."""
+        connection = FakeConnection(self.rows)
+        list(iter_voltage_readings_for_pile(connection, 7, batch_size=4))
+        self.assertTrue(connection.cursors[0].closed)
+        self.assertFalse(connection.closed)
+
+    def test_multi_pile_fetch_groups_per_pile(self):
+        """One query per id chunk, results split into per-pile series."""
+        start = datetime(2025, 6, 1)
+        rows = [(1, 3, Decimal('-0.9'), start),
+                (2, 3, Decimal('9999.0'), start + timedelta(hours=1)),
+                (3, 5, Decimal('-1.1'), start)]
+        connection = FakeConnection(rows)
+        result = get_voltage_readings_for_piles(connection, [3, 5, 8, 3],
+                                                chunk_size=10)
+        self.assertEqual(len(connection.cursors), 1)
+        self.assertEqual(connection.cursors[0].params, (3, 5, 8))
+        self.assertEqual(sorted(result), [3, 5, 8])
+        self.assertEqual(len(result[3]), 2)
+        self.assertEqual(list(result[3].valid), [True, False])
+        self.assertAlmostEqual(float(result[5].voltages[0]), -1.1, places=5)
+        self.assertEqual(len(result[8]), 0)
+
+        connection = FakeConnection([])
+        get_voltage_readings_for_piles(connection, range(25), chunk_size=10)
+        self.assertEqual([len(c.params) for c in connection.cursors], [10, 10, 5])
+
+    def test_multi_pile_fetch_marks_failed_chunk(self):
+        """Piles of a failed chunk map to None instead of an empty series."""
+        connection = FakeConnection([], fail_for=(2,))
+        result = get_voltage_readings_for_piles(connection, [0, 1, 2, 3],
+                                                chunk_size=2)
+        self.assertEqual(len(result[0]), 0)
+        self.assertEqual(len(result[1]), 0)
+        self.assertIsNone(result[2])
+        self.assertIsNone(result[3])
+
+    def test_bucket_query_sized_by_pixel_width(self):
+        """Bucket width follows the pixel width and maps back to timestamps."""
+        start = datetime(2025, 6, 1)
+        connection = FakeConnection([
+            (0, Decimal('-1.2'), Decimal('-0.8'), Decimal('-1.0'), 360),
+            (239, Decimal('-0.9'), Decimal('-0.9'), Decimal('-0.9'), 1),
+        ])
+        buckets = get_voltage_buckets(
+            connection, 7, start, start + timedelta(hours=24), pixel_width=240)
+        # 86400 s / 240 px = 360 s per bucket.
+        self.assertEqual(connection.cursors[0].params[1], 360)
+        self.assertEqual(len(buckets), 2)
+        self.assertEqual(buckets.bucket_starts[1],
+                         np.datetime64('2025-06-01T23:54:00'))
+        self.assertAlmostEqual(float(buckets.minimum[0]), -1.2, places=5)
+        self.assertEqual(list(buckets.count), [360, 1])
+        self.assertEqual(len(buckets.mean_series()), 2)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(StreamingReaderTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,60 @@
+# coding=utf-8
+"""Columnar voltage series test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = '2256124857@qq.com'
+__date__ = '2025-06-20'
+__copyright__ = 'Copyright 2025, LSY'
+
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from voltage_series import VoltageSeries
+
+
+class VoltageSeriesTest(unittest.TestCase):
+    """Test the masked columnar series."""
+
+    def setUp(self):
+        self.series = VoltageSeries.from_columns(
+            [datetime(2025, 6, 1, 6), datetime(2025, 6, 1, 18),
+             datetime(2025, 6, 2, 6), datetime(2025, 6, 3, 6)],
+            [-0.9, -1.1, 9999.0, -0.95],
+        )
+
+    def test_placeholder_becomes_mask(self):
+        """The 9999.0 placeholder is masked out and stored as NaN."""
+        np.testing.assert_array_equal(self.series.valid, [True, True, False, True])
+        self.assertTrue(np.isnan(self.series.voltages[2]))
+        self.assertEqual(self.series.voltages.dtype, np.float32)
+        self.assertEqual(self.series.timestamps.dtype, np.dtype('datetime64[s]'))
+        self.assertEqual(len(self.series.valid_only()), 3)
+
+    def test_from_batches(self):
+        """Structured batches concatenate into one series."""
+        dtype = [('id', 'i8'), ('pile_id', 'i4'), ('voltage', 'f8'),
+                 ('reading_timestamp', 'datetime64[s]')]
+        batches = [
+            np.array([(1, 7, -0.9, datetime(2025, 6, 1))], dtype=dtype),
+            np.array([(2, 7, 9999.0, datetime(2025, 6, 2))], dtype=dtype),
+        ]
+        series = VoltageSeries.from_batches(batches)
+        self.assertEqual(len(series), 2)
+        np.testing.assert_array_equal(series.valid, [True, False])
+        self.assertEqual(len(VoltageSeries.from_batches([])), 0)
+        # 8 + 4 + 1 bytes per reading.
+        self.assertEqual(series.nbytes, 26)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(VoltageSeriesTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -1,6 +1,8 @@
 # coding=utf-8
 """Common functionality used by regression tests."""
 
+import importlib
+import os
 import sys
 import logging
 
@@ -59,3 +61,28 @@ def get_qgis_app():
         IFACE = QgisInterface(CANVAS)
 
     return QGIS_APP, CANVAS, IFACE, PARENT
+
+
+def import_db_script(name):
+    """Import a module from the shared db_py scripts directory.
+
+    The scripts import their sibling modules as top-level modules (e.g.
+    ``db_operations``, ``spool``). ``db_operations`` clashes with the plugin
+    module of the same name, so the shared module is swapped in and the
+    scripts directory is put on the path while importing.
+
+    :param name: Module name inside db_py, e.g. 'bulk_loader'.
+    :type name: str
+    """
+    shared = importlib.import_module('db_py.db_operations')
+    plugin_module = sys.modules.get('db_operations')
+    sys.modules['db_operations'] = shared
+    sys.path.insert(0, os.path.dirname(shared.__file__))
+    try:
+        return importlib.import_module('db_py.' + name)
+    finally:
+        sys.path.pop(0)
+        if plugin_module is None:
+            del sys.modules['db_operations']
+        else:
+            sys.modules['db_operations'] = plugin_module